@@ -1,6 +1,6 @@
 import streamlit as st
 import base64
-from langchain_core.messages import HumanMessage
+import json
 from typing import Dict
 import time
 import streamlit.components.v1 as components
@@ -8,14 +8,22 @@ import streamlit.components.v1 as components
 # Import our backend
 from src.graph import app_graph
 from src.state import GraphState
-from src.config import ADDRS
-from src.blockchain.client import w3
-from src.blockchain import abis
+from src.config import ADDRS, METRICS_PORT
+from src.metrics import start_exporter
+from src.blockchain.client import w3, get_contract
 from src.agents.ledger import get_onchain_ledger
+from src.blockchain.indexer import event_store, watch_events
+from src.sessions import (thread_config, initial_inputs, load_credentials, verify_sof_document,
+                          sof_update, refund_escrow)
+from src.streaming import CoalescingTokenStreamer
 
 # --- Config ---
 st.set_page_config(page_title="Agentic Compliance Payment", layout="wide")
 
+if METRICS_PORT:
+    # Once per process (reruns reuse it)
+    start_exporter(METRICS_PORT)
+
 # --- Styles ---
 st.markdown("""
 <style>
@@ -101,85 +109,91 @@ if "current_ledger" not in st.session_state:
 if "compliance_status" not in st.session_state:
     st.session_state.compliance_status = "IDLE"
 
-def render_mermaid(code: str, height=500):
-    """Renders Mermaid.js diagram using HTML component"""
-    html_code = f"""
-    <div class="mermaid">
-    {code}
-    </div>
-    <script type="module">
-        import mermaid from 'https://cdn.jsdelivr.net/npm/mermaid@10/dist/mermaid.esm.min.mjs';
-        mermaid.initialize({{ startOnLoad: true, theme: 'dark', securityLevel: 'loose' }});
-    </script>
-    """
-    return components.html(html_code, height=height)
+GRAPH_CHANNEL = "workflow-graph"
 
-def get_graph_mermaid(active_node=None):
-    """Generates the Mermaid Graph syntax with highlighting"""
+# The diagram component's HTML never changes, so Streamlit keeps the same
+# iframe across reruns (mermaid is loaded and the SVG drawn once). The active
+# node arrives over a BroadcastChannel; sessionStorage covers a fresh iframe.
+GRAPH_HTML = """
+<style>
+    .node.active rect, .node.active polygon, .node.active circle, .node.active path {
+        fill: #F4D03F !important; stroke: #E74C3C !important; stroke-width: 4px !important;
+    }
+    .node.active .nodeLabel { color: #000000 !important; }
+</style>
+<div class="mermaid">
+__CODE__
+</div>
+<script type="module">
+    import mermaid from 'https://cdn.jsdelivr.net/npm/mermaid@10/dist/mermaid.esm.min.mjs';
+    mermaid.initialize({ startOnLoad: false, theme: 'dark', securityLevel: 'loose' });
+    await mermaid.run();
+    function highlight(name) {
+        document.querySelectorAll('.node.active').forEach(n => n.classList.remove('active'));
+        if (name) document.querySelectorAll(`[id^="flowchart-${name}-"]`).forEach(n => n.classList.add('active'));
+    }
+    highlight(sessionStorage.getItem('__CHANNEL__'));
+    new BroadcastChannel('__CHANNEL__').onmessage = (event) => highlight(event.data.active);
+</script>
+"""
+
+@st.cache_resource
+def get_graph_mermaid():
+    """Mermaid syntax of the workflow, drawn once per process"""
+    return app_graph.get_graph().draw_mermaid()
+
+def render_graph(height=600):
+    """Renders the persistent workflow diagram"""
     try:
-        # Get base mermaid
-        base_mmd = app_graph.get_graph().draw_mermaid()
-        
-        # Add styling for active node
-        if active_node:
-            # High contrast style: Yellow fill, Red border, Black text
-            style = f"\nstyle {active_node} fill:#F4D03F,stroke:#E74C3C,stroke-width:4px,color:#000000"
-            return base_mmd + style
-        return base_mmd
+        html_code = GRAPH_HTML.replace("__CODE__", get_graph_mermaid()).replace("__CHANNEL__", GRAPH_CHANNEL)
     except Exception as e:
         st.error(f"Could not generate mermaid: {e}")
         return None
+    return components.html(html_code, height=height)
+
+def push_active_node(node):
+    """Highlights `node` in the diagram: a few bytes posted to the existing component"""
+    node_js = json.dumps(node)
+    with highlight_container:
+        components.html(
+            f"<script>sessionStorage.setItem('{GRAPH_CHANNEL}', {node_js});"
+            f"new BroadcastChannel('{GRAPH_CHANNEL}').postMessage({{active: {node_js}}});</script>",
+            height=0,
+        )
+    active_caption.caption(f"Active: `{node}`")
 
 # --- Sidebar ---
 with st.sidebar:
     st.title("Workflow State")
     
     # Real-time Graph Visualizer
-    graph_container = st.empty()
-    
-    # Initial Render
-    with graph_container.container():
-         # We need to determine the active node from the state effectively to highlight it initially or during updates
-         # For initial state, it's usually empty or 'start'
-         mmd = get_graph_mermaid()
-         if mmd:
-             render_mermaid(mmd, height=600)
+    render_graph()
+    active_caption = st.empty()
+    highlight_container = st.empty()
 
     st.markdown("---")
     st.subheader("System Status")
     status_color = "🟢" if st.session_state.compliance_status == "PASS" else "🟡" if st.session_state.compliance_status in ["PENDING", "ESCROW_ACTIVE"] else "⚪"
     st.markdown(f"**Compliance Status:** {status_color} `{st.session_state.compliance_status}`")
 
-from langchain_core.callbacks import BaseCallbackHandler
+class StreamlitTokenStreamer(CoalescingTokenStreamer):
+    """Streams the agent's response into a chat message, a few renders per second"""
 
-class StreamlitTokenStreamer(BaseCallbackHandler):
     def __init__(self, container):
+        super().__init__()
         self.container = container
         self.placeholder = None
-        self.text = ""
-        self.stream_box = None
-        self.agent_name = "Agent"  # Store agent name for prefix
-        
-    def on_llm_start(self, serialized, prompts, **kwargs):
-        self.text = ""
-        # Determine agent from tags - find the one containing "Agent"
-        tags = kwargs.get("tags", [])
-        # LangChain adds internal tags like 'seq:step:X', so find ours specifically
-        agent_tag = next((t for t in tags if "Agent" in t), None)
-        self.agent_name = agent_tag if agent_tag else "Agent"
-        
+
+    def start(self, agent_name):
         # Create a chat message placeholder for streaming
-        self.stream_box = self.container.chat_message(name=self.agent_name, avatar="🤖")
-        self.placeholder = self.stream_box.empty()
-        self.placeholder.markdown(f"**{self.agent_name}:**\n\n ...")
-        
-    def on_llm_new_token(self, token, **kwargs):
-        self.text += token
-        self.placeholder.markdown(f"**{self.agent_name}:**\n\n {self.text}▌")
-        
-    def on_llm_end(self, response, **kwargs):
-        # Finalize the message without the cursor
-        self.placeholder.markdown(f"**{self.agent_name}:**\n\n {self.text}")
+        stream_box = self.container.chat_message(name=agent_name, avatar="🤖")
+        self.placeholder = stream_box.empty()
+        self.placeholder.markdown(f"**{agent_name}:**\n\n ...")
+
+    def render(self, text, final):
+        # Cursor while streaming, removed on the final render
+        cursor = "" if final else "▌"
+        self.placeholder.markdown(f"**{self.agent_name}:**\n\n {text}{cursor}")
 
 # --- Main Panel ---
 st.title("🤖 Agentic Compliance Payment System")
@@ -207,36 +221,60 @@ def render_wallet_html(current_ledger):
     </div>
     """
 
+def _balances(current_ledger):
+    # block_number changes with every block; only the balances are shown
+    return tuple(current_ledger.get(k) for k in ("buyer_balance", "escrow_balance", "seller_balance"))
+
+_rendered_balances = None
+
+def update_wallet(current_ledger):
+    """Re-renders the wallet cards only when a balance changed"""
+    global _rendered_balances
+    if _balances(current_ledger) == _rendered_balances:
+        return
+    _rendered_balances = _balances(current_ledger)
+    monitor_container.markdown(render_wallet_html(current_ledger), unsafe_allow_html=True)
+
 monitor_container = st.empty()
-monitor_container.markdown(render_wallet_html(ledger), unsafe_allow_html=True)
+update_wallet(ledger)
 
 # --- On-chain Metadata ---
 if "transaction_id" in st.session_state:
     st.caption(f"**Last Transaction ID:** `{st.session_state.transaction_id}`")
     
-    # Fetch Attestation if ID exists and we have Web3
+    # Attestation status comes from the local event index, not a contract call per rerun
     if st.session_state.transaction_id and w3 and ADDRS:
         try:
-            wrapper = w3.eth.contract(address=ADDRS["PolicyWrapper"], abi=abis.WRAPPER_ABI)
-            # transactionId is bytes32
-            tx_id_bytes = bytes.fromhex(st.session_state.transaction_id)
-            overall, results = wrapper.functions.getAttestation(tx_id_bytes).call()
-            
+            watch_events()
+            attestation = event_store.attestation(st.session_state.transaction_id)
+
             with st.expander("Blockchain Attestation (PolicyWrapper)", expanded=True):
-                status_map = {0: "PASS", 1: "FAIL", 2: "PENDING"}
-                st.markdown(f"**Overall Status:** `{status_map.get(overall, 'UNKNOWN')}`")
-                
-                for r in results:
-                    p_id = r[0].hex()
-                    p_status = status_map.get(r[1], "UNKNOWN")
-                    # Decode reason (bytes32 to string)
-                    try:
-                        p_reason = r[2].decode("utf-8").strip("\x00")
-                    except:
-                        p_reason = r[2].hex()
-                        
-                    color = "green" if p_status == "PASS" else "red" if p_status == "FAIL" else "orange"
-                    st.markdown(f"- Policy `{p_id[:10]}...`: :{color}[{p_status}] {p_reason if p_reason else ''}")
+                if attestation is None:
+                    st.caption("Waiting for the attestation to be indexed...")
+                else:
+                    status_map = {0: "PASS", 1: "FAIL", 2: "PENDING"}
+                    st.markdown(f"**Overall Status:** `{attestation['status']}` (block {attestation['block_number']})")
+
+                    # Per-policy results aren't in the event: read them once per attestation
+                    results_key = (attestation["transaction_id"], attestation["block_number"])
+                    if st.session_state.get("policy_results_key") != results_key:
+                        wrapper = get_contract("PolicyWrapper")
+                        # transactionId is bytes32
+                        tx_id_bytes = bytes.fromhex(st.session_state.transaction_id)
+                        _, st.session_state.policy_results = wrapper.functions.getAttestation(tx_id_bytes).call()
+                        st.session_state.policy_results_key = results_key
+
+                    for r in st.session_state.policy_results:
+                        p_id = r[0].hex()
+                        p_status = status_map.get(r[1], "UNKNOWN")
+                        # Decode reason (bytes32 to string)
+                        try:
+                            p_reason = r[2].decode("utf-8").strip("\x00")
+                        except:
+                            p_reason = r[2].hex()
+
+                        color = "green" if p_status == "PASS" else "red" if p_status == "FAIL" else "orange"
+                        st.markdown(f"- Policy `{p_id[:10]}...`: :{color}[{p_status}] {p_reason if p_reason else ''}")
         except Exception as e:
             st.error(f"Could not fetch attestation: {e}")
 
@@ -292,10 +330,7 @@ def run_interaction(inputs=None, resume=False):
     st_callback = StreamlitTokenStreamer(container=log_container)
     
     # Pass callbacks to the graph config
-    config = {
-        "configurable": {"thread_id": st.session_state.thread_id},
-        "callbacks": [st_callback]
-    }
+    config = thread_config(st.session_state.thread_id, callbacks=[st_callback])
     
     # Use the shared container
     container_expander = log_container
@@ -344,17 +379,11 @@ def run_interaction(inputs=None, resume=False):
                      print("DEBUG: Duplicate entry detected. Skipping.")
                 
                 # Live Update Monitor
-                monitor_container.markdown(render_wallet_html(st.session_state.current_ledger), unsafe_allow_html=True)
+                update_wallet(st.session_state.current_ledger)
                 
                 # LOOK-AHEAD: Predict next node to highlight NOW (while backend is crunching)
                 next_node = get_next_node(node_name, st.session_state.compliance_status)
-                
-                # Update Graph with Next Node
-                with graph_container.container():
-                     mmd = get_graph_mermaid(active_node=next_node)
-                     if mmd:
-                         render_mermaid(mmd, height=500)
-                     st.caption(f"Active: `{next_node}`") 
+                push_active_node(next_node)
                 
                 # Removed artificial sleep to reduce lag
                 # time.sleep(0.8) 
@@ -371,34 +400,18 @@ if start_btn:
     st.rerun()
 
 if st.session_state.compliance_status == "STARTING":
-    # Pre-render graph to show activity immediately
-    with graph_container.container():
-         mmd = get_graph_mermaid(active_node="analyze_intent") # Guess first node
-         if mmd:
-             render_mermaid(mmd, height=500)
-         st.caption("Active: `analyze_intent`")
+    # Highlight the first node to show activity immediately
+    push_active_node("analyze_intent")
     
     # Fetch Initial Credentials
     init_creds = {"has_sanctions": False, "has_sof": False}
-    if w3 and ADDRS:
-        try:
-             registry = w3.eth.contract(address=ADDRS["IdentityRegistry"], abi=abis.REGISTRY_ABI)
-             buyer_addr = ADDRS["Buyer"]
-             init_creds["has_sanctions"] = registry.functions.hasSanctionsCheck(buyer_addr).call()
-             init_creds["has_sof"] = registry.functions.hasSourceOfFunds(buyer_addr).call()
-        except Exception as e:
-             st.error(f"Failed to fetch initial credentials: {e}")
-
-    initial_inputs = {
-        "messages": [HumanMessage(content=buyer_request)],
-        "ledger": get_onchain_ledger(),
-        "buyer_credentials": init_creds,
-        # Reset other keys if needed
-        "buyer_intent": {},
-        "negotiation_log": []
-    }
-    
-    run_interaction(initial_inputs)
+    try:
+         # Cached per buyer; the watcher drops entries when the registry is written
+         init_creds = load_credentials()
+    except Exception as e:
+         st.error(f"Failed to fetch initial credentials: {e}")
+
+    run_interaction(initial_inputs(buyer_request, init_creds))
 
 # Pending Mediation
 if st.session_state.compliance_status == "PENDING":
@@ -411,12 +424,8 @@ if st.session_state.compliance_status == "PENDING":
 
 # Handle the Escrow Initialization after rerun
 if st.session_state.compliance_status == "ESCROW_INITIALIZING":
-    # Pre-render graph to show activity immediately
-    with graph_container.container():
-         mmd = get_graph_mermaid(active_node="execute_escrow")
-         if mmd:
-             render_mermaid(mmd, height=500)
-         st.caption("Active: `execute_escrow`")
+    # Highlight the escrow node to show activity immediately
+    push_active_node("execute_escrow")
     
     run_interaction(resume=True)
 
@@ -429,20 +438,11 @@ with st.sidebar:
             # Refund Logic directly via Web3 for demo
             if w3 and ADDRS:
                 try:
-                    escrow_addr = ADDRS.get("SimpleEscrow") or ADDRS["ComplianceAgent"] 
-                    # We fallback because we don't know exact escrow address in this simple setup
-                    # In reality we would read it from logs/events
-                    if escrow_addr:
-                        # Using CA key to call refund
-                        from eth_account import Account
-                        escrow = w3.eth.contract(address=escrow_addr, abi=abis.ESCROW_ABI)
-                        ca = Account.from_key("0xac0974bec39a17e36ba4a6b4d238ff944bacb478cbed5efcae784d7bf4f2ff80")
-                        tx = escrow.functions.refund().build_transaction({
-                            "from": ca.address,
-                            "nonce": w3.eth.get_transaction_count(ca.address)
-                        })
-                        w3.eth.send_raw_transaction(w3.eth.account.sign_transaction(tx, private_key=ca.key).raw_transaction)
-                        st.success("Refund Triggered on Chain.")
+                    # The thread's own escrow (pooled clone), else the shared one
+                    if refund_escrow(st.session_state.thread_id):
+                        st.success("Refund Confirmed on Chain.")
+                    else:
+                        st.error("Refund Reverted on Chain.")
                 except Exception as e:
                     st.error(f"Refund Failed: {e}")
 
@@ -456,26 +456,13 @@ if st.session_state.compliance_status == "ESCROW_ACTIVE":
         if st.button("Submit Proof"):
             # Mock verification
             content = uploaded_file.read().decode("utf-8")
-            if "Balance: $50,000" in content:
+            if verify_sof_document(content):
                 st.success("Document Analyzed. Balance Verified.")
                 
                 # Update State to reflect SoF AND preserve Ledger/Status
-                # Warning: updating 'as_node' might overwrite other keys output by that node if not included.
-                # We simply want to modify the buyer_intent (add SoF) but keep the ledger calculation that happened.
-                st.session_state.current_ledger["active_agent"] = "LEDGER" # Ensure consistency
-                
-                config = {"configurable": {"thread_id": st.session_state.thread_id}}
-                app_graph.update_state(
-                    config, 
-                    {
-                        "buyer_intent": {"amount": 1500, "attached_vcs": {"sanctions": True, "sof": True}},
-                        "ledger": st.session_state.current_ledger,
-                        "compliance_status": "ESCROW_ACTIVE",
-                        "active_agent": "LEDGER",
-                        "negotiation_log": ["Chain: Tx confirmed. Funds Locked. (SoF Verified)"]
-                    }, 
-                    as_node="execute_escrow" 
-                )
+                # (applied as execute_escrow's output, so it resumes into settlement)
+                config = thread_config(st.session_state.thread_id)
+                app_graph.update_state(config, sof_update(app_graph.get_state(config).values), as_node="execute_escrow")
                 
                 # Resume
                 run_interaction(resume=True)
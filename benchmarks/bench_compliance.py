@@ -0,0 +1,65 @@
+"""Latency of node_evaluate_compliance with and without the LLM.
+
+Usage: python -m benchmarks.bench_compliance [--iterations 50] [--llm-latency 0.5]
+
+`--llm-latency` swaps the Ollama model for a canned response with the given
+delay (seconds), so the comparison can run without a model server.
+Without Anvil running only the off-chain path is measured.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+import src.agents.tools as tools
+from src.agents.compliance import node_evaluate_compliance
+
+class SlowFakeChatModel(FakeListChatModel):
+    latency: float = 0.0
+
+    def _call(self, *args, **kwargs):
+        time.sleep(self.latency)
+        return super()._call(*args, **kwargs)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        # Yield to the event loop instead of parking an executor thread
+        await asyncio.sleep(self.latency)
+        text = FakeListChatModel._call(self, messages, stop, **kwargs)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+STATES = [
+    {"buyer_intent": {"item": "Luxury Watch", "amount": amount, "attached_vcs": {"sanctions": True, "sof": sof}}}
+    for amount, sof in [(1500, False), (500, False), (2500, True), (999, False)]
+]
+
+def percentile(samples, pct):
+    return statistics.quantiles(samples, n=100, method="inclusive")[pct - 1]
+
+def run(mode, configurable, iterations):
+    samples = []
+    for i in range(iterations):
+        state = STATES[i % len(STATES)]
+        start = time.perf_counter()
+        node_evaluate_compliance(state, {"configurable": configurable})
+        samples.append((time.perf_counter() - start) * 1000)
+    print(f"{mode:<24} p50={percentile(samples, 50):9.2f}ms  p99={percentile(samples, 99):9.2f}ms  n={iterations}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--llm-latency", type=float, default=None)
+    args = parser.parse_args()
+
+    if args.llm_latency is not None:
+        tools.set_llm(SlowFakeChatModel(responses=["Status: PENDING. Amount exceeds threshold."], latency=args.llm_latency))
+
+    run("rules only", {"rule_engine": True, "llm_narrative": False}, args.iterations)
+    run("rules + LLM narrative", {"rule_engine": True, "llm_narrative": True}, args.iterations)
+    run("LLM decides", {"rule_engine": False}, args.iterations)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""End-to-end payment throughput and latency on an in-process chain with a canned LLM.
+
+Usage: python -m benchmarks.bench_e2e [--concurrency 1 10 100] [--scenarios direct escrow finalize refund]
+                                      [--llm-latency 0.05] [--warmup 1] [--output results.jsonl]
+
+No Ollama or Anvil needed: the demo suite is deployed from out/ to an
+eth-tester chain (benchmarks/evm.py) and the model is a CannedChatModel.
+Sessions go through src/sessions.py like the API server:
+
+    direct    $500: analyze_intent -> evaluate_compliance (PASS, paid via the wrapper)
+    escrow    $1500 without SoF: start (PENDING) -> accept (ESCROW_ACTIVE)
+    finalize  escrow, then the SoF document (PASS)
+    refund    escrow, then refund
+
+At concurrency N, N sessions step through the scenario together: each step
+runs for all of them at once, then the next one. Without a SimpleEscrowFactory
+in out/ each escrow session is started with its own SimpleEscrow, deployed
+before the level is timed (a pooled clone would be set up untimed too). Reported per scenario and
+N: sessions/s, p50/p99 per step, and the mean LLM tokens, RPC requests and
+gas per session (src.metrics). The EVM runs in this process, on the event
+loop, so chain time is serialized: compare runs with each other (e.g. with
+--output across commits), not with Anvil.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from benchmarks.fake_llm import CannedChatModel
+
+REQUESTS = {
+    "direct": "I want a $500 silk scarf",
+    "escrow": "I want a $1500 luxury watch",
+}
+
+# A session is ok if it ends in the expected status with at least one mined
+# transaction per on-chain step (the refund is sent outside the graph) and none reverted
+MIN_TRANSACTIONS = {"direct": 1, "escrow": 2, "finalize": 3, "refund": 2}
+
+# Replies by prompt (see the *_PROMPT templates in src/agents)
+RESPONSES = {
+    "Extract the item and amount": '{"item": "Luxury Watch", "amount": 1500}',
+    "Rules:": "Amount above the threshold and no Source of Funds on file. Status: PENDING.",
+    "Propose a split payment": "I propose 20% now and 80% in escrow until Source of Funds is provided.",
+    "offered an escrow split": "I accept the escrow split to move forward.",
+    "Source of Funds document": "Compliance check complete. The transaction is finalized.",
+}
+
+def percentile(samples, pct):
+    if len(samples) == 1:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method="inclusive")[pct - 1]
+
+def scenario_steps(scenario, document, escrows=None):
+    """[(step, async fn(thread_id))] and the status the session should end in.
+
+    escrows: {thread_id: SimpleEscrow address} to start the sessions with, if there's no factory."""
+    from src import sessions
+
+    escrows = escrows or {}
+    request = REQUESTS["direct" if scenario == "direct" else "escrow"]
+    steps = [("start", lambda thread_id: sessions.astart_payment(thread_id, request,
+                                                                 escrow_address=escrows.get(thread_id)))]
+    if scenario == "direct":
+        return steps, "PASS"
+    steps.append(("accept", sessions.aaccept_escrow))
+    if scenario == "finalize":
+        steps.append(("sof", lambda thread_id: sessions.asubmit_sof(thread_id, document)))
+        return steps, "PASS"
+    if scenario == "refund":
+        steps.append(("refund", sessions.arefund))
+    return steps, "ESCROW_ACTIVE"
+
+async def run_level(scenario, concurrency, document, run_id, deploy_escrow=None):
+    from src import sessions
+    from src.metrics import instrumentation
+
+    thread_ids = [f"{run_id}-{scenario}-{concurrency}-{i}" for i in range(concurrency)]
+    escrows = {thread_id: deploy_escrow() for thread_id in thread_ids} if deploy_escrow else None
+    steps, expected = scenario_steps(scenario, document, escrows)
+    latencies = {step: [] for step, _ in steps}
+    failed = set()
+
+    async def timed(step, fn, thread_id):
+        start = time.perf_counter()
+        try:
+            await fn(thread_id)
+        except Exception as e:
+            failed.add(thread_id)
+            print(f"  {thread_id} {step}: {type(e).__name__}: {e}")
+        latencies[step].append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for step, fn in steps:
+        await asyncio.gather(*(timed(step, fn, thread_id) for thread_id in thread_ids if thread_id not in failed))
+    elapsed = time.perf_counter() - start
+
+    traces = [instrumentation.summary(thread_id) or {} for thread_id in thread_ids]
+    ok = 0
+    for thread_id, trace in zip(thread_ids, traces):
+        summary = await sessions.asummary(thread_id)
+        transactions = trace.get("transactions", [])
+        if (thread_id not in failed and summary and summary["status"] == expected
+                and len(transactions) >= MIN_TRANSACTIONS[scenario]
+                and all(tx["status"] == "success" for tx in transactions)):
+            ok += 1
+
+    def mean(key):
+        return statistics.fmean(trace.get(key, 0) for trace in traces)
+
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "sessions_per_s": concurrency / elapsed,
+        "elapsed_s": elapsed,
+        "ok": ok,
+        "steps": {step: {"p50_ms": percentile(values, 50) * 1000, "p99_ms": percentile(values, 99) * 1000}
+                  for step, values in latencies.items() if values},
+        "per_session": {key: mean(key) for key in ("tokens_in", "tokens_out", "rpc_calls", "gas_used")},
+    }
+
+def report(result):
+    steps = "  ".join(f"{step} {s['p50_ms']:7.1f}/{s['p99_ms']:7.1f}ms" for step, s in result["steps"].items())
+    per = result["per_session"]
+    print(f"{result['scenario']:<9} x{result['concurrency']:<4} {result['sessions_per_s']:8.2f} sessions/s  "
+          f"ok {result['ok']}/{result['concurrency']}  {steps}  "
+          f"rpc {per['rpc_calls']:.1f}  gas {per['gas_used']:,.0f}  tokens {per['tokens_in']:.0f}/{per['tokens_out']:.0f}")
+
+def reset_source_of_funds(chain):
+    """Clears the buyer's on-chain SoF (finalize sets it), so the next run starts PENDING again."""
+    from src import config
+    from src.blockchain.contracts import contracts
+    from src.blockchain.credentials import credential_cache
+
+    registry = chain.w3.eth.contract(address=config.ADDRS["IdentityRegistry"], abi=contracts.abi("IdentityRegistry"))
+    chain.transact(registry.functions.setSourceOfFunds(config.ADDRS["Buyer"], b"\0" * 32), config.COMPLIANCE_PK)
+    credential_cache.invalidate(config.ADDRS["IdentityRegistry"], config.ADDRS["Buyer"])
+
+async def run_all(chain, args, document):
+    from src import config
+
+    # One event loop for every level: the async clients' locks and pools belong to it
+    run_id = f"e2e{int(time.time())}"
+    deploy_escrow = None
+    if "SimpleEscrowFactory" not in config.ADDRS:
+        def deploy_escrow():
+            return chain.deploy_shared_escrow(config.ADDRS["DemoSGD"], config.ADDRS["Buyer"], config.ADDRS["Seller"]).address
+    # First use builds caches and starts the watchers and the escrow pool
+    for i in range(args.warmup):
+        await run_level("direct", 1, document, f"{run_id}-warmup{i}")
+    for scenario in args.scenarios:
+        for concurrency in args.concurrency:
+            result = await run_level(scenario, concurrency, document, run_id,
+                                     None if scenario == "direct" else deploy_escrow)
+            report(result)
+            if args.output:
+                with open(args.output, "a") as f:
+                    f.write(json.dumps(result) + "\n")
+            if scenario == "finalize":
+                reset_source_of_funds(chain)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--scenarios", nargs="+", default=["direct", "escrow", "finalize", "refund"],
+                        choices=["direct", "escrow", "finalize", "refund"])
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--warmup", type=int, default=1, help="untimed direct sessions first")
+    parser.add_argument("--output", help="append one JSON line per result")
+    args = parser.parse_args()
+
+    # Checkpoints and the event index in a scratch directory (read when src.config is imported)
+    scratch = tempfile.mkdtemp(prefix="bench_e2e_")
+    os.environ.setdefault("CHECKPOINT_PATH", os.path.join(scratch, "checkpoints.sqlite"))
+    os.environ.setdefault("EVENT_INDEX_PATH", os.path.join(scratch, "events.sqlite"))
+
+    from benchmarks.evm import InProcessChain
+
+    chain = InProcessChain()
+    chain.install(chain.deploy_demo_suite(buyer_balance=10**9))
+    for name, sources in chain.stale_sources().items():
+        print(f"note: out/ has {name} from before changes to {', '.join(sources)}; run `forge build` to measure them")
+
+    # Only now: these bind the clients and CHAIN_ID on import
+    import src.agents.tools as tools
+    from src.graph import get_app_graph
+
+    tools.set_llm(CannedChatModel(responses=RESPONSES, default="Understood.", latency=args.llm_latency))
+    get_app_graph()
+    with open("mock_sof.txt") as f:
+        document = f.read()
+
+    asyncio.run(run_all(chain, args, document))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Cold-start import time of the entry modules (`python -X importtime`).
+
+Usage: python -m benchmarks.bench_import_time [--runs 3] [--top 8] [--max-ms 0] [module ...]
+
+Each module is imported in a fresh interpreter. The report shows the median
+cumulative import time and which top-level packages it spent it in (summed
+self time). Use `--max-ms` in CI: the exit status is 1 if any module takes
+longer.
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+from collections import Counter
+
+MODULES = [
+    "src.config",
+    "src.agents.tools",
+    "src.blockchain.client",
+    "src.graph",
+    "src.sessions",
+    "src.server",
+    "src.batch",
+]
+
+def import_profile(module):
+    """{imported module: (self us, cumulative us)} from one `-X importtime` run."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True)
+    if result.returncode:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    profile = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        profile[name.strip()] = (int(self_us), int(cumulative_us))
+    return profile
+
+def by_package(profile):
+    packages = Counter()
+    for name, (self_us, _) in profile.items():
+        packages[name.split(".")[0]] += self_us
+    return packages
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("modules", nargs="*", default=MODULES)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=8)
+    parser.add_argument("--max-ms", type=float, default=0, help="fail if a module's median exceeds this")
+    args = parser.parse_args()
+
+    slow = []
+    for module in args.modules:
+        profiles = [import_profile(module) for _ in range(args.runs)]
+        median_ms = statistics.median(p[module][1] for p in profiles) / 1000
+        packages = by_package(profiles[-1])
+        print(f"{module:<24} {median_ms:8.0f} ms  ({len(profiles[-1])} modules)")
+        for package, self_us in packages.most_common(args.top):
+            print(f"    {package:<28} {self_us / 1000:8.1f} ms")
+        if args.max_ms and median_ms > args.max_ms:
+            slow.append(module)
+
+    if slow:
+        print(f"Over {args.max_ms:.0f} ms: {', '.join(slow)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Per-node latency of the first graph phase, sequential vs. parallel intent analysis.
+
+Usage: python -m benchmarks.bench_intent [--iterations 20] [--llm-latency 0.5]
+
+Runs analyze_intent -> evaluate_compliance -> propose_escrow with the Ollama
+model swapped for a canned response and prints the `node_latency` summary
+for each mode. The request is phrased so the intent parser can't read it and
+extraction needs the LLM; analyze_intent should drop from ~2x to ~1x the LLM
+latency.
+"""
+import argparse
+
+from langchain_core.messages import HumanMessage
+
+import src.agents.tools as tools
+from src.agents.intent import intent_extractor
+from src.graph import app_graph
+from src.metrics import node_latency
+from benchmarks.bench_compliance import SlowFakeChatModel
+
+def run(mode, parallel, iterations):
+    node_latency.reset()
+    for i in range(iterations):
+        config = {"configurable": {"thread_id": f"{mode}-{i}", "parallel_intent": parallel}}
+        inputs = {
+            "messages": [HumanMessage(content="That luxury watch from the catalogue, fifteen hundred or so")],
+            "ledger": {},
+            "buyer_credentials": {"has_sanctions": True, "has_sof": False},
+            "buyer_intent": {},
+            "negotiation_log": [],
+        }
+        for _ in app_graph.stream(inputs, config):
+            pass
+
+    print(f"[{mode}]")
+    for name, stats in node_latency.summary().items():
+        print(f"  {name:<26} p50={stats['p50_ms']:9.2f}ms  p99={stats['p99_ms']:9.2f}ms  n={stats['count']}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    args = parser.parse_args()
+
+    tools.set_llm(SlowFakeChatModel(
+        responses=['{"item": "Luxury Watch", "amount": 1500}'],
+        latency=args.llm_latency,
+    ))
+
+    run("sequential", False, args.iterations)
+    run("parallel", True, args.iterations)
+    print(f"intent parser: {intent_extractor.stats()}")
+
+if __name__ == "__main__":
+    main()
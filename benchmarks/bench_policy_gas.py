@@ -0,0 +1,70 @@
+"""Policy pipeline gas as the number of policies grows, on whatever out/ holds.
+
+Usage: python -m benchmarks.bench_policy_gas [--counts 1 2 4 8 16 31]
+
+The in-process counterpart of solidity/test/PolicyGas.t.sol for when forge
+can't run the test: each manager gets `count - 1` SanctionsPolicy instances
+(PASS for the buyer) and one SourceOfFundsPolicy, the most expensive, which
+is PENDING for $1500 without Source of Funds. For every count it reports
+transaction gas for
+    runPolicies            the policy run alone (eth_estimateGas)
+    payWithAuthorization   the PENDING payment, which stores the attestation
+    FAIL                   runPolicies for a payer without a sanctions check
+and the attestation overhead (payWithAuthorization - runPolicies), which
+stays flat with the bitmap manager but grows with every policy when the
+results are copied into storage. Compare runs before and after `forge build`.
+"""
+import argparse
+
+from web3 import Web3
+
+from benchmarks.evm import InProcessChain
+from src import config
+from src.blockchain.contracts import contracts
+
+AMOUNT = 1500 * 10**6
+SELLER = Web3.to_checksum_address("0x" + "5e" * 20)
+UNSANCTIONED = Web3.to_checksum_address("0x" + "ba" * 20)
+
+def manager_with(chain, registry, count):
+    manager = chain.deploy("PolicyManager", registry)
+    costed = contracts.has_function("PolicyManager", "addPolicy(address,uint256)")
+    policies = [(chain.deploy("SanctionsPolicy"), cost + 1) for cost in range(count - 1)]
+    policies.append((chain.deploy("SourceOfFundsPolicy", 1000 * 10**6), count))
+    for policy, cost in policies:
+        add = manager.functions.addPolicy(policy.address, cost) if costed else manager.functions.addPolicy(policy.address)
+        chain.transact(add, config.COMPLIANCE_PK)
+    return manager
+
+def measure(chain, token, registry, buyer, count):
+    manager = manager_with(chain, registry, count)
+    wrapper = chain.deploy("PolicyWrapper", token, manager.address)
+    sender = {"from": chain.w3.eth.accounts[0]}
+
+    run_gas = manager.functions.runPolicies((token, buyer, SELLER, AMOUNT, b"")).estimate_gas(sender)
+    fail_gas = manager.functions.runPolicies((token, UNSANCTIONED, SELLER, AMOUNT, b"")).estimate_gas(sender)
+    # PENDING returns before the token transfer, so the signature isn't checked
+    pay = wrapper.functions.payWithAuthorization(
+        buyer, SELLER, AMOUNT, 0, 2**256 - 1, Web3.keccak(text=f"bench-{count}"), 27, bytes(32), bytes(32)
+    )
+    pay_gas = chain.transact(pay, config.COMPLIANCE_PK)["gasUsed"]
+    return run_gas, pay_gas, fail_gas
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--counts", type=int, nargs="+", default=[1, 2, 4, 8, 16, 31])
+    args = parser.parse_args()
+
+    chain = InProcessChain()
+    addresses = chain.deploy_demo_suite()
+    for name, sources in chain.stale_sources().items():
+        print(f"note: out/ has {name} from before changes to {', '.join(sources)}; run `forge build` to measure them")
+    token, registry, buyer = addresses["DemoSGD"], addresses["IdentityRegistry"], addresses["Buyer"]
+
+    print(f"{'policies':>8} {'runPolicies':>12} {'payWithAuthorization':>21} {'FAIL':>10} {'attestation':>12}")
+    for count in args.counts:
+        run_gas, pay_gas, fail_gas = measure(chain, token, registry, buyer, count)
+        print(f"{count:>8} {run_gas:>12,} {pay_gas:>21,} {fail_gas:>10,} {pay_gas - run_gas:>12,}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""EIP-3009 authorization signing throughput: typed-data vs cached signer vs process pool.
+
+Usage: python -m benchmarks.bench_signing [--count 2000] [--processes 4]
+"""
+import argparse
+import time
+
+from eth_account import Account
+
+from src.config import ADDRS, BUYER_PK, CHAIN_ID
+from src.blockchain.utils import TransferAuthorizationSigner
+
+TOKEN = ADDRS.get("DemoSGD", "0x5FbDB2315678afecb367f032d93F642f64180aa3")
+WRAPPER = ADDRS.get("PolicyWrapper", "0xa513E6E4b8f2a923D98304ec87F64353C4D5C853")
+
+def sign_typed_data(value):
+    """The previous implementation: rebuild domain/types and the account per call."""
+    account = Account.from_key(BUYER_PK)
+    domain = {"name": "Demo Singapore Dollar", "version": "1", "chainId": CHAIN_ID, "verifyingContract": TOKEN}
+    types = {"TransferWithAuthorization": [
+        {"name": "from", "type": "address"},
+        {"name": "to", "type": "address"},
+        {"name": "value", "type": "uint256"},
+        {"name": "validAfter", "type": "uint256"},
+        {"name": "validBefore", "type": "uint256"},
+        {"name": "nonce", "type": "bytes32"},
+    ]}
+    message = {"from": account.address, "to": WRAPPER, "value": value, "validAfter": 0,
+               "validBefore": 2**256 - 1, "nonce": value.to_bytes(32, "big")}
+    return account.sign_typed_data(domain, types, message)
+
+def report(label, count, fn):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {count / elapsed:10,.0f} sig/s  ({elapsed:.2f}s for {count})")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--processes", type=int, default=None)
+    args = parser.parse_args()
+
+    signer = TransferAuthorizationSigner(TOKEN, BUYER_PK)
+    requests = [{"to": WRAPPER, "value": i} for i in range(args.count)]
+
+    report("typed data (per call)", args.count, lambda: [sign_typed_data(i) for i in range(args.count)])
+    report("cached signer", args.count, lambda: [signer.sign(**r) for r in requests])
+    signer.sign_many(requests[:256], processes=args.processes)  # warm the pool
+    report("sign_many (process pool)", args.count, lambda: signer.sign_many(requests, processes=args.processes))
+    signer.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Gas and latency of the escrow mediation: three transactions vs. settleSplit.
+
+Usage: python -m benchmarks.bench_split_settlement [--iterations 20] [--in-process]
+
+Runs against Anvil with the demo suite deployed, or with --in-process on an
+eth-tester chain with the suite deployed from out/ (benchmarks/evm.py). Each
+iteration creates a PENDING $1500 payment (as node_evaluate_compliance does),
+then runs the mediation built by the escrow node: resolvePending +
+payWithAuthorization + fundWithAuthorization, or one settleSplit call when
+the deployed wrapper has it. Without an escrow pool every mediation gets a
+new SimpleEscrow (in-process; on Anvil the shared one can only be funded
+once). Latency is from the first send to the last receipt; gas is summed
+over the mediation's transactions.
+"""
+import argparse
+import statistics
+import time
+
+def mediate(split, new_escrow=None):
+    from src.config import ADDRS, COMPLIANCE_PK
+    from src.blockchain.client import get_contract
+    from src.blockchain.confirmations import confirmation_tracker
+    from src.blockchain.escrow_pool import get_escrow_pool
+    from src.blockchain.nonces import send_transaction
+    from src.agents.compliance import _escrow_calls, _submit_payment
+
+    status, tx_id, _ = _submit_payment(1500)
+    assert status == "PENDING", f"expected a PENDING payment, got {status}"
+    state = {"buyer_intent": {"amount": 1500}, "transaction_id": tx_id}
+    pool = get_escrow_pool()
+    if pool:
+        escrow_addr, pooled = pool.acquire(), True
+    else:
+        escrow_addr, pooled = (new_escrow() if new_escrow else ADDRS["SimpleEscrow"]), False
+
+    start = time.perf_counter()
+    calls, _ = _escrow_calls(state, get_contract, escrow_addr, pooled, split)
+    tx_hashes = [send_transaction(call, COMPLIANCE_PK, params) for call, params in calls]
+    receipts = confirmation_tracker.wait_all(tx_hashes)
+    elapsed = time.perf_counter() - start
+    assert all(r["status"] == 1 for r in receipts), "mediation reverted"
+    return elapsed, sum(r["gasUsed"] for r in receipts), len(calls)
+
+def run(name, split, iterations, new_escrow=None):
+    results = [mediate(split, new_escrow) for _ in range(iterations)]
+    latencies = [elapsed * 1000 for elapsed, _, _ in results]
+    gas = statistics.mean(g for _, g, _ in results)
+    print(f"{name:<12} {results[0][2]} txs  {gas:10,.0f} gas  p50 {statistics.median(latencies):7.1f} ms  max {max(latencies):7.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--in-process", action="store_true", help="eth-tester chain instead of Anvil")
+    args = parser.parse_args()
+
+    new_escrow = None
+    if args.in_process:
+        from benchmarks.evm import InProcessChain
+
+        chain = InProcessChain()
+        chain.install(chain.deploy_demo_suite())
+        for name, sources in chain.stale_sources().items():
+            print(f"note: out/ has {name} from before changes to {', '.join(sources)}; run `forge build` to measure them")
+
+        def new_escrow():
+            from src.config import ADDRS
+            return chain.deploy_shared_escrow(ADDRS["DemoSGD"], ADDRS["Buyer"], ADDRS["Seller"]).address
+
+    # Only now: these bind the clients on import
+    from src.config import ADDRS, COMPLIANCE_PK
+    from src.blockchain.client import get_contract, is_connected
+    from src.blockchain.confirmations import confirmation_tracker
+    from src.blockchain.nonces import send_transaction
+    from src.agents.compliance import _split_settlement_supported
+
+    if not (is_connected() and ADDRS):
+        raise SystemExit("Start Anvil and deploy the demo suite first (buyer without Source of Funds), or use --in-process.")
+
+    # Each mediation moves $1500 from the buyer (the demo token's mint is open)
+    token = get_contract("DemoSGD")
+    tx_hash = send_transaction(token.functions.mint(ADDRS["Buyer"], 2 * args.iterations * 1500 * 10**6), COMPLIANCE_PK)
+    confirmation_tracker.wait_all([tx_hash])
+
+    run("three-tx", False, args.iterations, new_escrow)
+    if _split_settlement_supported():
+        run("settleSplit", True, args.iterations, new_escrow)
+    else:
+        print("settleSplit: not in the deployed wrapper (forge build, then redeploy the demo suite)")
+
+if __name__ == "__main__":
+    main()
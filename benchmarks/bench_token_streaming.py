@@ -0,0 +1,66 @@
+"""Render calls, payload and CPU for streaming a long LLM response into Streamlit.
+
+Usage: python -m benchmarks.bench_token_streaming [--tokens 2000] [--rate 50]
+
+Tokens arrive at `--rate` per second on a simulated clock (no sleeping), and
+each render goes through a real `st.empty().markdown` (bare mode, no browser).
+"per token" renders the whole text on every token, as the UI used to;
+"coalesced" uses the STREAM_FLUSH_INTERVAL / STREAM_FLUSH_CHARS defaults.
+"""
+import argparse
+import logging
+import random
+import time
+from types import SimpleNamespace
+
+import streamlit as st
+
+from src.streaming import CoalescingTokenStreamer
+
+class Streamer(CoalescingTokenStreamer):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.placeholder = st.empty()
+        self.payload = 0
+
+    def render(self, text, final):
+        body = f"**{self.agent_name}:**\n\n {text}{'' if final else '▌'}"
+        self.payload += len(body.encode())
+        self.placeholder.markdown(body)
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def run(label, tokens, rate, **kwargs):
+    clock = Clock()
+    streamer = Streamer(clock=clock, **kwargs)
+    start = time.process_time()
+    streamer.on_llm_start({}, [], tags=["Compliance Agent"])
+    for token in tokens:
+        clock.now += 1 / rate
+        streamer.on_llm_new_token(token)
+    streamer.on_llm_end(SimpleNamespace(generations=[[SimpleNamespace(text=streamer.text)]]))
+    cpu = time.process_time() - start
+    print(f"{label:<10} {streamer.renders:6,} renders  {streamer.payload / 1e6:8.2f} MB sent  {cpu * 1000:8.1f} ms CPU")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tokens", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=50, help="Tokens per second from the LLM")
+    args = parser.parse_args()
+    # No ScriptRunContext in bare mode; Streamlit warns on every call
+    logging.disable(logging.WARNING)
+
+    rng = random.Random(0)
+    words = "the buyer source of funds policy escrow tranche compliance settlement amount verified".split()
+    tokens = [(" " if i else "") + rng.choice(words) for i in range(args.tokens)]
+
+    run("per token", tokens, args.rate, interval=0, max_chars=0)
+    run("coalesced", tokens, args.rate)
+
+if __name__ == "__main__":
+    main()
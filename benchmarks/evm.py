@@ -0,0 +1,190 @@
+"""In-process EVM (eth-tester + py-evm) with the demo suite deployed from out/.
+
+    chain = InProcessChain()
+    addresses = chain.deploy_demo_suite()  # as solidity/script/DeployDemoSuite.s.sol
+    chain.install(addresses)               # before importing the graph
+
+`install` points `src.config.ADDRS`/`CHAIN_ID` at the chain and swaps the
+shared web3 clients for failover providers over it, so RPC counts, retries
+and caching behave as they do against Anvil; blocks are mined on every
+transaction, and one sent ahead of its sender's nonce waits for the gap to
+fill, as in a node's queue. Needs `pip install "eth-tester[py-evm]"` and a
+`forge build` (artifacts whose bytecode doesn't match their ABI raise
+`StaleArtifact`).
+Whatever out/ holds is deployed: with a build that predates the policy
+ordering (`addPolicy(address)`) the policies are added in the script's order,
+and without a SimpleEscrowFactory artifact there is no escrow pool.
+"""
+import re
+import threading
+
+from eth_account import Account
+from eth_utils import keccak
+from web3 import AsyncWeb3, Web3
+from web3.providers.eth_tester import EthereumTesterProvider
+
+from src import config
+from src.blockchain.contracts import contracts
+
+URL = "eth-tester://in-process"
+ZERO_ADDRESS = "0x" + "00" * 20
+_NONCE_AHEAD = re.compile(r"Invalid transaction nonce: Expected (\d+), but got (\d+)")
+
+class TesterEndpoint:
+    """Raw JSON-RPC endpoint over an EthereumTester (through web3's tester middleware).
+
+    eth-tester isn't thread-safe, so requests from the sessions' threads and
+    the event loop take turns. It also mines on arrival and rejects a nonce
+    ahead of the sender's next one, where a node queues it until the gap is
+    filled: concurrent sends reach the chain out of nonce order, so they're
+    queued here the same way and mined once the earlier nonces are."""
+
+    def __init__(self, w3):
+        self.w3 = w3
+        self._lock = threading.Lock()
+        self._queued = {}  # sender -> {nonce: raw transaction}
+
+    def make_request(self, method, params):
+        with self._lock:
+            if method == "eth_sendRawTransaction":
+                return self._send_raw(params)
+            return self.w3.manager._make_request(method, params)
+
+    def _send_raw(self, params):
+        try:
+            response = self.w3.manager._make_request("eth_sendRawTransaction", params)
+        except Exception as e:
+            ahead = _NONCE_AHEAD.search(str(e))
+            if not ahead or int(ahead[2]) < int(ahead[1]):
+                raise
+            raw = bytes.fromhex(params[0][2:])
+            self._queued.setdefault(Account.recover_transaction(raw), {})[int(ahead[2])] = params[0]
+            return {"jsonrpc": "2.0", "id": 0, "result": "0x" + keccak(raw).hex()}
+        self._flush(Account.recover_transaction(params[0]))
+        return response
+
+    def _flush(self, sender):
+        queued = self._queued.get(sender)
+        while queued:
+            nonce = self.w3.eth.get_transaction_count(sender)
+            if nonce not in queued:
+                break
+            try:
+                self.w3.manager._make_request("eth_sendRawTransaction", [queued.pop(nonce)])
+            except Exception:
+                pass  # dropped, as a node drops an invalid transaction
+
+    def make_batch_request(self, requests):
+        return [self.make_request(method, params) for method, params in requests]
+
+class AsyncTesterEndpoint:
+    """The same endpoint for AsyncWeb3; the EVM runs on the event loop either way."""
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+
+    async def make_request(self, method, params):
+        return self.endpoint.make_request(method, params)
+
+    async def make_batch_request(self, requests):
+        return self.endpoint.make_batch_request(requests)
+
+class InProcessChain:
+    def __init__(self):
+        from eth_tester import EthereumTester, PyEVMBackend
+
+        self.tester = EthereumTester(PyEVMBackend())
+        self.w3 = Web3(EthereumTesterProvider(self.tester))
+        self.chain_id = self.w3.eth.chain_id
+        self.deployed = []  # artifact names, in deployment order
+
+    def fund(self, *addresses, value=10**21):
+        """Gas money from the tester's prefunded account."""
+        root = self.w3.eth.accounts[0]
+        for address in addresses:
+            self.w3.eth.send_transaction({"from": root, "to": address, "value": value})
+
+    def transact(self, call, private_key):
+        """Signs and sends `call` (a contract function or constructor); returns the receipt."""
+        sender = Account.from_key(private_key)
+        tx = call.build_transaction({"from": sender.address, "nonce": self.w3.eth.get_transaction_count(sender.address)})
+        tx_hash = self.w3.eth.send_raw_transaction(sender.sign_transaction(tx).raw_transaction)
+        receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
+        if receipt["status"] != 1:
+            raise RuntimeError(f"Transaction reverted: {tx_hash.hex()}")
+        return receipt
+
+    def deploy(self, name, *args, private_key=config.COMPLIANCE_PK):
+        constructor = self.w3.eth.contract(abi=contracts.abi(name), bytecode=contracts.bytecode(name)).constructor(*args)
+        address = self.transact(constructor, private_key)["contractAddress"]
+        if name not in self.deployed:
+            self.deployed.append(name)
+        return self.w3.eth.contract(address=address, abi=contracts.abi(name))
+
+    def deploy_demo_suite(self, buyer_balance=10000):
+        """Deploys and sets up the suite like DeployDemoSuite.s.sol; returns deployed_addresses.json's shape."""
+        compliance, buyer, seller = (Account.from_key(pk).address
+                                     for pk in (config.COMPLIANCE_PK, config.BUYER_PK, config.SELLER_PK))
+        self.fund(compliance, buyer, seller)
+        pk = config.COMPLIANCE_PK
+
+        token = self.deploy("DemoSGD")
+        registry = self.deploy("IdentityRegistry")
+        sof_policy = self.deploy("SourceOfFundsPolicy", 1000 * 10**6)
+        sanctions_policy = self.deploy("SanctionsPolicy")
+        manager = self.deploy("PolicyManager", registry.address)
+        for policy, cost in ((sof_policy, 2), (sanctions_policy, 1)):
+            if contracts.has_function("PolicyManager", "addPolicy(address,uint256)"):
+                self.transact(manager.functions.addPolicy(policy.address, cost), pk)
+            else:
+                self.transact(manager.functions.addPolicy(policy.address), pk)
+        wrapper = self.deploy("PolicyWrapper", token.address, manager.address)
+        escrow = self.deploy_shared_escrow(token.address, buyer, seller)
+
+        self.transact(token.functions.mint(buyer, buyer_balance * 10**6), pk)
+        self.transact(registry.functions.setSanctionsCheck(buyer, Web3.keccak(text="VALID_SANCTIONS_PROOF")), pk)
+        addresses = {
+            "DemoSGD": token.address,
+            "IdentityRegistry": registry.address,
+            "PolicyManager": manager.address,
+            "PolicyWrapper": wrapper.address,
+            "SourceOfFundsPolicy": sof_policy.address,
+            "SanctionsPolicy": sanctions_policy.address,
+            "Buyer": buyer,
+            "Seller": seller,
+            "ComplianceAgent": compliance,
+            "SimpleEscrow": escrow.address,
+            "ChainId": self.chain_id,
+        }
+        if contracts.exists("SimpleEscrowFactory"):
+            escrow_impl = self.deploy("SimpleEscrow", *[ZERO_ADDRESS] * 3, 0, 0)
+            addresses["SimpleEscrowFactory"] = self.deploy("SimpleEscrowFactory", escrow_impl.address, token.address).address
+        return addresses
+
+    def deploy_shared_escrow(self, token, buyer, seller):
+        """A SimpleEscrow for one $1500 session when there's no factory; it can only be funded and closed once."""
+        expiry = self.w3.eth.get_block("latest")["timestamp"] + 1000 * 24 * 3600
+        return self.deploy("SimpleEscrow", token, buyer, seller, 1200 * 10**6, expiry)
+
+    def stale_sources(self):
+        """{artifact name: sources changed since forge built it} for what was deployed."""
+        return {name: stale for name in self.deployed if (stale := contracts.stale_sources(name))}
+
+    def clients(self):
+        """(w3, aw3) as src.blockchain.client builds them, over this chain."""
+        from src.blockchain.provider import AsyncFailoverHTTPProvider, FailoverHTTPProvider
+
+        endpoint = TesterEndpoint(self.w3)
+        w3 = Web3(FailoverHTTPProvider([URL], providers=[endpoint]))
+        aw3 = AsyncWeb3(AsyncFailoverHTTPProvider([URL], sync_provider=w3.provider,
+                                                  providers=[AsyncTesterEndpoint(endpoint)]))
+        return w3, aw3
+
+    def install(self, addresses):
+        """Makes the app use this chain; call before importing modules that bind `w3` or CHAIN_ID."""
+        from src.blockchain.client import set_clients
+
+        config.ADDRS.clear()
+        config.ADDRS.update(addresses)
+        config.CHAIN_ID = self.chain_id
+        set_clients(*self.clients())
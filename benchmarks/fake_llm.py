@@ -0,0 +1,44 @@
+"""Deterministic stand-in for the Ollama chat model.
+
+    tools.set_llm(CannedChatModel(responses={"Extract the item": '{"item": "Watch", "amount": 1500}'},
+                                  default="Understood.", latency=0.2))
+
+The reply is the first `responses` entry whose key occurs in the prompt
+(else `default`), so concurrent sessions get the same answers in any order,
+unlike FakeListChatModel's shared cursor. Each call waits `latency` seconds
+(asyncio.sleep on the async path, so it doesn't hold a worker thread) and
+reports word counts as token usage.
+"""
+import asyncio
+import time
+from typing import Dict
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+class CannedChatModel(BaseChatModel):
+    responses: Dict[str, str] = {}
+    default: str = "OK."
+    latency: float = 0.0
+
+    @property
+    def _llm_type(self):
+        return "canned"
+
+    def _reply(self, messages):
+        prompt = "\n".join(str(message.content) for message in messages)
+        text = next((reply for key, reply in self.responses.items() if key in prompt), self.default)
+        usage = {"input_tokens": len(prompt.split()), "output_tokens": len(text.split())}
+        usage["total_tokens"] = usage["input_tokens"] + usage["output_tokens"]
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text, usage_metadata=usage))])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        return self._reply(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._reply(messages)
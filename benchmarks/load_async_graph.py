@@ -0,0 +1,71 @@
+"""Throughput of concurrent sessions: sequential `stream` vs. concurrent `astream`.
+
+Usage: python -m benchmarks.load_async_graph [--sessions 50] [--llm-latency 0.2]
+
+Each session runs the graph up to the first interrupt (analyze_intent ->
+evaluate_compliance -> propose_escrow) on its own thread_id. The Ollama model
+is swapped for a canned response with the given delay, so the numbers show
+how much of the LLM/RPC wait the async nodes overlap.
+"""
+import argparse
+import asyncio
+import time
+
+from langchain_core.messages import HumanMessage
+
+import src.agents.tools as tools
+from src.graph import app_graph
+from benchmarks.bench_compliance import SlowFakeChatModel
+
+def session_input(i):
+    return {
+        "messages": [HumanMessage(content=f"I want a ${1000 + i} luxury watch")],
+        "ledger": {},
+        "buyer_credentials": {"has_sanctions": True, "has_sof": False},
+        "buyer_intent": {},
+        "negotiation_log": [],
+    }
+
+def run_sync(sessions):
+    for i in range(sessions):
+        for _ in app_graph.stream(session_input(i), {"configurable": {"thread_id": f"sync-{i}"}}):
+            pass
+
+async def run_session(i):
+    async for _ in app_graph.astream(session_input(i), {"configurable": {"thread_id": f"async-{i}"}}):
+        pass
+
+async def run_async(sessions, concurrency):
+    limit = asyncio.Semaphore(concurrency)
+
+    async def bounded(i):
+        async with limit:
+            await run_session(i)
+
+    await asyncio.gather(*(bounded(i) for i in range(sessions)))
+
+def report(mode, sessions, elapsed):
+    print(f"{mode:<22} {sessions / elapsed:8.2f} sessions/s  ({elapsed:.2f}s for {sessions})")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    tools.set_llm(SlowFakeChatModel(
+        responses=['{"item": "Luxury Watch", "amount": 1500} Status: PENDING.'],
+        latency=args.llm_latency,
+    ))
+
+    start = time.perf_counter()
+    run_sync(args.sessions)
+    report("sync stream", args.sessions, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    asyncio.run(run_async(args.sessions, args.concurrency))
+    report(f"astream x{args.concurrency}", args.sessions, time.perf_counter() - start)
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,7 @@ import "../src/demo/SourceOfFundsPolicy.sol";
 import "../src/demo/SanctionsPolicy.sol";
 import "../src/demo/SimplePolicyManager.sol";
 import "../src/demo/SimpleEscrow.sol";
+import "../src/demo/SimpleEscrowFactory.sol";
 import "../src/demo/X402PolicyWrapper.sol";
 
 contract DeployDemoSuite is Script {
@@ -44,8 +45,10 @@ contract DeployDemoSuite is Script {
 
         // 4. Deploy Manager & Register Policies
         SimplePolicyManager manager = new SimplePolicyManager(address(registry));
-        manager.addPolicy(address(sofPolicy));
-        manager.addPolicy(address(sanctionsPolicy));
+        // Cheapest first (relative cost): the sanctions check is one registry
+        // read and the only policy that FAILs; Source of Funds adds a threshold read
+        manager.addPolicy(address(sofPolicy), 2);
+        manager.addPolicy(address(sanctionsPolicy), 1);
 
         // 5. Deploy Wrapper
         X402PolicyWrapper wrapper = new X402PolicyWrapper(address(token), address(manager));
@@ -55,6 +58,11 @@ contract DeployDemoSuite is Script {
         // We use block.timestamp + 1000 days for expiry
         SimpleEscrow escrow = new SimpleEscrow(address(token), buyer, seller, 1200 * 1e6, block.timestamp + 1000 days);
 
+        // 5.6 Escrow factory: per-transaction clones of a blank implementation
+        // (the agents keep a pool of them, see src/blockchain/escrow_pool.py)
+        SimpleEscrow escrowImpl = new SimpleEscrow(address(0), address(0), address(0), 0, 0);
+        SimpleEscrowFactory escrowFactory = new SimpleEscrowFactory(address(escrowImpl), address(token));
+
         // 6. Setup State
         // Mint 10000 * 1e6 to Buyer (Matches Mock)
         token.mint(buyer, 10000 * 1e6);
@@ -76,6 +84,7 @@ contract DeployDemoSuite is Script {
         vm.serializeAddress(json1, "Seller", seller);
         vm.serializeAddress(json1, "ComplianceAgent", complianceAgent);
         vm.serializeAddress(json1, "SimpleEscrow", address(escrow));
+        vm.serializeAddress(json1, "SimpleEscrowFactory", address(escrowFactory));
         string memory finalJson = vm.serializeUint(json1, "ChainId", block.chainid);
 
         vm.writeJson(finalJson, "./deployed_addresses.json");
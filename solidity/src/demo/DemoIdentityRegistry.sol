@@ -7,12 +7,18 @@ contract DemoIdentityRegistry {
     // Wallet -> Check Hash
     mapping(address => bytes32) public sanctionsRef;
 
+    // Lets off-chain caches follow writes with one log filter (RegistryWatcher)
+    event SourceOfFundsSet(address indexed wallet, bytes32 ref);
+    event SanctionsCheckSet(address indexed wallet, bytes32 ref);
+
     function setSourceOfFunds(address wallet, bytes32 ref) external {
         sourceOfFundsRef[wallet] = ref;
+        emit SourceOfFundsSet(wallet, ref);
     }
 
     function setSanctionsCheck(address wallet, bytes32 ref) external {
         sanctionsRef[wallet] = ref;
+        emit SanctionsCheckSet(wallet, ref);
     }
 
     function hasSourceOfFunds(address wallet) external view returns (bool) {
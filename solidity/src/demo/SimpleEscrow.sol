@@ -17,6 +17,7 @@ contract SimpleEscrow {
     event Funded(address from, uint256 amount);
     event Released(address to, uint256 amount);
     event Refunded(address to, uint256 amount);
+    event Opened(address buyer, address seller, uint256 amount, uint256 expiresAt);
 
     constructor(
         address _token,
@@ -33,6 +34,31 @@ contract SimpleEscrow {
         admin = msg.sender;
     }
 
+    // --- Minimal proxy clones (SimpleEscrowFactory) ---
+    // Clones skip the constructor: the factory initializes token and admin,
+    // and the admin opens the escrow with its terms when it is handed out.
+
+    function initialize(address _token, address _admin) external {
+        require(admin == address(0), "Already initialized");
+        token = DemoSGD(_token);
+        admin = _admin;
+    }
+
+    function open(
+        address _buyer,
+        address _seller,
+        uint256 _amount,
+        uint256 _expiresAt
+    ) external {
+        require(msg.sender == admin, "Only admin");
+        require(buyer == address(0), "Already opened");
+        buyer = _buyer;
+        seller = _seller;
+        amount = _amount;
+        expiresAt = _expiresAt;
+        emit Opened(_buyer, _seller, _amount, _expiresAt);
+    }
+
     function fundWithAuthorization(
         uint256 validAfter,
         uint256 validBefore,
@@ -41,11 +67,21 @@ contract SimpleEscrow {
         bytes32 r,
         bytes32 s
     ) external {
+        require(buyer != address(0), "Not opened");
         require(!released && !refunded, "Already closed");
         token.transferWithAuthorization(buyer, address(this), amount, validAfter, validBefore, nonce, v, r, s);
         emit Funded(buyer, amount);
     }
 
+    // Funding by a contract settling on the buyer's behalf (X402PolicyWrapper.settleSplit)
+    function fundFrom(address payer) external {
+        require(msg.sender == payer, "Only payer");
+        require(buyer != address(0), "Not opened");
+        require(!released && !refunded, "Already closed");
+        token.transferFrom(payer, address(this), amount);
+        emit Funded(buyer, amount);
+    }
+
     function release() external {
         require(msg.sender == admin, "Only admin");
         require(!released && !refunded, "Already closed");
@@ -0,0 +1,40 @@
+// SPDX-License-Identifier: MIT
+pragma solidity ^0.8.20;
+
+import "./SimpleEscrow.sol";
+
+// Deploys SimpleEscrow instances as EIP-1167 minimal proxies (~45 bytes of
+// code each) so escrows can be created ahead of time in batches.
+contract SimpleEscrowFactory {
+    address public immutable implementation;
+    address public immutable token;
+
+    event EscrowCreated(address indexed escrow, address indexed admin);
+
+    constructor(address _implementation, address _token) {
+        implementation = _implementation;
+        token = _token;
+    }
+
+    function createEscrows(uint256 count, address admin) external returns (address[] memory escrows) {
+        escrows = new address[](count);
+        for (uint256 i = 0; i < count; i++) {
+            address escrow = _clone(implementation);
+            SimpleEscrow(escrow).initialize(token, admin);
+            escrows[i] = escrow;
+            emit EscrowCreated(escrow, admin);
+        }
+    }
+
+    // EIP-1167: delegatecalls everything to `impl`
+    function _clone(address impl) internal returns (address instance) {
+        assembly {
+            let ptr := mload(0x40)
+            mstore(ptr, 0x3d602d80600a3d3981f3363d3d373d3d3d363d73000000000000000000000000)
+            mstore(add(ptr, 0x14), shl(0x60, impl))
+            mstore(add(ptr, 0x28), 0x5af43d82803e903d91602b57fd5bf30000000000000000000000000000000000)
+            instance := create(0, ptr, 0x37)
+        }
+        require(instance != address(0), "Clone failed");
+    }
+}
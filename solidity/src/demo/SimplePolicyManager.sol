@@ -4,41 +4,70 @@ pragma solidity ^0.8.20;
 import "./IPolicySimple.sol";
 
 contract SimplePolicyManager {
+    // Results are packed 2 bits per policy into a uint64 (see runPolicies)
+    uint256 public constant MAX_POLICIES = 32;
+
     address public identityRegistry;
     IPolicySimple[] public policies;
+    uint256[] public policyCosts;
+    // Policy indexes, cheapest first, one byte each (byte 0 runs first)
+    uint256 public evaluationOrder;
 
     constructor(address _identityRegistry) {
         identityRegistry = _identityRegistry;
     }
 
-    function addPolicy(address policy) external {
+    // `cost` is a relative gas estimate for evaluate(); cheaper policies run
+    // first. Indexes in `policies` never move, so stored results stay readable.
+    function addPolicy(address policy, uint256 cost) external {
+        uint256 index = policies.length;
+        require(index < MAX_POLICIES, "Too many policies");
         policies.push(IPolicySimple(policy));
+        policyCosts.push(cost);
+
+        // Insert after every policy that costs the same or less
+        uint256 order = evaluationOrder;
+        uint256 position = index;
+        for (uint256 k = 0; k < index; k++) {
+            if (policyCosts[uint8(order >> (k * 8))] > cost) {
+                position = k;
+                break;
+            }
+        }
+        uint256 shift = position * 8;
+        uint256 low = order & ((uint256(1) << shift) - 1);
+        uint256 high = (order >> shift) << (shift + 8);
+        evaluationOrder = low | high | (index << shift);
     }
 
+    function policyCount() external view returns (uint256) {
+        return policies.length;
+    }
+
+    // Evaluates cheapest-first and stops at the first FAIL. `results` holds
+    // 2 bits per policy at bit (2 * index): 0 = not evaluated, else status + 1.
     function runPolicies(IPolicySimple.TxContext calldata ctx)
         external
         view
-        returns (IPolicySimple.Status overallStatus, IPolicySimple.PolicyResult[] memory results)
+        returns (IPolicySimple.Status overallStatus, uint64 results)
     {
-        results = new IPolicySimple.PolicyResult[](policies.length);
-        bool hasFail = false;
+        uint256 count = policies.length;
+        uint256 order = evaluationOrder;
+        address registry = identityRegistry;
         bool hasPending = false;
 
-        for (uint256 i = 0; i < policies.length; i++) {
-            results[i] = policies[i].evaluate(ctx, identityRegistry);
-            if (results[i].status == IPolicySimple.Status.FAIL) {
-                hasFail = true;
-            } else if (results[i].status == IPolicySimple.Status.PENDING) {
+        for (uint256 k = 0; k < count; k++) {
+            uint256 index = uint8(order >> (k * 8));
+            IPolicySimple.Status status = policies[index].evaluate(ctx, registry).status;
+            results |= uint64((uint256(status) + 1) << (index * 2));
+            if (status == IPolicySimple.Status.FAIL) {
+                return (IPolicySimple.Status.FAIL, results);
+            }
+            if (status == IPolicySimple.Status.PENDING) {
                 hasPending = true;
             }
         }
 
-        if (hasFail) {
-            overallStatus = IPolicySimple.Status.FAIL;
-        } else if (hasPending) {
-            overallStatus = IPolicySimple.Status.PENDING;
-        } else {
-            overallStatus = IPolicySimple.Status.PASS;
-        }
+        overallStatus = hasPending ? IPolicySimple.Status.PENDING : IPolicySimple.Status.PASS;
     }
 }
@@ -3,15 +3,30 @@ pragma solidity ^0.8.20;
 
 import "./DemoSGD.sol";
 import "./SimplePolicyManager.sol";
+import "./SimpleEscrow.sol";
 
 contract X402PolicyWrapper {
     DemoSGD public token;
     SimplePolicyManager public policyManager;
 
+    // One storage slot: the policy results are the manager's 2-bit bitmap
+    // (SimplePolicyManager.runPolicies) instead of a copied struct array
     struct Attestation {
         IPolicySimple.Status status;
-        IPolicySimple.PolicyResult[] results;
-        uint256 timestamp;
+        uint64 timestamp;
+        uint64 results;
+    }
+
+    // One EIP-3009 TransferWithAuthorization signed by the payer, to this wrapper
+    struct Authorization {
+        address from;
+        uint256 value;
+        uint256 validAfter;
+        uint256 validBefore;
+        bytes32 nonce;
+        uint8 v;
+        bytes32 r;
+        bytes32 s;
     }
 
     mapping(bytes32 => Attestation) public attestations;
@@ -19,6 +34,7 @@ contract X402PolicyWrapper {
 
     event TransactionAttested(bytes32 indexed transactionId, IPolicySimple.Status status);
     event TransactionCompleted(bytes32 indexed transactionId, address indexed from, address indexed to, uint256 amount);
+    event SplitSettled(bytes32 indexed transactionId, address indexed escrow, uint256 upfront, uint256 escrowed);
 
     constructor(address _token, address _policyManager) {
         token = DemoSGD(_token);
@@ -48,28 +64,8 @@ contract X402PolicyWrapper {
     ) external {
         bytes32 txId = calculateTransactionId(from, to, value, nonce);
 
-        // 1. Build TxContext
-        IPolicySimple.TxContext memory ctx = IPolicySimple.TxContext({
-            token: address(token),
-            from: from,
-            to: to,
-            amount: value,
-            extraData: ""
-        });
-
-        // 2. Run Policies
-        (IPolicySimple.Status status, IPolicySimple.PolicyResult[] memory results) = policyManager.runPolicies(ctx);
-
-        // 3. Store Attestation
-        Attestation storage att = attestations[txId];
-        att.status = status;
-        // Copy struct array is tricky in storage, need loop
-        for(uint i=0; i<results.length; i++) {
-            att.results.push(results[i]);
-        }
-        att.timestamp = block.timestamp;
-
-        emit TransactionAttested(txId, status);
+        // 1-3. Run policies and store the attestation
+        IPolicySimple.Status status = _attest(txId, from, to, value);
 
         // 4. Handle Outcome
         if (status == IPolicySimple.Status.FAIL) {
@@ -87,7 +83,7 @@ contract X402PolicyWrapper {
         }
     }
 
-    function resolvePending(bytes32 transactionId, bool failNow) external {
+    function resolvePending(bytes32 transactionId, bool failNow) public {
         // Simple admin check for demo
         // In reality, this might be restricted to the Compliance Agent or have more logic
         require(msg.sender == admin, "Only admin");
@@ -101,8 +97,92 @@ contract X402PolicyWrapper {
         }
     }
 
-    function getAttestation(bytes32 transactionId) external view returns (IPolicySimple.Status, IPolicySimple.PolicyResult[] memory) {
-        Attestation storage att = attestations[transactionId];
-        return (att.status, att.results);
+    // Escrow mediation in one transaction: fails the pending transaction
+    // (pendingId, skipped if zero), collects the payer's authorizations,
+    // settles `upfront` to `to` through the policies and funds the (opened)
+    // escrow with the rest. Everything reverts together.
+    // Admin only: the escrow is handed the escrowed tranche, so the caller
+    // must be trusted to pass a real SimpleEscrow (its getters are its own).
+    function settleSplit(
+        bytes32 pendingId,
+        address to,
+        SimpleEscrow escrow,
+        uint256 upfront,
+        Authorization[] calldata auths
+    ) external returns (bytes32 txId) {
+        require(msg.sender == admin, "Only admin");
+        require(auths.length > 0, "No authorization");
+        if (pendingId != bytes32(0)) {
+            resolvePending(pendingId, true);
+        }
+
+        address from = auths[0].from;
+        require(escrow.buyer() == from && escrow.seller() == to, "Escrow terms mismatch");
+        uint256 escrowed = escrow.amount();
+        require(_collect(auths) == upfront + escrowed, "Amount mismatch");
+
+        // Upfront tranche: same policy run and attestation as payWithAuthorization
+        txId = calculateTransactionId(from, to, upfront, auths[0].nonce);
+        require(_attest(txId, from, to, upfront) == IPolicySimple.Status.PASS, "Policy Check Failed");
+        token.transfer(to, upfront);
+        emit TransactionCompleted(txId, from, to, upfront);
+
+        // Escrow tranche
+        token.approve(address(escrow), escrowed);
+        escrow.fundFrom(address(this));
+        emit SplitSettled(txId, address(escrow), upfront, escrowed);
+    }
+
+    // Pulls every authorization into the wrapper; returns the total
+    function _collect(Authorization[] calldata auths) internal returns (uint256 total) {
+        for (uint256 i = 0; i < auths.length; i++) {
+            Authorization calldata a = auths[i];
+            require(a.from == auths[0].from, "Mixed payers");
+            token.transferWithAuthorization(a.from, address(this), a.value, a.validAfter, a.validBefore, a.nonce, a.v, a.r, a.s);
+            total += a.value;
+        }
+    }
+
+    function _attest(bytes32 txId, address from, address to, uint256 value) internal returns (IPolicySimple.Status status) {
+        // 1. Build TxContext
+        IPolicySimple.TxContext memory ctx = IPolicySimple.TxContext({
+            token: address(token),
+            from: from,
+            to: to,
+            amount: value,
+            extraData: ""
+        });
+
+        // 2. Run Policies (cheapest first, stops at the first FAIL)
+        uint64 results;
+        (status, results) = policyManager.runPolicies(ctx);
+
+        // 3. Store Attestation (a single SSTORE)
+        attestations[txId] = Attestation(status, uint64(block.timestamp), results);
+
+        emit TransactionAttested(txId, status);
+    }
+
+    // Unpacks the bitmap into results for the policies that were evaluated.
+    // Reasons aren't stored, so they are empty.
+    function getAttestation(bytes32 transactionId) external view returns (IPolicySimple.Status, IPolicySimple.PolicyResult[] memory results) {
+        Attestation memory att = attestations[transactionId];
+        uint256 count = policyManager.policyCount();
+        uint256 evaluated = 0;
+        for (uint256 i = 0; i < count; i++) {
+            if (((att.results >> (i * 2)) & 3) != 0) {
+                evaluated++;
+            }
+        }
+
+        results = new IPolicySimple.PolicyResult[](evaluated);
+        uint256 j = 0;
+        for (uint256 i = 0; i < count; i++) {
+            uint256 bits = (att.results >> (i * 2)) & 3;
+            if (bits != 0) {
+                results[j++] = IPolicySimple.PolicyResult(policyManager.policies(i).policyId(), IPolicySimple.Status(bits - 1), bytes32(0));
+            }
+        }
+        return (att.status, results);
     }
 }
@@ -0,0 +1,149 @@
+// SPDX-License-Identifier: MIT
+pragma solidity ^0.8.20;
+
+import "forge-std/Test.sol";
+import "../src/demo/DemoSGD.sol";
+import "../src/demo/DemoIdentityRegistry.sol";
+import "../src/demo/SimplePolicyManager.sol";
+import "../src/demo/X402PolicyWrapper.sol";
+
+// Fixed outcome, with one registry read like the demo policies
+contract FixedPolicy is IPolicySimple {
+    bytes32 public constant POLICY_ID = keccak256("FIXED_POLICY");
+    Status public outcome;
+
+    constructor(Status _outcome) {
+        outcome = _outcome;
+    }
+
+    function policyId() external pure override returns (bytes32) {
+        return POLICY_ID;
+    }
+
+    function evaluate(TxContext calldata ctx, address identityRegistry)
+        external
+        view
+        override
+        returns (PolicyResult memory)
+    {
+        DemoIdentityRegistry(identityRegistry).hasSanctionsCheck(ctx.from);
+        return PolicyResult(POLICY_ID, outcome, bytes32(0));
+    }
+}
+
+// forge test --match-contract PolicyGas -vv
+contract PolicyGasTest is Test {
+    DemoSGD token;
+    DemoIdentityRegistry registry;
+    address buyer = address(0xB0B);
+    address seller = address(0x5E11E4);
+
+    function setUp() public {
+        token = new DemoSGD();
+        registry = new DemoIdentityRegistry();
+    }
+
+    function _context() internal view returns (IPolicySimple.TxContext memory) {
+        return IPolicySimple.TxContext(address(token), buyer, seller, 1500 * 1e6, "");
+    }
+
+    // `count` PASS policies, the most expensive one PENDING, plus an optional
+    // FAIL policy declared cheapest (so it runs first)
+    function _manager(uint256 count, bool withFail) internal returns (SimplePolicyManager manager) {
+        manager = new SimplePolicyManager(address(registry));
+        for (uint256 i = 0; i < count; i++) {
+            IPolicySimple.Status status = i == count - 1 ? IPolicySimple.Status.PENDING : IPolicySimple.Status.PASS;
+            manager.addPolicy(address(new FixedPolicy(status)), i + 1);
+        }
+        if (withFail) {
+            manager.addPolicy(address(new FixedPolicy(IPolicySimple.Status.FAIL)), 0);
+        }
+    }
+
+    // Measure every call with cold accounts and slots, as in its own transaction
+    function _cool(SimplePolicyManager manager) internal {
+        uint256 count = manager.policyCount();
+        for (uint256 i = 0; i < count; i++) {
+            vm.cool(address(manager.policies(i)));
+        }
+        vm.cool(address(manager));
+        vm.cool(address(registry));
+    }
+
+    function _runGas(SimplePolicyManager manager) internal returns (uint256 gasUsed) {
+        IPolicySimple.TxContext memory ctx = _context();
+        _cool(manager);
+        uint256 before = gasleft();
+        manager.runPolicies(ctx);
+        gasUsed = before - gasleft();
+    }
+
+    // PENDING returns before the token transfer, so no signature is needed
+    function _attestGas(SimplePolicyManager manager, bytes32 nonce) internal returns (uint256 gasUsed) {
+        X402PolicyWrapper wrapper = new X402PolicyWrapper(address(token), address(manager));
+        _cool(manager);
+        vm.cool(address(wrapper));
+        uint256 before = gasleft();
+        wrapper.payWithAuthorization(buyer, seller, 1500 * 1e6, 0, type(uint256).max, nonce, 0, bytes32(0), bytes32(0));
+        gasUsed = before - gasleft();
+    }
+
+    function testEvaluationOrderIsCheapestFirst() public {
+        SimplePolicyManager manager = new SimplePolicyManager(address(registry));
+        manager.addPolicy(address(new FixedPolicy(IPolicySimple.Status.PASS)), 3);
+        manager.addPolicy(address(new FixedPolicy(IPolicySimple.Status.PASS)), 1);
+        manager.addPolicy(address(new FixedPolicy(IPolicySimple.Status.PASS)), 2);
+        manager.addPolicy(address(new FixedPolicy(IPolicySimple.Status.PASS)), 1);
+        // One byte per position: indexes 1, 3, 2, 0
+        assertEq(manager.evaluationOrder(), 0x00020301);
+
+        (IPolicySimple.Status status, uint64 results) = manager.runPolicies(_context());
+        assertEq(uint256(status), uint256(IPolicySimple.Status.PASS));
+        assertEq(uint256(results), 0x55); // 01 (PASS) for each of the four
+    }
+
+    function testStopsAtFirstFail() public {
+        SimplePolicyManager manager = _manager(4, true);
+        (IPolicySimple.Status status, uint64 results) = manager.runPolicies(_context());
+        assertEq(uint256(status), uint256(IPolicySimple.Status.FAIL));
+        // Only the FAIL policy (index 4) was evaluated: 10 (FAIL) at bits 8-9
+        assertEq(uint256(results), 2 << 8);
+    }
+
+    function testGetAttestationUnpacksResults() public {
+        SimplePolicyManager manager = _manager(3, false);
+        X402PolicyWrapper wrapper = new X402PolicyWrapper(address(token), address(manager));
+        wrapper.payWithAuthorization(buyer, seller, 1500 * 1e6, 0, type(uint256).max, bytes32(uint256(1)), 0, bytes32(0), bytes32(0));
+
+        bytes32 txId = wrapper.calculateTransactionId(buyer, seller, 1500 * 1e6, bytes32(uint256(1)));
+        (IPolicySimple.Status status, IPolicySimple.PolicyResult[] memory results) = wrapper.getAttestation(txId);
+        assertEq(uint256(status), uint256(IPolicySimple.Status.PENDING));
+        assertEq(results.length, 3);
+        assertEq(uint256(results[2].status), uint256(IPolicySimple.Status.PENDING));
+        assertEq(results[0].policyId, keccak256("FIXED_POLICY"));
+    }
+
+    // Gas as the number of policies grows: a full run, the same run plus the
+    // stored attestation, and a run that FAILs on the cheapest policy
+    function testGasByPolicyCount() public {
+        uint256[6] memory counts = [uint256(1), 2, 4, 8, 16, 31];
+        uint256 firstOverhead;
+        console.log("policies | runPolicies | payWithAuthorization | FAIL first");
+        for (uint256 i = 0; i < counts.length; i++) {
+            SimplePolicyManager manager = _manager(counts[i], false);
+            uint256 runGas = _runGas(manager);
+            uint256 attestGas = _attestGas(manager, bytes32(i));
+            uint256 failGas = _runGas(_manager(counts[i], true));
+            console.log(counts[i], runGas, attestGas, failGas);
+
+            // Storing the attestation costs the same for any number of policies
+            uint256 overhead = attestGas - runGas;
+            if (i == 0) {
+                firstOverhead = overhead;
+            } else {
+                assertApproxEqAbs(overhead, firstOverhead, 5000);
+                assertLt(failGas, runGas);
+            }
+        }
+    }
+}
@@ -0,0 +1,99 @@
+// SPDX-License-Identifier: MIT
+pragma solidity ^0.8.20;
+
+import "forge-std/Test.sol";
+import "../src/demo/DemoSGD.sol";
+import "../src/demo/SimpleEscrow.sol";
+import "../src/demo/SimpleEscrowFactory.sol";
+
+// forge test --match-contract SimpleEscrowFactory -vv
+contract SimpleEscrowFactoryTest is Test {
+    uint256 constant BUYER_PK = 0xB0B;
+    uint256 constant AMOUNT = 1200 * 1e6;
+
+    address buyer;
+    address seller = address(0x5E11E4);
+    DemoSGD token;
+    SimpleEscrowFactory factory;
+
+    function setUp() public {
+        buyer = vm.addr(BUYER_PK);
+        token = new DemoSGD();
+        // The implementation is never used directly: clones delegatecall into it
+        SimpleEscrow implementation = new SimpleEscrow(address(0), address(0), address(0), 0, 0);
+        factory = new SimpleEscrowFactory(address(implementation), address(token));
+        token.mint(buyer, 10_000 * 1e6);
+    }
+
+    function _clones(uint256 count) internal returns (SimpleEscrow[] memory escrows) {
+        address[] memory addresses = factory.createEscrows(count, address(this));
+        escrows = new SimpleEscrow[](count);
+        for (uint256 i = 0; i < count; i++) {
+            escrows[i] = SimpleEscrow(addresses[i]);
+        }
+    }
+
+    function _fund(SimpleEscrow escrow, bytes32 nonce) internal {
+        bytes32 structHash = keccak256(abi.encode(
+            token.TRANSFER_WITH_AUTHORIZATION_TYPEHASH(), buyer, address(escrow), AMOUNT, uint256(0), type(uint256).max, nonce
+        ));
+        bytes32 digest = keccak256(abi.encodePacked("\x19\x01", token.DOMAIN_SEPARATOR(), structHash));
+        (uint8 v, bytes32 r, bytes32 s) = vm.sign(BUYER_PK, digest);
+        escrow.fundWithAuthorization(0, type(uint256).max, nonce, v, r, s);
+    }
+
+    function testClonesAreMinimalProxies() public {
+        SimpleEscrow[] memory escrows = _clones(2);
+        bytes memory expected = abi.encodePacked(
+            hex"363d3d373d3d3d363d73", factory.implementation(), hex"5af43d82803e903d91602b57fd5bf3"
+        );
+        for (uint256 i = 0; i < escrows.length; i++) {
+            assertEq(address(escrows[i]).code, expected);
+            assertEq(address(escrows[i].token()), address(token));
+            assertEq(escrows[i].admin(), address(this));
+        }
+        assertTrue(address(escrows[0]) != address(escrows[1]));
+    }
+
+    function testCloneOpensFundsAndReleases() public {
+        SimpleEscrow escrow = _clones(1)[0];
+        escrow.open(buyer, seller, AMOUNT, block.timestamp + 30 days);
+        _fund(escrow, bytes32(uint256(1)));
+        assertEq(token.balanceOf(address(escrow)), AMOUNT);
+
+        escrow.release();
+        assertEq(token.balanceOf(seller), AMOUNT);
+        assertTrue(escrow.released());
+    }
+
+    function testCloneRefundsTheBuyer() public {
+        SimpleEscrow escrow = _clones(1)[0];
+        escrow.open(buyer, seller, AMOUNT, block.timestamp + 30 days);
+        _fund(escrow, bytes32(uint256(2)));
+        uint256 before = token.balanceOf(buyer);
+
+        escrow.refund();
+        assertEq(token.balanceOf(buyer), before + AMOUNT);
+    }
+
+    function testClonesDontShareState() public {
+        SimpleEscrow[] memory escrows = _clones(2);
+        escrows[0].open(buyer, seller, AMOUNT, block.timestamp + 30 days);
+        assertEq(escrows[1].buyer(), address(0));
+        assertEq(escrows[1].amount(), 0);
+    }
+
+    function testCloneCantBeReinitializedOrReopened() public {
+        SimpleEscrow escrow = _clones(1)[0];
+        vm.expectRevert(bytes("Already initialized"));
+        escrow.initialize(address(token), address(0xBAD));
+
+        escrow.open(buyer, seller, AMOUNT, block.timestamp + 30 days);
+        vm.expectRevert(bytes("Already opened"));
+        escrow.open(address(0xBAD), address(0xBAD), 1, block.timestamp + 30 days);
+
+        vm.prank(address(0xBAD));
+        vm.expectRevert(bytes("Only admin"));
+        escrow.open(buyer, seller, AMOUNT, block.timestamp + 30 days);
+    }
+}
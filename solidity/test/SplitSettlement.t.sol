@@ -0,0 +1,170 @@
+// SPDX-License-Identifier: MIT
+pragma solidity ^0.8.20;
+
+import "forge-std/Test.sol";
+import "../src/demo/DemoSGD.sol";
+import "../src/demo/DemoIdentityRegistry.sol";
+import "../src/demo/SanctionsPolicy.sol";
+import "../src/demo/SourceOfFundsPolicy.sol";
+import "../src/demo/SimplePolicyManager.sol";
+import "../src/demo/SimpleEscrow.sol";
+import "../src/demo/X402PolicyWrapper.sol";
+
+// Poses as an escrow: reports the buyer it was given and keeps whatever it is approved
+contract FakeEscrow {
+    DemoSGD token;
+    address public buyer;
+    address public seller;
+    uint256 public amount;
+
+    constructor(DemoSGD _token, address _buyer, address _seller, uint256 _amount) {
+        token = _token;
+        buyer = _buyer;
+        seller = _seller;
+        amount = _amount;
+    }
+
+    function fundFrom(address payer) external {
+        token.transferFrom(payer, address(this), amount);
+    }
+}
+
+// forge test --match-contract SplitSettlement -vv
+contract SplitSettlementTest is Test {
+    uint256 constant BUYER_PK = 0xB0B;
+    uint256 constant UPFRONT = 300 * 1e6;
+    uint256 constant ESCROWED = 1200 * 1e6;
+
+    address buyer;
+    address seller = address(0x5E11E4);
+    address attacker = address(0xBAD);
+    DemoSGD token;
+    DemoIdentityRegistry registry;
+    SimplePolicyManager manager;
+    SourceOfFundsPolicy sofPolicy;
+    SanctionsPolicy sanctionsPolicy;
+    X402PolicyWrapper wrapper;
+
+    function setUp() public {
+        buyer = vm.addr(BUYER_PK);
+        token = new DemoSGD();
+        registry = new DemoIdentityRegistry();
+        sofPolicy = new SourceOfFundsPolicy(1000 * 1e6);
+        sanctionsPolicy = new SanctionsPolicy();
+        manager = new SimplePolicyManager(address(registry));
+        manager.addPolicy(address(sofPolicy), 2);
+        manager.addPolicy(address(sanctionsPolicy), 1);
+        // Deployed by this contract, which is then the admin (the Compliance Agent)
+        wrapper = new X402PolicyWrapper(address(token), address(manager));
+        registry.setSanctionsCheck(buyer, keccak256("VALID_SANCTIONS_PROOF"));
+        token.mint(buyer, 10_000 * 1e6);
+    }
+
+    function _escrow() internal returns (SimpleEscrow) {
+        return new SimpleEscrow(address(token), buyer, seller, ESCROWED, block.timestamp + 30 days);
+    }
+
+    // EIP-3009 TransferWithAuthorization from the buyer, as sign_transfer_authorization does
+    function _sign(address to, uint256 value, bytes32 nonce) internal view returns (X402PolicyWrapper.Authorization memory) {
+        bytes32 structHash = keccak256(abi.encode(
+            token.TRANSFER_WITH_AUTHORIZATION_TYPEHASH(), buyer, to, value, uint256(0), type(uint256).max, nonce
+        ));
+        bytes32 digest = keccak256(abi.encodePacked("\x19\x01", token.DOMAIN_SEPARATOR(), structHash));
+        (uint8 v, bytes32 r, bytes32 s) = vm.sign(BUYER_PK, digest);
+        return X402PolicyWrapper.Authorization(buyer, value, 0, type(uint256).max, nonce, v, r, s);
+    }
+
+    function _auths(bytes32 nonce) internal view returns (X402PolicyWrapper.Authorization[] memory auths) {
+        auths = new X402PolicyWrapper.Authorization[](1);
+        auths[0] = _sign(address(wrapper), UPFRONT + ESCROWED, nonce);
+    }
+
+    // A $1500 payment without Source of Funds: attested PENDING, nothing moves
+    function _pending(bytes32 nonce) internal returns (bytes32) {
+        wrapper.payWithAuthorization(buyer, seller, UPFRONT + ESCROWED, 0, type(uint256).max, nonce, 0, bytes32(0), bytes32(0));
+        return wrapper.calculateTransactionId(buyer, seller, UPFRONT + ESCROWED, nonce);
+    }
+
+    // Cold accounts and slots before each measured call, as in its own transaction
+    function _cool(address escrow) internal {
+        vm.cool(address(token));
+        vm.cool(address(registry));
+        vm.cool(address(manager));
+        vm.cool(address(sofPolicy));
+        vm.cool(address(sanctionsPolicy));
+        vm.cool(address(wrapper));
+        vm.cool(escrow);
+    }
+
+    function testSettlesUpfrontAndFundsEscrow() public {
+        SimpleEscrow escrow = _escrow();
+        bytes32 pendingId = _pending(bytes32(uint256(1)));
+        wrapper.settleSplit(pendingId, seller, escrow, UPFRONT, _auths(bytes32(uint256(2))));
+
+        assertEq(token.balanceOf(seller), UPFRONT);
+        assertEq(token.balanceOf(address(escrow)), ESCROWED);
+        assertEq(token.balanceOf(address(wrapper)), 0);
+        (IPolicySimple.Status status,,) = wrapper.attestations(pendingId);
+        assertEq(uint256(status), uint256(IPolicySimple.Status.FAIL));
+    }
+
+    function testOnlyAdminCanSettle() public {
+        // A caller who saw the buyer's authorization can't route it to an escrow of their own
+        FakeEscrow fake = new FakeEscrow(token, buyer, attacker, ESCROWED);
+        X402PolicyWrapper.Authorization[] memory auths = _auths(bytes32(uint256(3)));
+        vm.prank(attacker);
+        vm.expectRevert(bytes("Only admin"));
+        wrapper.settleSplit(bytes32(0), attacker, SimpleEscrow(address(fake)), UPFRONT, auths);
+        assertEq(token.balanceOf(address(fake)), 0);
+    }
+
+    function testEscrowMustMatchThePayment() public {
+        SimpleEscrow escrow = new SimpleEscrow(address(token), buyer, attacker, ESCROWED, block.timestamp + 30 days);
+        X402PolicyWrapper.Authorization[] memory auths = _auths(bytes32(uint256(4)));
+        vm.expectRevert(bytes("Escrow terms mismatch"));
+        wrapper.settleSplit(bytes32(0), seller, escrow, UPFRONT, auths);
+    }
+
+    // resolvePending + payWithAuthorization + fundWithAuthorization, as execute_escrow sends them
+    function _threeTransactionGas() internal returns (uint256 gasUsed) {
+        SimpleEscrow escrow = _escrow();
+        bytes32 pendingId = _pending(bytes32(uint256(10)));
+        X402PolicyWrapper.Authorization memory up = _sign(address(wrapper), UPFRONT, bytes32(uint256(11)));
+        X402PolicyWrapper.Authorization memory down = _sign(address(escrow), ESCROWED, bytes32(uint256(12)));
+
+        _cool(address(escrow));
+        uint256 start = gasleft();
+        wrapper.resolvePending(pendingId, true);
+        gasUsed = start - gasleft();
+
+        _cool(address(escrow));
+        start = gasleft();
+        wrapper.payWithAuthorization(up.from, seller, up.value, up.validAfter, up.validBefore, up.nonce, up.v, up.r, up.s);
+        gasUsed += start - gasleft();
+
+        _cool(address(escrow));
+        start = gasleft();
+        escrow.fundWithAuthorization(down.validAfter, down.validBefore, down.nonce, down.v, down.r, down.s);
+        gasUsed += start - gasleft();
+    }
+
+    function _settleSplitGas() internal returns (uint256 gasUsed) {
+        SimpleEscrow escrow = _escrow();
+        bytes32 pendingId = _pending(bytes32(uint256(20)));
+        X402PolicyWrapper.Authorization[] memory auths = _auths(bytes32(uint256(21)));
+
+        _cool(address(escrow));
+        uint256 start = gasleft();
+        wrapper.settleSplit(pendingId, seller, escrow, UPFRONT, auths);
+        gasUsed = start - gasleft();
+    }
+
+    // Execution gas plus 21,000 intrinsic gas per transaction (calldata not included)
+    function testGasAgainstThreeTransactions() public {
+        uint256 threeTx = _threeTransactionGas() + 3 * 21000;
+        uint256 split = _settleSplitGas() + 21000;
+        console.log("three transactions:", threeTx);
+        console.log("settleSplit:       ", split);
+        assertLt(split, threeTx);
+    }
+}
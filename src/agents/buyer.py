@@ -1,70 +1,61 @@
+import asyncio
+import contextvars
 import json
+from concurrent.futures import ThreadPoolExecutor
 from langchain_core.runnables import RunnableConfig
 from src.state import GraphState
-from src.agents.tools import get_llm_chain, llm
-from src.config import ADDRS
+from src.agents.tools import get_llm_chain
+from src.agents.intent import intent_extractor
+from src.config import ADDRS, PARALLEL_INTENT
 from src.blockchain.client import is_connected, get_contract
-from src.blockchain.abis import REGISTRY_ABI
 
-def node_analyze_intent(state: GraphState, config: RunnableConfig):
-    """Buyer Agent: Parses user input into structured intent."""
-    print("--- BUYER AGENT: ANALYZING INTENT ---")
-    messages = state["messages"]
-    last_message = messages[-1].content
-    
-    # LLM Call for Extraction (No streaming callback to avoid ghost log)
-    chain = get_llm_chain(
-        "Extract the item and amount from this request: '{request}'. "
-        "Return JSON with keys 'item' (string) and 'amount' (float). "
-        "If unsure, default to item='Unknown' and amount=0."
-    )
-    
-    try:
-        # Run without config callbacks to keep this internal
-        # Explicitly disable callbacks to prevent the main graph streamer from attaching
-        response = chain.invoke({"request": last_message}, config={"callbacks": []})
-        
-        # Basic cleanup to find JSON
-        json_str = response[response.find("{"):response.rfind("}")+1]
-        data = json.loads(json_str)
-        item = data.get("item", "Luxury Watch")
-        amount = float(data.get("amount", 1500))
-    except Exception as e:
-        print(f"LLM Extraction Failed: {e}")
-        item = "Unknown"
-        amount = 0.0
+# Only needs the raw request and the credential flags, so it can stream while extraction runs
+THOUGHT_PROMPT = (
+    "You are a Buyer Agent. You received this purchase request: '{request}'. "
+    "Your Wallet Status: Sanctions Verified={has_sanctions}, Source of Funds Verified={has_sof}. "
+    "Think aloud about your current status and what credentials you are submitting with your transaction."
+)
 
+ACCEPTANCE_PROMPT = (
+    "You are a Buyer Agent. You have been offered an escrow split (20% now, 80% later). "
+    "You value privacy but want the item. Decide to accept the proposal to move forward. "
+    "Explain your reasoning (accepting the trade-off)."
+)
+
+# Extraction runs here while the thought streams on the calling thread (Streamlit callbacks)
+_extraction_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="intent-extraction")
+
+def _run_config(config):
+    # Merge config with tags
+    run_config = config.copy() if config else {}
+    run_config["tags"] = ["Buyer Agent"]
+    return run_config
+
+def _credentials(state):
     # Credentials from Graph State (Populated at init)
     creds = state.get("buyer_credentials", {"has_sanctions": False, "has_sof": False})
-    has_sanctions = creds.get("has_sanctions", False)
-    has_sof = creds.get("has_sof", False)
+    return creds.get("has_sanctions", False), creds.get("has_sof", False)
 
-    buyer_intent = {
+def _build_intent(state, item, amount):
+    has_sanctions, has_sof = _credentials(state)
+    return {
         "item": item,
         "amount": amount,
         "attached_vcs": {"sanctions": has_sanctions, "sof": has_sof}
     }
-    
-    # LLM Call for Thought
-    thought_chain = get_llm_chain(
-        "You are a Buyer Agent. You processed a request for '{item}' at ${amount}. "
-        "Your Wallet Status: Sanctions Verified={has_sanctions}, Source of Funds Verified={has_sof}. "
-        "Think aloud about your current status and what credentials you are submitting with your transaction."
-    )
-    
-    # Merge config with tags
-    run_config = config.copy() if config else {}
-    run_config["tags"] = ["Buyer Agent"]
-    thought = thought_chain.invoke({
-        "item": item, 
-        "amount": amount,
-        "has_sanctions": has_sanctions,
-        "has_sof": has_sof
-    }, config=run_config)
-    
+
+def _thought_inputs(state, request):
+    has_sanctions, has_sof = _credentials(state)
+    return {"request": request, "has_sanctions": has_sanctions, "has_sof": has_sof}
+
+def _parallel(config):
+    return (config or {}).get("configurable", {}).get("parallel_intent", PARALLEL_INTENT)
+
+def _intent_update(buyer_intent, thought):
+    item, amount = buyer_intent["item"], buyer_intent["amount"]
     # Format the intent as a markdown code block for the log
     intent_log = f"```json\n{json.dumps(buyer_intent, indent=2)}\n```"
-    
+
     return {
         "buyer_intent": buyer_intent,
         "active_agent": "Buyer Agent",
@@ -73,22 +64,63 @@ def node_analyze_intent(state: GraphState, config: RunnableConfig):
         "negotiation_log": [f"Buyer Agent: Initiating purchase for {item} (${amount}).", intent_log]
     }
 
-def node_negotiate_acceptance(state: GraphState, config: RunnableConfig):
-    """Buyer Agent: Accepts the proposal."""
-    print("--- BUYER AGENT: ACCEPTING ---")
-    
-    chain = get_llm_chain(
-        "You are a Buyer Agent. You have been offered an escrow split (20% now, 80% later). "
-        "You value privacy but want the item. Decide to accept the proposal to move forward. "
-        "Explain your reasoning (accepting the trade-off)."
-    )
-    
-    run_config = config.copy() if config else {}
-    run_config["tags"] = ["Buyer Agent"]
-    thought = chain.invoke({}, config=run_config)
-    
+def node_analyze_intent(state: GraphState, config: RunnableConfig):
+    """Buyer Agent: Parses user input into structured intent."""
+    print("--- BUYER AGENT: ANALYZING INTENT ---")
+    last_message = state["messages"][-1].content
+    thought_chain = get_llm_chain(THOUGHT_PROMPT, name="buyer_thought")
+    thought_inputs = _thought_inputs(state, last_message)
+
+    if _parallel(config):
+        # Critical path is max(extraction, thought) instead of the sum
+        extraction = _extraction_executor.submit(contextvars.copy_context().run, intent_extractor.extract, last_message)
+        thought = thought_chain.invoke(thought_inputs, config=_run_config(config))
+        item, amount = extraction.result()
+    else:
+        item, amount = intent_extractor.extract(last_message)
+        thought = thought_chain.invoke(thought_inputs, config=_run_config(config))
+
+    return _intent_update(_build_intent(state, item, amount), thought)
+
+async def anode_analyze_intent(state: GraphState, config: RunnableConfig):
+    """Buyer Agent: Parses user input into structured intent (async)."""
+    print("--- BUYER AGENT: ANALYZING INTENT ---")
+    last_message = state["messages"][-1].content
+    thought_chain = get_llm_chain(THOUGHT_PROMPT, name="buyer_thought")
+    thought_inputs = _thought_inputs(state, last_message)
+
+    if _parallel(config):
+        (item, amount), thought = await asyncio.gather(
+            intent_extractor.aextract(last_message),
+            thought_chain.ainvoke(thought_inputs, config=_run_config(config)),
+        )
+    else:
+        item, amount = await intent_extractor.aextract(last_message)
+        thought = await thought_chain.ainvoke(thought_inputs, config=_run_config(config))
+
+    return _intent_update(_build_intent(state, item, amount), thought)
+
+def _acceptance_update(thought):
     return {
         "active_agent": "Buyer Agent",
         "current_thought": f"Buyer Agent: {thought}",
         "negotiation_log": ["Buyer Agent: Proposal Accepted. Proceeding to smart contract."]
     }
+
+def node_negotiate_acceptance(state: GraphState, config: RunnableConfig):
+    """Buyer Agent: Accepts the proposal."""
+    print("--- BUYER AGENT: ACCEPTING ---")
+
+    chain = get_llm_chain(ACCEPTANCE_PROMPT, name="acceptance")
+    thought = chain.invoke({}, config=_run_config(config))
+
+    return _acceptance_update(thought)
+
+async def anode_negotiate_acceptance(state: GraphState, config: RunnableConfig):
+    """Buyer Agent: Accepts the proposal (async)."""
+    print("--- BUYER AGENT: ACCEPTING ---")
+
+    chain = get_llm_chain(ACCEPTANCE_PROMPT, name="acceptance")
+    thought = await chain.ainvoke({}, config=_run_config(config))
+
+    return _acceptance_update(thought)
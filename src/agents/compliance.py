@@ -1,325 +1,573 @@
-from eth_account import Account
+import asyncio
+import contextvars
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 from langchain_core.runnables import RunnableConfig
 from src.state import GraphState
-from src.config import ADDRS, BUYER_PK, COMPLIANCE_PK
-from src.blockchain.client import w3, get_contract, is_connected
-from src.blockchain.abis import WRAPPER_ABI, ESCROW_ABI, REGISTRY_ABI
-from src.blockchain.utils import sign_transfer_authorization
-from src.agents.tools import get_llm_chain, llm
-from src.agents.ledger import get_onchain_ledger
+from src.config import (
+    ADDRS, BUYER_PK, COMPLIANCE_PK, ESCROW_EXPIRY, ESCROW_FUND_GAS, RULE_ENGINE_ENABLED, RULE_ENGINE_LLM_NARRATIVE,
+    SPLIT_SETTLEMENT, SPLIT_SETTLEMENT_GAS
+)
+from src.blockchain.client import w3, get_contract, is_connected, aget_contract, ais_connected
+from src.blockchain.utils import (
+    ATTESTATION_STATUS, authorization_tuple, has_function, sign_transfer_authorization
+)
+from src.blockchain.indexer import index_receipts
+from src.blockchain.nonces import send_transaction, asend_transaction
+from src.blockchain.confirmations import confirmation_tracker
+from src.blockchain.escrow_pool import get_escrow_pool
+from src.blockchain.policies import would_fail
+from src.blockchain.credentials import credential_cache, has_source_of_funds, ahas_source_of_funds
+from src.agents.tools import get_llm_chain
+from src.agents.ledger import get_onchain_ledger, aget_onchain_ledger
+from src.agents.rules import AMBIGUOUS, build_facts, rule_engine
+
+COMPLIANCE_PROMPT = (
+    "You are a Compliance Agent. Rules: \n"
+    "1. If amount > 1000 and Source of Funds (SoF) is missing, status is PENDING (require escrow).\n"
+    "2. If SoF is present (either uploaded OR already verified on-chain), status is PASS.\n"
+    "3. If amount <= 1000, status is PASS.\n"
+    "\n"
+    "Transaction: Amount=${amount}, SoF_VC={sof_vc}, SoF_OnChain={sof_onchain}, Sanctions_VC={sanctions_vc}.\n"
+    "Explain your reasoning concisely, then end with one line: 'Status: PASS' or 'Status: PENDING'."
+)
+
+PROPOSAL_PROMPT = (
+    "You are a Compliance Agent. The transaction amount ${amount} is high risk. "
+    "Propose a split payment: 20% (${upfront}) upfront and 80% (${escrow}) in x402 smart escrow "
+    "until Source of Funds is provided. Write a professional proposal message."
+)
+
+FINALIZE_PROMPT = (
+    "You are a Compliance Agent. The system has just verified a Source of Funds document and automatically released the funds on the blockchain. "
+    "Inform the user that the compliance check is complete and the transaction has been finalized successfully."
+)
+
+# Runs the on-chain submission while the LLM writes the narrative
+_chain_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="compliance-chain")
+
+def _run_config(config):
+    run_config = config.copy() if config else {}
+    run_config["tags"] = ["Compliance Agent"]
+    return run_config
+
+# The verdict line COMPLIANCE_PROMPT asks for, e.g. "Status: PASS" or "**Status:** PENDING"
+_VERDICT = re.compile(r"^[\s*#>-]*status\W*(PASS|PENDING)\b", re.IGNORECASE | re.MULTILINE)
+
+def _status_from_text(text: str) -> str:
+    """Reads the LLM's verdict line when the rule engine could not decide.
+
+    Only the last "Status: ..." line counts, so the reasoning can mention
+    either word; no verdict line means PENDING.
+    """
+    verdicts = _VERDICT.findall(text)
+    return verdicts[-1].upper() if verdicts else "PENDING"
+
+# --- Evaluate Compliance ---
+
+def _payment_call(wrapper, amount):
+    """Buyer authorization + the Compliance Agent's payWithAuthorization call."""
+    # 1. Buyer signs authorization (Simulated Buyer Action)
+    # In a real app, this comes from the frontend/wallet
+    amount_uint = int(amount * 1e6)
+
+    # The authorization must target the Wrapper as the spender/recipient of the transfer
+    # Reread contract: `token.transferWithAuthorization(from, address(this), ...)`
+    # So signature `to` must be `address(this)` i.e. Wrapper.
+
+    # Re-sign with correct 'to'
+    auth = sign_transfer_authorization(
+        ADDRS["DemoSGD"],
+        BUYER_PK,
+        ADDRS["PolicyWrapper"],
+        amount_uint
+    )
+
+    # 2. Compliance Agent submits
+    return wrapper.functions.payWithAuthorization(
+        auth["from"],
+        ADDRS["Seller"], # Final destination
+        auth["value"],
+        auth["validAfter"],
+        auth["validBefore"],
+        auth["nonce"],
+        auth["v"],
+        auth["r"],
+        auth["s"]
+    )
+
+def _attestation_outcome(receipt, tx_hash):
+    """Reads (status, transaction id, note) from the TransactionAttested event."""
+    # 3. Check Status from Events
+    # Event: TransactionAttested(bytes32 transactionId, uint8 status)
+    # Indexing the receipt makes the attestation visible to local lookups right away
+    events = [e for e in index_receipts([receipt])[0] if e["event"] == "TransactionAttested"]
+    if not events:
+        return None, "", ""
+
+    status = ATTESTATION_STATUS.get(events[0]["status"], "PENDING")
+
+    # Update explanation based on real result
+    note = f"\n\n[System]: On-chain Policy Result: {status}. TxHash: {tx_hash.hex()[:10]}..."
+
+    # Extract Transaction ID
+    tx_id_hex = events[0]["transaction_id"]
+    return status, tx_id_hex, note
+
+def _chain_error_outcome(e):
+    print(f"Web3 Error: {e}")
+    note = f"\\n(Chain Error: {e})"
+    if "Policy Check Failed" in str(e):
+        return "FAIL", "", note
+    return "PENDING", "", note
+
+def _submit_payment(amount):
+    """Signs the buyer authorization and submits it through the Policy Wrapper.
+
+    Returns the on-chain status (None when the chain is unavailable), the
+    transaction id and a note for the agent's thought.
+    """
+    # Check connection explicitely
+    if not (is_connected() and ADDRS):
+        return None, "", ""
+
+    try:
+        wrapper = get_contract("PolicyWrapper")
+        tx_hash, confirmation = confirmation_tracker.submit(_payment_call(wrapper, amount), COMPLIANCE_PK)
+        receipt = confirmation.result()
+        return _attestation_outcome(receipt, tx_hash)
+    except Exception as e:
+        return _chain_error_outcome(e)
+
+async def _asubmit_payment(amount):
+    if not (ADDRS and await ais_connected()):
+        return None, "", ""
+
+    try:
+        wrapper = aget_contract("PolicyWrapper")
+        tx_hash = await asend_transaction(_payment_call(wrapper, amount), COMPLIANCE_PK)
+        receipt = await confirmation_tracker.wait_async(tx_hash)
+        return _attestation_outcome(receipt, tx_hash)
+    except Exception as e:
+        return _chain_error_outcome(e)
+
+def _decide(intent, is_sof_onchain, configurable):
+    """Fast Path: Rule Engine decides clear-cut cases without the LLM.
+
+    Returns (decision or None, facts, whether the LLM has to be called).
+    """
+    decision, facts = None, None
+    if configurable.get("rule_engine", RULE_ENGINE_ENABLED):
+        facts = build_facts(intent, is_sof_onchain)
+        decision = rule_engine.evaluate(facts)
+        if decision.status == AMBIGUOUS:
+            decision = None
+    needs_llm = decision is None or configurable.get("llm_narrative", RULE_ENGINE_LLM_NARRATIVE)
+    return decision, facts, needs_llm
+
+def _compliance_inputs(intent, is_sof_onchain):
+    vcs = intent["attached_vcs"]
+    return {
+        "amount": intent["amount"],
+        "sof_vc": vcs["sof"],
+        "sof_onchain": is_sof_onchain,
+        "sanctions_vc": vcs["sanctions"]
+    }
+
+def _compliance_status(decision, thought, configurable, onchain_status):
+    # The on-chain attestation is authoritative when available
+    if onchain_status is not None:
+        return onchain_status
+    if decision is not None:
+        return decision.status
+    if configurable.get("rule_engine", RULE_ENGINE_ENABLED):
+        return _status_from_text(thought)
+    return "PENDING"
+
+def _upfront_preflight(amount):
+    """Policy status the escrow's upfront tranche would get, simulated in-process (None without a chain)."""
+    from src.blockchain.simulator import get_policy_simulator
+    simulator = get_policy_simulator()
+    if simulator is None or not ADDRS.get("Buyer"):
+        return None
+    return simulator.preflight(ADDRS["Buyer"], ADDRS["Seller"], int(amount * 0.2 * 1e6))
+
+def _escrow_check(status, amount):
+    """A PENDING payment gets an escrow proposal, unless its upfront tranche would FAIL anyway.
+
+    Returns the status and a note for the thought.
+    """
+    if status == "PENDING" and _upfront_preflight(amount) == "FAIL":
+        return "FAIL", "\n\n[System]: No escrow proposed: the policies would FAIL the 20% upfront payment."
+    return status, ""
 
 def node_evaluate_compliance(state: GraphState, config: RunnableConfig):
     """Compliance Agent: Checks Sanctions and Amount."""
     print("--- COMPLIANCE AGENT: EVALUATING ---")
     intent = state["buyer_intent"]
-    amount = intent["amount"]
-    vcs = intent["attached_vcs"]
-    
+    configurable = (config or {}).get("configurable", {})
+
     # Pre-Check: Check On-Chain Status
     is_sof_onchain = False
     if is_connected() and ADDRS:
         try:
-             registry = get_contract("IdentityRegistry", REGISTRY_ABI)
-             # Check if buyer has SoF
-             is_sof_onchain = registry.functions.hasSourceOfFunds(ADDRS["Buyer"]).call()
+             # Check if buyer has SoF (usually cached from session start)
+             is_sof_onchain = has_source_of_funds(ADDRS["Buyer"])
         except Exception:
              pass
 
-    # LLM Evaluation
-    chain = get_llm_chain(
-        "You are a Compliance Agent. Rules: \n"
-        "1. If amount > 1000 and Source of Funds (SoF) is missing, status is PENDING (require escrow).\n"
-        "2. If SoF is present (either uploaded OR already verified on-chain), status is PASS.\n"
-        "3. If amount <= 1000, status is PASS.\n"
-        "\n"
-        "Transaction: Amount=${amount}, SoF_VC={sof_vc}, SoF_OnChain={sof_onchain}, Sanctions_VC={sanctions_vc}.\n"
-        "Determine the status (PASS/PENDING) and explain your reasoning concisely."
-    )
-    
-    run_config = config.copy() if config else {}
-    run_config["tags"] = ["Compliance Agent"]
-    thought = chain.invoke({
-        "amount": amount, 
-        "sof_vc": vcs["sof"], 
-        "sof_onchain": is_sof_onchain,
-        "sanctions_vc": vcs["sanctions"]
-    }, config=run_config)
-    
+    decision, facts, needs_llm = _decide(intent, is_sof_onchain, configurable)
+
+    # The chain submission doesn't depend on the narrative, so start it first
+    submission = _chain_executor.submit(contextvars.copy_context().run, _submit_payment, intent["amount"])
+
+    # LLM Evaluation (decides the status only when no rule could)
+    if needs_llm:
+        chain = get_llm_chain(COMPLIANCE_PROMPT, name="compliance")
+        thought = chain.invoke(_compliance_inputs(intent, is_sof_onchain), config=_run_config(config))
+    else:
+        thought = decision.explain(facts)
+
     # --- Web3 Integration ---
-    status = "PENDING"
-    tx_hash = None
-    
-    # Check connection explicitely
-    if is_connected() and ADDRS:
+    onchain_status, tx_id_hex, note = submission.result()
+    status = _compliance_status(decision, thought, configurable, onchain_status)
+    status, reason = _escrow_check(status, intent["amount"])
+    thought += note + reason
+
+    return {
+        "compliance_status": status,
+        "active_agent": "Compliance Agent",
+        "current_thought": f"Compliance Agent: {thought}",
+        "ledger": get_onchain_ledger(), # Sync ledger
+        "transaction_id": tx_id_hex
+    }
+
+async def anode_evaluate_compliance(state: GraphState, config: RunnableConfig):
+    """Compliance Agent: Checks Sanctions and Amount (async)."""
+    print("--- COMPLIANCE AGENT: EVALUATING ---")
+    intent = state["buyer_intent"]
+    configurable = (config or {}).get("configurable", {})
+
+    is_sof_onchain = False
+    if ADDRS and await ais_connected():
         try:
-            # 1. Buyer signs authorization (Simulated Buyer Action)
-            # In a real app, this comes from the frontend/wallet
-            amount_uint = int(amount * 1e6)
-            
-            # The authorization must target the Wrapper as the spender/recipient of the transfer
-            # Reread contract: `token.transferWithAuthorization(from, address(this), ...)`
-            # So signature `to` must be `address(this)` i.e. Wrapper.
-            
-            # Re-sign with correct 'to'
-            auth = sign_transfer_authorization(
-                ADDRS["DemoSGD"], 
-                BUYER_PK, 
-                ADDRS["PolicyWrapper"], 
-                amount_uint
-            )
-            
-            # 2. Compliance Agent submits
-            wrapper = get_contract("PolicyWrapper", WRAPPER_ABI)
-            ca_account = Account.from_key(COMPLIANCE_PK)
-            
-            # Build Tx
-            tx_data = wrapper.functions.payWithAuthorization(
-                auth["from"],
-                ADDRS["Seller"], # Final destination
-                auth["value"],
-                auth["validAfter"],
-                auth["validBefore"],
-                auth["nonce"],
-                auth["v"],
-                auth["r"],
-                auth["s"]
-            ).build_transaction({
-                "from": ca_account.address,
-                "nonce": w3.eth.get_transaction_count(ca_account.address)
-            })
-            
-            signed_tx = w3.eth.account.sign_transaction(tx_data, private_key=COMPLIANCE_PK)
-            tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
-            receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
-            
-            # 3. Check Status from Events
-            # Event: TransactionAttested(bytes32 transactionId, uint8 status)
-            # Use manual filtering to avoid MismatchedABI warnings from other events in receipt
-            tx_attested_event = wrapper.events.TransactionAttested()
-            event_topic = w3.keccak(text="TransactionAttested(bytes32,uint8)")
-            
-            logs = []
-            for log in receipt["logs"]:
-                # Check address and topic
-                if log["address"].lower() == wrapper.address.lower() and log["topics"][0] == event_topic:
-                    try:
-                        decoded = tx_attested_event.process_log(log)
-                        logs.append(decoded)
-                    except Exception:
-                        pass
-            
-            if logs:
-                status_int = logs[0]["args"]["status"]
-                status_map = {0: "PASS", 1: "FAIL", 2: "PENDING"}
-                status = status_map.get(status_int, "PENDING")
-                
-                # Update explanation based on real result
-                thought += f"\n\n[System]: On-chain Policy Result: {status}. TxHash: {tx_hash.hex()[:10]}..."
-                
-                # Extract Transaction ID
-                tx_id_hex = logs[0]["args"]["transactionId"].hex()
-                
-        except Exception as e:
-            print(f"Web3 Error: {e}")
-            thought += f"\\n(Chain Error: {e})"
-            if "Policy Check Failed" in str(e):
-                status = "FAIL"
-            else:
-                status = "PENDING"
+             is_sof_onchain = await ahas_source_of_funds(ADDRS["Buyer"])
+        except Exception:
+             pass
 
+    decision, facts, needs_llm = _decide(intent, is_sof_onchain, configurable)
+    submission = asyncio.create_task(_asubmit_payment(intent["amount"]))
 
+    if needs_llm:
+        chain = get_llm_chain(COMPLIANCE_PROMPT, name="compliance")
+        thought = await chain.ainvoke(_compliance_inputs(intent, is_sof_onchain), config=_run_config(config))
+    else:
+        thought = decision.explain(facts)
+
+    onchain_status, tx_id_hex, note = await submission
+    status = _compliance_status(decision, thought, configurable, onchain_status)
+    # The simulator may still have to sync from chain: keep that off the event loop
+    status, reason = await asyncio.to_thread(_escrow_check, status, intent["amount"])
+    thought += note + reason
 
     return {
         "compliance_status": status,
         "active_agent": "Compliance Agent",
         "current_thought": f"Compliance Agent: {thought}",
-        "ledger": get_onchain_ledger(), # Sync ledger
-        "transaction_id": locals().get("tx_id_hex", "")
+        "ledger": await aget_onchain_ledger(),
+        "transaction_id": tx_id_hex
     }
 
-def node_propose_escrow(state: GraphState, config: RunnableConfig):
-    """Compliance Agent: Proposes split."""
-    print("--- COMPLIANCE AGENT: PROPOSING ESCROW ---")
+# --- Propose Escrow ---
+
+def _proposal(state):
     amount = state["buyer_intent"]["amount"]
-    
+
     # 20/80 Split Logic
     upfront = amount * 0.2
     escrow = amount * 0.8
-    
-    # LLM Proposal Generation
-    chain = get_llm_chain(
-        "You are a Compliance Agent. The transaction amount ${amount} is high risk. "
-        "Propose a split payment: 20% (${upfront}) upfront and 80% (${escrow}) in x402 smart escrow "
-        "until Source of Funds is provided. Write a professional proposal message."
-    )
-    
-    run_config = config.copy() if config else {}
-    run_config["tags"] = ["Compliance Agent"]
-    thought = chain.invoke({"amount": amount, "upfront": upfront, "escrow": escrow}, config=run_config)
-    
+
     proposal = f"Escrow Proposal: Pay ${upfront:.2f} (20%) directly, lock ${escrow:.2f} (80%) in Escrow."
-    
+    # Start filling the escrow pool while the buyer considers the proposal
+    get_escrow_pool()
+    return {"amount": amount, "upfront": upfront, "escrow": escrow}, proposal
+
+def _proposal_update(thought, proposal):
     return {
         "active_agent": "Compliance Agent",
         "current_thought": f"Compliance Agent: {thought}",
         "negotiation_log": [f"Compliance Agent: {proposal}"]
     }
 
-def node_execute_escrow(state: GraphState, config: RunnableConfig):
-    """Web3: Deploys Escrow and Funds it."""
-    print("--- LEDGER: EXECUTING ESCROW ---")
+def node_propose_escrow(state: GraphState, config: RunnableConfig):
+    """Compliance Agent: Proposes split."""
+    print("--- COMPLIANCE AGENT: PROPOSING ESCROW ---")
+    inputs, proposal = _proposal(state)
+
+    # LLM Proposal Generation
+    chain = get_llm_chain(PROPOSAL_PROMPT, name="proposal")
+    thought = chain.invoke(inputs, config=_run_config(config))
+
+    return _proposal_update(thought, proposal)
+
+async def anode_propose_escrow(state: GraphState, config: RunnableConfig):
+    """Compliance Agent: Proposes split (async)."""
+    print("--- COMPLIANCE AGENT: PROPOSING ESCROW ---")
+    inputs, proposal = _proposal(state)
+
+    chain = get_llm_chain(PROPOSAL_PROMPT, name="proposal")
+    thought = await chain.ainvoke(inputs, config=_run_config(config))
+
+    return _proposal_update(thought, proposal)
+
+# --- Execute Escrow ---
+
+def _shared_escrow():
+    # Fallback: the single "SimpleEscrow" from deployed_addresses, one escrow at a time
+    escrow_addr = ADDRS.get("SimpleEscrow")
+    if not escrow_addr:
+         raise Exception("SimpleEscrow contract not found in ADDRS. Please redeploy.")
+    return escrow_addr, False
+
+def _acquire_escrow(state):
+    """(address, pooled): the escrow the thread was started with, a fresh clone
+    from the escrow pool, else the shared SimpleEscrow."""
+    if state.get("escrow_address"):
+        return state["escrow_address"], False
+    pool = get_escrow_pool()
+    if pool is None:
+        return _shared_escrow()
+    return pool.acquire(), True
+
+async def _aacquire_escrow(state):
+    if state.get("escrow_address"):
+        return state["escrow_address"], False
+    pool = get_escrow_pool()
+    if pool is None:
+        return _shared_escrow()
+    return await pool.aacquire(), True
+
+def _split_settlement_supported():
+    """Whether the deployed wrapper has settleSplit (older deployments don't)."""
+    return SPLIT_SETTLEMENT and has_function(ADDRS["PolicyWrapper"], "PolicyWrapper", "settleSplit")
+
+def _upfront_fails(state):
+    """Dry run of the upfront tranche's policies. Nothing else would stop a doomed
+    mediation before broadcast: pooled calls have fixed gas, and resolvePending
+    goes out before payWithAuthorization is estimated."""
+    upfront_uint = int(state["buyer_intent"]["amount"] * 0.2 * 1e6)
+    return would_fail(ADDRS["Buyer"], ADDRS["Seller"], upfront_uint)
+
+def _escrow_calls(state, contract, escrow_addr, pooled, split=False):
+    """Builds the escrow transactions with `contract` (get_contract / aget_contract).
+
+    With `split` the whole mediation is one settleSplit call (one buyer
+    signature), otherwise resolvePending, payWithAuthorization and
+    fundWithAuthorization are sent separately. Returns (call, tx_params)
+    pairs in submission order and the resulting thought.
+    """
     amount = state["buyer_intent"]["amount"]
-    
+
     # 20/80 Split
     upfront = amount * 0.2
     escrow_amt = amount * 0.8
-    
+    upfront_uint = int(upfront * 1e6)
+    escrow_amt_uint = int(escrow_amt * 1e6)
+
+    calls = []
+    wrapper = contract("PolicyWrapper")
+    escrow_contract = contract("SimpleEscrow", escrow_addr)
+    tx_id_hex = state.get("transaction_id")
+    thought = f"On-chain: Tranche 1 (\\${upfront_uint/1e6}) settled via Wrapper. Tranche 2 (\\${escrow_amt_uint/1e6}) locked in Escrow ({escrow_addr})."
+
+    # Escrow for Tranche 2: a pre-deployed clone is blank until opened with this transaction's terms
+    # (open() isn't mined when the next call is built, so that one can't be estimated)
+    if pooled:
+        calls.append((escrow_contract.functions.open(
+            ADDRS["Buyer"], ADDRS["Seller"], escrow_amt_uint, int(time.time()) + ESCROW_EXPIRY
+        ), None))
+
+    if split:
+        # One authorization for both tranches; the wrapper fails the pending
+        # transaction, pays the seller and funds the escrow atomically
+        auth = sign_transfer_authorization(
+            ADDRS["DemoSGD"], BUYER_PK, ADDRS["PolicyWrapper"], upfront_uint + escrow_amt_uint
+        )
+        pending_id = bytes.fromhex(tx_id_hex) if tx_id_hex else bytes(32)
+        calls.append((wrapper.functions.settleSplit(
+            pending_id, ADDRS["Seller"], escrow_addr, upfront_uint, [authorization_tuple(auth)]
+        ), {"gas": SPLIT_SETTLEMENT_GAS} if pooled else None))
+        return calls, thought
+
+    # 0. Fail the Pending Transaction (Mediation)
+    # "Accept escrow alternative... CA calls resolvePending(transactionId, True)"
+    if tx_id_hex:
+         calls.append((wrapper.functions.resolvePending(
+             bytes.fromhex(tx_id_hex), True # Fail Now
+         ), None))
+
+    # 1. Manual Transfer of Upfront (Tranche 1)
+    auth_upfront = sign_transfer_authorization(
+        ADDRS["DemoSGD"], BUYER_PK, ADDRS["PolicyWrapper"], upfront_uint
+    )
+
+    calls.append((wrapper.functions.payWithAuthorization(
+        auth_upfront["from"], ADDRS["Seller"], auth_upfront["value"],
+        auth_upfront["validAfter"], auth_upfront["validBefore"], auth_upfront["nonce"],
+        auth_upfront["v"], auth_upfront["r"], auth_upfront["s"]
+    ), None))
+
+    # 2. Fund Escrow
+    # buyer signs auth for escrow
+    auth_escrow = sign_transfer_authorization(
+        ADDRS["DemoSGD"], BUYER_PK, escrow_addr, escrow_amt_uint
+    )
+
+    # Call fundWithAuthorization on Escrow
+    calls.append((escrow_contract.functions.fundWithAuthorization(
+        auth_escrow["validAfter"], auth_escrow["validBefore"], auth_escrow["nonce"],
+        auth_escrow["v"], auth_escrow["r"], auth_escrow["s"]
+    ), {"gas": ESCROW_FUND_GAS} if pooled else None))
+
+    return calls, thought
+
+def _reverted(receipts):
+    return sum(1 for receipt in receipts if receipt["status"] != 1)
+
+def _escrow_update(ledger, thought, confirmed=True, escrow_addr=None):
+    return {
+        "ledger": ledger,
+        "escrow_address": escrow_addr,
+        "compliance_status": "ESCROW_ACTIVE",
+        "active_agent": "LEDGER",
+        "current_thought": f"Compliance Agent: {thought}",
+        "negotiation_log": ["Chain: Tx confirmed. Funds Locked." if confirmed else "Chain: Escrow transactions failed."]
+    }
+
+def node_execute_escrow(state: GraphState, config: RunnableConfig):
+    """Web3: Deploys Escrow and Funds it."""
+    print("--- LEDGER: EXECUTING ESCROW ---")
     thought = "Initializing On-chain Escrow..."
-    
+
+    confirmed, escrow_addr = False, None
     if is_connected() and ADDRS:
         try:
-            # 0. Fail the Pending Transaction (Mediation)
-            # "Accept escrow alternative... CA calls resolvePending(transactionId, True)"
-            tx_id_hex = state.get("transaction_id")
-            ca_account = Account.from_key(COMPLIANCE_PK)
-            
-            if tx_id_hex:
-                 wrapper = get_contract("PolicyWrapper", WRAPPER_ABI)
-                 tx_data_0 = wrapper.functions.resolvePending(
-                     bytes.fromhex(tx_id_hex), True # Fail Now
-                 ).build_transaction({
-                    "from": ca_account.address,
-                    "nonce": w3.eth.get_transaction_count(ca_account.address)
-                 })
-                 w3.eth.send_raw_transaction(w3.eth.account.sign_transaction(tx_data_0, private_key=COMPLIANCE_PK).raw_transaction)
-                 thought += f"\\n(Pending Tx {tx_id_hex[:6]}... marked FAILED)"
-
-            # 1. Manual Transfer of Upfront (Tranche 1)
-            upfront_uint = int(upfront * 1e6)
-            auth_upfront = sign_transfer_authorization(
-                ADDRS["DemoSGD"], BUYER_PK, ADDRS["PolicyWrapper"], upfront_uint
-            )
-            
-            wrapper = get_contract("PolicyWrapper", WRAPPER_ABI)
-            
-            # Fetch Nonce ONCE
-            current_nonce = w3.eth.get_transaction_count(ca_account.address)
-            
-            tx_data_1 = wrapper.functions.payWithAuthorization(
-                auth_upfront["from"], ADDRS["Seller"], auth_upfront["value"],
-                auth_upfront["validAfter"], auth_upfront["validBefore"], auth_upfront["nonce"],
-                auth_upfront["v"], auth_upfront["r"], auth_upfront["s"]
-            ).build_transaction({
-                "from": ca_account.address,
-                 "nonce": current_nonce
-            })
-            w3.eth.send_raw_transaction(w3.eth.account.sign_transaction(tx_data_1, private_key=COMPLIANCE_PK).raw_transaction)
-            
-            # 2. Deploy Escrow for Tranche 2 or use existing fallback
-            escrow_amt_uint = int(escrow_amt * 1e6)
-            
-            # Fallback: Just transfer to the Address "SimpleEscrow" from deployed_addresses, pretend it's new.
-            escrow_addr = ADDRS.get("SimpleEscrow")
-            if not escrow_addr:
-                 raise Exception("SimpleEscrow contract not found in ADDRS. Please redeploy.")
-            
-            # Fund Escrow
-            # buyer signs auth for escrow
-            auth_escrow = sign_transfer_authorization(
-                ADDRS["DemoSGD"], BUYER_PK, escrow_addr, escrow_amt_uint
-            )
-            
-            # Call fundWithAuthorization on Escrow
-            # Note: Using get_contract requires name in ADDRS, if using generic address instantiate manually
-            escrow_contract = get_contract("SimpleEscrow", ESCROW_ABI)
-
-            tx_data_2 = escrow_contract.functions.fundWithAuthorization(
-                auth_escrow["validAfter"], auth_escrow["validBefore"], auth_escrow["nonce"],
-                auth_escrow["v"], auth_escrow["r"], auth_escrow["s"]
-            ).build_transaction({
-                "from": ca_account.address,
-                "nonce": current_nonce + 1 # +1 nonce
-            })
-            w3.eth.send_raw_transaction(w3.eth.account.sign_transaction(tx_data_2, private_key=COMPLIANCE_PK).raw_transaction)
-            
-            thought = f"On-chain: Tranche 1 (\\${upfront_uint/1e6}) settled via Wrapper. Tranche 2 (\\${escrow_amt_uint/1e6}) locked in Escrow ({escrow_addr})."
-            
+            if _upfront_fails(state):
+                raise Exception("Upfront tranche fails the policy dry run; nothing was sent")
+            escrow_addr, pooled = _acquire_escrow(state)
+            calls, success_thought = _escrow_calls(state, get_contract, escrow_addr, pooled, _split_settlement_supported())
+            # Nonces are reserved locally, so the transactions are sent
+            # back-to-back; then wait for all receipts at once
+            tx_hashes = [send_transaction(call, COMPLIANCE_PK, params) for call, params in calls]
+            reverted = _reverted(confirmation_tracker.wait_all(tx_hashes))
+            confirmed = not reverted
+            thought = success_thought if confirmed else f"Chain Execution Failed: {reverted} of {len(calls)} transactions reverted."
+        except Exception as e:
+            thought = f"Chain Execution Failed: {e}"
+            print(thought)
+
+    return _escrow_update(get_onchain_ledger(), thought, confirmed, escrow_addr)
+
+async def anode_execute_escrow(state: GraphState, config: RunnableConfig):
+    """Web3: Deploys Escrow and Funds it (async)."""
+    print("--- LEDGER: EXECUTING ESCROW ---")
+    thought = "Initializing On-chain Escrow..."
+
+    confirmed, escrow_addr = False, None
+    if ADDRS and await ais_connected():
+        try:
+            if await asyncio.to_thread(_upfront_fails, state):
+                raise Exception("Upfront tranche fails the policy dry run; nothing was sent")
+            escrow_addr, pooled = await _aacquire_escrow(state)
+            split = await asyncio.to_thread(_split_settlement_supported)
+            calls, success_thought = _escrow_calls(state, aget_contract, escrow_addr, pooled, split)
+            tx_hashes = [await asend_transaction(call, COMPLIANCE_PK, params) for call, params in calls]
+            reverted = _reverted(await confirmation_tracker.wait_all_async(tx_hashes))
+            confirmed = not reverted
+            thought = success_thought if confirmed else f"Chain Execution Failed: {reverted} of {len(calls)} transactions reverted."
         except Exception as e:
             thought = f"Chain Execution Failed: {e}"
             print(thought)
 
+    return _escrow_update(await aget_onchain_ledger(), thought, confirmed, escrow_addr)
+
+# --- Finalize Settlement ---
+
+def _finalize_calls(state, contract):
+    """Registry update + escrow release, built with `contract` (get_contract / aget_contract)."""
+    # 1. Update Registry with SoF Hash
+    registry = contract("IdentityRegistry")
+
+    # Fake hash for demo
+    sof_hash = w3.keccak(text="MOCK_SOF_FILE")
+
+    calls = [registry.functions.setSourceOfFunds(ADDRS["Buyer"], sof_hash)]
 
+    # 2. Release Escrow
+    # The thread's own escrow, else the shared deployed one
+    escrow_addr = state.get("escrow_address") or ADDRS.get("SimpleEscrow")
+    if escrow_addr:
+        escrow_contract = contract("SimpleEscrow", escrow_addr)
+        calls.append(escrow_contract.functions.release())
+        thought = "On-chain: SoF Registered. Escrow Released to Seller."
+    else:
+        thought = "Escrow Contract Address Missing in Config."
+    return registry, calls, thought
 
+def _finalize_update(ledger, llm_thought):
     return {
-        "ledger": get_onchain_ledger(),
-        "compliance_status": "ESCROW_ACTIVE",
-        "active_agent": "LEDGER",
-        "current_thought": f"Compliance Agent: {thought}",
-        "negotiation_log": ["Chain: Tx confirmed. Funds Locked."]
+        "ledger": ledger,
+        "compliance_status": "PASS",
+        "active_agent": "Compliance Agent",
+        "current_thought": f"Compliance Agent: {llm_thought}",
+        "negotiation_log": ["Compliance Agent: Compliance Met. Funds Released."]
     }
 
 def node_finalize_settlement(state: GraphState, config: RunnableConfig):
     """Compliance Agent: Finalizes after SoF."""
     print("--- COMPLIANCE AGENT: FINALIZING ---")
-    
+
     thought = "Finalizing..."
-    
+
     if is_connected() and ADDRS:
         try:
-            # 1. Update Registry with SoF Hash
-            registry = get_contract("IdentityRegistry", REGISTRY_ABI)
-            ca_account = Account.from_key(COMPLIANCE_PK)
-            
-            # Fetch Nonce ONCE
-            current_nonce = w3.eth.get_transaction_count(ca_account.address)
-            
-            # Fake hash for demo
-            sof_hash = w3.keccak(text="MOCK_SOF_FILE")
-            
-            tx_data_1 = registry.functions.setSourceOfFunds(
-                ADDRS["Buyer"], sof_hash
-            ).build_transaction({
-                "from": ca_account.address,
-                "nonce": current_nonce
-            })
-            w3.eth.send_raw_transaction(w3.eth.account.sign_transaction(tx_data_1, private_key=COMPLIANCE_PK).raw_transaction)
-            
-            # 2. Release Escrow
-            escrow_addr = ADDRS.get("SimpleEscrow") or ADDRS["ComplianceAgent"] 
-            if escrow_addr:
-                # Force strictly to the deployed address if available
-                target_escrow = ADDRS.get("SimpleEscrow")
-                if target_escrow:
-                    escrow_contract = get_contract("SimpleEscrow", ESCROW_ABI)
-                    
-                    tx_data_2 = escrow_contract.functions.release().build_transaction({
-                        "from": ca_account.address,
-                        "nonce": current_nonce + 1 
-                    })
-                    w3.eth.send_raw_transaction(w3.eth.account.sign_transaction(tx_data_2, private_key=COMPLIANCE_PK).raw_transaction)
-                    thought = "On-chain: SoF Registered. Escrow Released to Seller."
-                else:
-                    thought = "Escrow Contract Address Missing in Config."
-                
+            registry, calls, thought = _finalize_calls(state, get_contract)
+            tx_hashes = [send_transaction(call, COMPLIANCE_PK) for call in calls]
+            reverted = _reverted(confirmation_tracker.wait_all(tx_hashes))
+            # The registry write is mined (or failed) by now, so the cached read is stale either way
+            credential_cache.invalidate(registry.address, ADDRS["Buyer"])
+            if reverted:
+                thought = f"Chain Finalization Failed: {reverted} of {len(calls)} transactions reverted."
         except Exception as e:
             thought = f"Chain Finalization Failed: {e}"
             print(thought)
 
-
     # LLM Confirmation
-    chain = get_llm_chain(
-        "You are a Compliance Agent. The system has just verified a Source of Funds document and automatically released the funds on the blockchain. "
-        "Inform the user that the compliance check is complete and the transaction has been finalized successfully."
-    )
-    
-    run_config = config.copy() if config else {}
-    run_config["tags"] = ["Compliance Agent"]
-    llm_thought = chain.invoke({}, config=run_config)
-    
-    return {
-        "ledger": get_onchain_ledger(),
-        "compliance_status": "PASS",
-        "active_agent": "Compliance Agent",
-        "current_thought": f"Compliance Agent: {llm_thought}",
-        "negotiation_log": ["Compliance Agent: Compliance Met. Funds Released."]
-    }
+    chain = get_llm_chain(FINALIZE_PROMPT, name="finalize")
+    llm_thought = chain.invoke({}, config=_run_config(config))
+
+    return _finalize_update(get_onchain_ledger(), llm_thought)
+
+async def anode_finalize_settlement(state: GraphState, config: RunnableConfig):
+    """Compliance Agent: Finalizes after SoF (async)."""
+    print("--- COMPLIANCE AGENT: FINALIZING ---")
+
+    thought = "Finalizing..."
+
+    if ADDRS and await ais_connected():
+        try:
+            registry, calls, thought = _finalize_calls(state, aget_contract)
+            tx_hashes = [await asend_transaction(call, COMPLIANCE_PK) for call in calls]
+            reverted = _reverted(await confirmation_tracker.wait_all_async(tx_hashes))
+            credential_cache.invalidate(registry.address, ADDRS["Buyer"])
+            if reverted:
+                thought = f"Chain Finalization Failed: {reverted} of {len(calls)} transactions reverted."
+        except Exception as e:
+            thought = f"Chain Finalization Failed: {e}"
+            print(thought)
+
+    chain = get_llm_chain(FINALIZE_PROMPT, name="finalize")
+    llm_thought = await chain.ainvoke({}, config=_run_config(config))
+
+    return _finalize_update(await aget_onchain_ledger(), llm_thought)
@@ -0,0 +1,145 @@
+"""Tiered intent extraction.
+
+Tier 1 is a deterministic parser for the common phrasings ("I want a $1500
+luxury watch", "buy a pen for SGD 150"). Only requests it can't read with
+confidence go to tier 2, the LLM in JSON schema mode. `stats()` reports how
+much traffic the parser handled on its own.
+"""
+import json
+import re
+import threading
+
+from src.agents.tools import get_json_chain
+
+EXTRACTION_PROMPT = (
+    "Extract the item and amount from this request: '{request}'. "
+    "Return JSON with keys 'item' (string) and 'amount' (number)."
+)
+
+# Constrains Ollama's output (the `format` option) to exactly this shape
+INTENT_SCHEMA = {
+    "type": "object",
+    "properties": {"item": {"type": "string"}, "amount": {"type": "number"}},
+    "required": ["item", "amount"],
+}
+
+UNKNOWN_INTENT = ("Unknown", 0.0)
+
+_NUMBER = r"(\d{1,3}(?:,\d{3})+|\d+)(\.\d+)?\s?(k\b)?"
+_AMOUNT_RES = [
+    # $1500, S$1,500.00, SGD 1500, USD1.5k
+    re.compile(r"(?:S\$|US\$|\$|\bSGD\s?|\bUSD\s?)" + _NUMBER, re.IGNORECASE),
+    # 1500 SGD, 1,500 dollars
+    re.compile(r"\b" + _NUMBER + r"\s?(?:SGD|USD|dollars|bucks)\b", re.IGNORECASE),
+]
+
+_ITEM_RE = re.compile(
+    r"\b(?:want|need|buy|purchase|order|get)\s+"
+    r"(?:to\s+(?:buy|purchase|order|get)\s+)?"
+    r"(?:(?:a|an|the|one|some)\s+)?"
+    r"(?P<item>[a-z0-9][a-z0-9'\- ]*?)"
+    r"\s*(?=\b(?:for|at|worth|costing|priced|please)\b|[.,!?;]|$)",
+    re.IGNORECASE,
+)
+_MAX_ITEM_WORDS = 6
+
+def _to_amount(whole, fraction, thousands):
+    amount = float(whole.replace(",", "") + (fraction or ""))
+    return amount * 1000 if thousands else amount
+
+def parse_amount(text):
+    """The single currency amount in `text`, or None if there is none or several."""
+    found, spans = [], []
+    for pattern in _AMOUNT_RES:
+        for match in pattern.finditer(text):
+            # "$1500 SGD" matches both patterns; count it once
+            if any(match.start() < end and start < match.end() for start, end in spans):
+                continue
+            spans.append(match.span())
+            found.append(_to_amount(*match.groups()))
+    return found[0] if len(found) == 1 else None
+
+def _strip_amounts(text):
+    for pattern in _AMOUNT_RES:
+        text = pattern.sub(" ", text)
+    return re.sub(r"\s+", " ", text)
+
+def parse_intent(text):
+    """(item, amount) for requests the parser can read unambiguously, else None."""
+    amount = parse_amount(text)
+    if amount is None or amount <= 0:
+        return None
+    match = _ITEM_RE.search(_strip_amounts(text))
+    if not match:
+        return None
+    item = match.group("item").strip(" -'")
+    if not item or len(item.split()) > _MAX_ITEM_WORDS:
+        return None
+    return item.title(), amount
+
+def _parse_llm_response(response):
+    data = json.loads(response)
+    item = str(data["item"]).strip() or UNKNOWN_INTENT[0]
+    return item, float(data["amount"])
+
+class IntentExtractor:
+    """Parser first, LLM for the leftovers. Counts which tier answered."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.parser_hits = 0
+        self.llm_hits = 0
+        self.failures = 0
+
+    def _count(self, tier):
+        with self._lock:
+            setattr(self, tier, getattr(self, tier) + 1)
+
+    def _failed(self, error):
+        print(f"LLM Extraction Failed: {error}")
+        self._count("failures")
+        return UNKNOWN_INTENT
+
+    def extract(self, request):
+        """Returns (item, amount); amount is 0.0 if neither tier could read it."""
+        intent = parse_intent(request)
+        if intent:
+            self._count("parser_hits")
+            return intent
+        chain = get_json_chain(EXTRACTION_PROMPT, INTENT_SCHEMA, name="intent_extraction")
+        try:
+            # No callbacks, so the extraction doesn't show up in the streamed UI log
+            intent = _parse_llm_response(chain.invoke({"request": request}, config={"callbacks": []}))
+        except Exception as e:
+            return self._failed(e)
+        self._count("llm_hits")
+        return intent
+
+    async def aextract(self, request):
+        intent = parse_intent(request)
+        if intent:
+            self._count("parser_hits")
+            return intent
+        chain = get_json_chain(EXTRACTION_PROMPT, INTENT_SCHEMA, name="intent_extraction")
+        try:
+            intent = _parse_llm_response(await chain.ainvoke({"request": request}, config={"callbacks": []}))
+        except Exception as e:
+            return self._failed(e)
+        self._count("llm_hits")
+        return intent
+
+    def stats(self):
+        with self._lock:
+            total = self.parser_hits + self.llm_hits + self.failures
+            return {
+                "parser_hits": self.parser_hits,
+                "llm_hits": self.llm_hits,
+                "failures": self.failures,
+                "hit_rate": self.parser_hits / total if total else 0.0,
+            }
+
+    def reset(self):
+        with self._lock:
+            self.parser_hits = self.llm_hits = self.failures = 0
+
+intent_extractor = IntentExtractor()
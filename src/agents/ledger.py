@@ -1,25 +1,44 @@
 from src.config import ADDRS
-from src.blockchain.client import w3, get_contract
-from src.blockchain.abis import DEMO_SGD_ABI
+from src.blockchain.client import w3, get_contract, ais_connected, aget_contract
+from src.blockchain.multicall import read_balances, aread_balances
+
+EMPTY_LEDGER = {"buyer_balance": 0, "seller_balance": 0, "escrow_balance": 0}
+
+def _ledger_from_snapshot(snapshot):
+    buyer_bal = snapshot["balances"][ADDRS["Buyer"]]
+    seller_bal = snapshot["balances"][ADDRS["Seller"]]
+    total_supply = snapshot["total_supply"]
 
-def get_onchain_ledger():
-    if not w3 or not w3.is_connected():
-        return {"buyer_balance": 0, "seller_balance": 0, "escrow_balance": 0}
-    
-    token = get_contract("DemoSGD", DEMO_SGD_ABI)
-    if not token:
-        return {"buyer_balance": 0, "seller_balance": 0, "escrow_balance": 0}
-    
-    buyer_bal = token.functions.balanceOf(ADDRS["Buyer"]).call()
-    seller_bal = token.functions.balanceOf(ADDRS["Seller"]).call()
-    total_supply = token.functions.totalSupply().call()
-    
     # We might have multiple escrows, but for demo we track total held by contracts?
     # Or just the main ones. SimpleEscrow is created dynamically.
     # We'll just track buyer/seller for now.
-    
+
     return {
         "buyer_balance": buyer_bal / 1e6,
         "seller_balance": seller_bal / 1e6,
-        "escrow_balance": (total_supply - buyer_bal - seller_bal) / 1e6 # Dynamic diff
+        "escrow_balance": (total_supply - buyer_bal - seller_bal) / 1e6, # Dynamic diff
+        "block_number": snapshot["block_number"]
     }
+
+def get_onchain_ledger(block_identifier="latest"):
+    if not w3 or not w3.is_connected():
+        return dict(EMPTY_LEDGER)
+
+    token = get_contract("DemoSGD")
+    if not token:
+        return dict(EMPTY_LEDGER)
+
+    # One batched read so all balances come from the same block
+    snapshot = read_balances(token, [ADDRS["Buyer"], ADDRS["Seller"]], block_identifier)
+    return _ledger_from_snapshot(snapshot)
+
+async def aget_onchain_ledger(block_identifier="latest"):
+    if not await ais_connected():
+        return dict(EMPTY_LEDGER)
+
+    token = aget_contract("DemoSGD")
+    if not token:
+        return dict(EMPTY_LEDGER)
+
+    snapshot = await aread_balances(token, [ADDRS["Buyer"], ADDRS["Seller"]], block_identifier)
+    return _ledger_from_snapshot(snapshot)
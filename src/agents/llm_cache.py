@@ -0,0 +1,215 @@
+"""Persistent LLM response cache (SQLite).
+
+The models run at temperature 0, so identical prompts give identical answers.
+`ResponseStore` keeps those answers on disk, keyed by a hash of the model
+configuration (llm_string) and the rendered prompt (template + inputs), with
+least-recently-used eviction once `max_entries` is exceeded. Each chain gets
+its own `ChainCache` view (see `src.agents.tools.get_llm_chain`) so hit rates
+are reported per chain.
+
+Only exact prompts hit by default. With `embeddings` set, a chain listed in
+`similar_chains` also falls back, on a miss, to the closest cached prompt of
+the same chain and model if its cosine similarity reaches `similarity`. Only
+list chains whose prompts carry no payment data: a near-duplicate of "I want
+a $1500 watch" is another payment, and its answer (amount, status) is wrong.
+
+Hits don't write: access times are kept in memory and written with the next
+update, eviction, or every `_TOUCH_BATCH` hits.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from langchain_core.caches import BaseCache
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    chain TEXT NOT NULL,
+    llm TEXT NOT NULL,
+    generations TEXT NOT NULL,
+    embedding BLOB,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed);
+CREATE INDEX IF NOT EXISTS responses_chain_llm ON responses (chain, llm);
+"""
+
+_TOUCH_BATCH = 256
+
+def _key(prompt, llm_string):
+    return hashlib.sha256(f"{llm_string}\x00{prompt}".encode()).hexdigest()
+
+def _prompt_text(prompt):
+    # Chat models hand the cache serialized messages; embed what they say, not the JSON
+    try:
+        return "\n".join(str(message["kwargs"]["content"]) for message in json.loads(prompt))
+    except Exception:
+        return prompt
+
+# Every chain here ends in StrOutputParser, so the text is all that needs keeping
+def _dump(generations):
+    return json.dumps([generation.text for generation in generations])
+
+def _load(data):
+    return [ChatGeneration(message=AIMessage(content=text)) for text in json.loads(data)]
+
+class ResponseStore:
+    def __init__(self, path, max_entries=10000, embeddings=None, similarity=0.97, similar_chains=()):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.embeddings = embeddings
+        self.similarity = similarity
+        self.similar_chains = frozenset(similar_chains)
+        self._lock = threading.Lock()
+        # Nodes call chains from worker threads, all writes go through the lock
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._size = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        self._vectors = {}  # (chain, llm) -> (keys, matrix), loaded on first near-duplicate lookup
+        self._touched = {}  # key -> last hit, not yet written
+        self._stats = {}
+
+    def _count(self, chain, outcome):
+        with self._lock:
+            stats = self._stats.setdefault(chain, {"hits": 0, "near_hits": 0, "misses": 0})
+            stats[outcome] += 1
+
+    def _embed(self, prompt):
+        import numpy as np
+        return np.asarray(self.embeddings.embed_query(_prompt_text(prompt)), dtype=np.float32)
+
+    def _load_vectors(self, chain, llm_string):
+        import numpy as np
+        rows = self._conn.execute(
+            "SELECT key, embedding FROM responses WHERE chain = ? AND llm = ? AND embedding IS NOT NULL",
+            (chain, llm_string),
+        ).fetchall()
+        keys = [key for key, _ in rows]
+        matrix = np.stack([np.frombuffer(blob, dtype=np.float32) for _, blob in rows]) if rows else None
+        return keys, matrix
+
+    def _nearest(self, chain, llm_string, vector):
+        import numpy as np
+        with self._lock:
+            if (chain, llm_string) not in self._vectors:
+                self._vectors[(chain, llm_string)] = self._load_vectors(chain, llm_string)
+            keys, matrix = self._vectors[(chain, llm_string)]
+        if matrix is None:
+            return None
+        scores = matrix @ vector / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(vector) + 1e-12)
+        best = int(np.argmax(scores))
+        return keys[best] if scores[best] >= self.similarity else None
+
+    def _flush_touched(self):
+        # Called with the lock held; the caller commits
+        if self._touched:
+            self._conn.executemany("UPDATE responses SET accessed = ? WHERE key = ?",
+                                   [(accessed, key) for key, accessed in self._touched.items()])
+            self._touched.clear()
+
+    def _fetch(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT generations FROM responses WHERE key = ?", (key,)).fetchone()
+            if row:
+                self._touched[key] = time.time()
+                if len(self._touched) >= _TOUCH_BATCH:
+                    self._flush_touched()
+                    self._conn.commit()
+        return _load(row[0]) if row else None
+
+    def _near_duplicates(self, chain):
+        return self.embeddings is not None and chain in self.similar_chains
+
+    def lookup(self, chain, prompt, llm_string):
+        generations = self._fetch(_key(prompt, llm_string))
+        if generations is not None:
+            self._count(chain, "hits")
+            return generations
+        if self._near_duplicates(chain):
+            try:
+                key = self._nearest(chain, llm_string, self._embed(prompt))
+            except Exception as e:
+                print(f"LLM cache near-duplicate lookup failed: {e}")
+                key = None
+            generations = self._fetch(key) if key else None
+            if generations is not None:
+                self._count(chain, "near_hits")
+                return generations
+        self._count(chain, "misses")
+        return None
+
+    def update(self, chain, prompt, llm_string, generations):
+        key = _key(prompt, llm_string)
+        embedding = None
+        if self._near_duplicates(chain):
+            try:
+                embedding = self._embed(prompt)
+            except Exception as e:
+                print(f"LLM cache embedding failed: {e}")
+        now = time.time()
+        with self._lock:
+            self._flush_touched()
+            if not self._conn.execute("SELECT 1 FROM responses WHERE key = ?", (key,)).fetchone():
+                self._size += 1
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, chain, llm_string, _dump(generations),
+                 embedding.tobytes() if embedding is not None else None, now, now),
+            )
+            if self._size > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed LIMIT ?)",
+                    (self._size - self.max_entries,),
+                )
+                self._size = self.max_entries
+                self._vectors.clear()
+            elif embedding is not None and (chain, llm_string) in self._vectors:
+                self._vectors.pop((chain, llm_string))
+            self._conn.commit()
+
+    def clear(self, chain=None):
+        with self._lock:
+            self._flush_touched()
+            if chain is None:
+                self._conn.execute("DELETE FROM responses")
+            else:
+                self._conn.execute("DELETE FROM responses WHERE chain = ?", (chain,))
+            self._conn.commit()
+            self._size = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            self._vectors.clear()
+
+    def stats(self):
+        """{"entries": n, "chains": {chain: {"hits", "near_hits", "misses", "hit_rate"}}}"""
+        with self._lock:
+            chains = {}
+            for chain, stats in self._stats.items():
+                total = sum(stats.values())
+                hits = stats["hits"] + stats["near_hits"]
+                chains[chain] = {**stats, "hit_rate": hits / total if total else 0.0}
+            return {"entries": self._size, "chains": chains}
+
+class ChainCache(BaseCache):
+    """One chain's view of a ResponseStore (set as the chain's model `cache`)."""
+
+    def __init__(self, store, chain):
+        self.store = store
+        self.chain = chain
+
+    def lookup(self, prompt, llm_string):
+        return self.store.lookup(self.chain, prompt, llm_string)
+
+    def update(self, prompt, llm_string, return_val):
+        self.store.update(self.chain, prompt, llm_string, return_val)
+
+    def clear(self, **kwargs):
+        self.store.clear(self.chain)
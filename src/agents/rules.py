@@ -0,0 +1,105 @@
+"""Declarative compliance rules.
+
+Rules are plain data: a name, the status they yield and a ``when`` mapping of
+``fact__op`` conditions that must all hold. The engine walks them in order and
+the first match decides the status, so the Compliance Agent only needs the LLM
+for narrative text or when no rule can decide (``AMBIGUOUS``).
+"""
+import operator
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from src.config import COMPLIANCE_THRESHOLD
+
+PASS = "PASS"
+FAIL = "FAIL"
+PENDING = "PENDING"
+AMBIGUOUS = "AMBIGUOUS"
+
+OPERATORS = {
+    "eq": operator.eq,
+    "ne": operator.ne,
+    "gt": operator.gt,
+    "gte": operator.ge,
+    "lt": operator.lt,
+    "lte": operator.le,
+    "is": operator.is_,
+}
+
+@dataclass(frozen=True)
+class Rule:
+    name: str
+    status: str
+    when: dict
+    reason: str = ""
+
+    def matches(self, facts: dict) -> bool:
+        for key, expected in self.when.items():
+            fact, _, op = key.partition("__")
+            value = facts.get(fact)
+            compare = OPERATORS[op or "eq"]
+            # Ordering comparisons never match missing facts
+            if value is None and op not in ("is", "eq", "ne"):
+                return False
+            if not compare(value, expected):
+                return False
+        return True
+
+@dataclass(frozen=True)
+class Decision:
+    status: str
+    rule: Optional[str] = None
+    reason: str = ""
+
+    def explain(self, facts: dict) -> str:
+        return f"Rule '{self.rule}' decided {self.status}: {self.reason.format(**facts)}"
+
+def default_rules(threshold: float = COMPLIANCE_THRESHOLD) -> List[Rule]:
+    """The Compliance Agent rules (mirrors SourceOfFundsPolicy on-chain)."""
+    return [
+        Rule("amount-unknown", AMBIGUOUS, {"amount__is": None},
+             "the transaction amount could not be determined."),
+        Rule("amount-not-positive", AMBIGUOUS, {"amount__lte": 0},
+             "an amount of ${amount} is not a valid payment."),
+        Rule("sof-verified", PASS, {"has_sof": True},
+             "Source of Funds is verified (uploaded={sof_vc}, on-chain={sof_onchain})."),
+        Rule("below-threshold", PASS, {"amount__lte": threshold},
+             f"${{amount}} is within the ${threshold:,.0f} threshold."),
+        Rule("sof-missing", PENDING, {"amount__gt": threshold, "has_sof": False},
+             f"${{amount}} exceeds the ${threshold:,.0f} threshold and Source of Funds is missing; escrow required."),
+    ]
+
+@dataclass
+class RuleEngine:
+    rules: List[Rule] = field(default_factory=default_rules)
+
+    def register(self, rule: Rule, first: bool = False):
+        """Adds a rule. ``first=True`` lets it pre-empt the existing rules."""
+        if first:
+            self.rules.insert(0, rule)
+        else:
+            self.rules.append(rule)
+
+    def evaluate(self, facts: dict) -> Decision:
+        for rule in self.rules:
+            if rule.matches(facts):
+                return Decision(rule.status, rule.name, rule.reason)
+        return Decision(AMBIGUOUS, None, "no rule matched.")
+
+def build_facts(intent: dict, sof_onchain: bool) -> dict:
+    """Flattens the buyer intent into the facts the rules are written against."""
+    vcs = intent.get("attached_vcs", {})
+    try:
+        amount = float(intent.get("amount"))
+    except (TypeError, ValueError):
+        amount = None
+    sof_vc = bool(vcs.get("sof", False))
+    return {
+        "amount": amount,
+        "sof_vc": sof_vc,
+        "sof_onchain": bool(sof_onchain),
+        "has_sof": sof_vc or bool(sof_onchain),
+        "sanctions_vc": bool(vcs.get("sanctions", False)),
+    }
+
+rule_engine = RuleEngine()
@@ -1,11 +1,131 @@
-from langchain_community.chat_models import ChatOllama
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
-from src.config import LLM_MODEL, LLM_BASE_URL
+"""LLM chains for the agents.
 
-# Initialize LLM
-llm = ChatOllama(model=LLM_MODEL, base_url=LLM_BASE_URL, temperature=0)
+The Ollama client (and the response cache) are created on first use, not at
+import: `llm` and `response_cache` resolve through `get_llm()` /
+`get_response_cache()`, so importing the agents doesn't pull in
+langchain_community. Every chain reports its model calls (time, tokens) to
+`src.metrics.instrumentation` through `LLMMetrics`.
+"""
+import json
+import threading
+import time
+from langchain_core.callbacks import BaseCallbackHandler
+from src.config import (
+    LLM_MODEL, LLM_BASE_URL, LLM_CACHE_ENABLED, LLM_CACHE_PATH, LLM_CACHE_MAX_ENTRIES,
+    LLM_CACHE_EMBED_MODEL, LLM_CACHE_SIMILARITY, LLM_CACHE_SIMILAR_CHAINS
+)
+from src.agents.llm_cache import ChainCache, ResponseStore
+from src.metrics import instrumentation
 
-def get_llm_chain(template: str):
-    prompt = ChatPromptTemplate.from_template(template)
-    return prompt | llm | StrOutputParser()
+_init_lock = threading.Lock()
+
+def get_llm():
+    model = globals().get("llm")
+    if model is None:
+        with _init_lock:
+            model = globals().get("llm")
+            if model is None:
+                from langchain_community.chat_models import ChatOllama
+                model = globals()["llm"] = ChatOllama(model=LLM_MODEL, base_url=LLM_BASE_URL, temperature=0)
+    return model
+
+def _response_store():
+    if not LLM_CACHE_ENABLED:
+        return None
+    embeddings = None
+    if LLM_CACHE_EMBED_MODEL:
+        from langchain_community.embeddings import OllamaEmbeddings
+        embeddings = OllamaEmbeddings(model=LLM_CACHE_EMBED_MODEL, base_url=LLM_BASE_URL)
+    return ResponseStore(LLM_CACHE_PATH, LLM_CACHE_MAX_ENTRIES, embeddings, LLM_CACHE_SIMILARITY, LLM_CACHE_SIMILAR_CHAINS)
+
+def get_response_cache():
+    if "response_cache" not in globals():
+        with _init_lock:
+            if "response_cache" not in globals():
+                globals()["response_cache"] = _response_store()
+    return globals()["response_cache"]
+
+def __getattr__(name):
+    # `tools.llm` / `tools.response_cache` before first use (set_llm or monkeypatching replaces them)
+    if name == "llm":
+        return get_llm()
+    if name == "response_cache":
+        return get_response_cache()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# (template, schema, llm, cache) -> chain; keyed on the objects so swapping `llm` still works
+_chains = {}
+
+def set_llm(model, cache=None):
+    """Swaps the model (and response cache) used by every chain, e.g. for benchmarks."""
+    globals().update(llm=model, response_cache=cache)
+    _chains.clear()
+
+def _token_usage(response):
+    tokens_in = tokens_out = 0
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                tokens_in += usage.get("input_tokens") or 0
+                tokens_out += usage.get("output_tokens") or 0
+            else:
+                # ChatOllama reports Ollama's own counts in generation_info
+                info = generation.generation_info or {}
+                tokens_in += info.get("prompt_eval_count") or 0
+                tokens_out += info.get("eval_count") or 0
+    return tokens_in, tokens_out
+
+class LLMMetrics(BaseCallbackHandler):
+    """Times each model call of one chain and counts its tokens (see src/metrics.py)."""
+
+    # Run in the caller's context, so calls are charged to the current graph thread
+    run_inline = True
+
+    def __init__(self, chain):
+        self.chain = chain
+        self._started = {}  # run_id -> perf_counter
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        seconds = time.perf_counter() - self._started.pop(run_id, time.perf_counter())
+        instrumentation.record_llm(self.chain, seconds, *_token_usage(response))
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        seconds = time.perf_counter() - self._started.pop(run_id, time.perf_counter())
+        instrumentation.record_llm(self.chain, seconds, error=repr(error))
+
+def _chain_name(template):
+    # First words of the prompt, enough to tell the chains apart in stats()
+    return " ".join(template.split()[:8])
+
+def _build_chain(template, schema=None, name=None):
+    llm, response_cache = get_llm(), get_response_cache()
+    key = (template, json.dumps(schema, sort_keys=True) if schema else None, id(llm), id(response_cache))
+    entry = _chains.get(key)
+    if entry is None:
+        from langchain_core.prompts import ChatPromptTemplate
+        from langchain_core.output_parsers import StrOutputParser
+        model = llm
+        name = name or _chain_name(template)
+        if response_cache is not None:
+            model = llm.model_copy(update={"cache": ChainCache(response_cache, name)})
+        if schema is not None:
+            model = model.bind(format=schema)
+        chain = ChatPromptTemplate.from_template(template) | model | StrOutputParser()
+        chain = chain.with_config(callbacks=[LLMMetrics(name)])
+        # Keep llm/cache alive so their ids can't be reused by another object
+        entry = _chains[key] = (chain, llm, response_cache)
+    return entry[0]
+
+def get_llm_chain(template: str, name: str = None):
+    return _build_chain(template, name=name)
+
+def get_json_chain(template: str, schema: dict, name: str = None):
+    """Like get_llm_chain, but Ollama constrains the output to `schema` (JSON mode)."""
+    return _build_chain(template, schema, name)
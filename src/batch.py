@@ -0,0 +1,218 @@
+"""Batch settlement: settle many buyer intents through X402PolicyWrapper in one pass.
+
+Usage: python -m src.batch payments.jsonl --out results.jsonl
+
+Each input line is a JSON object with a `request_id` and either an `amount`
+(SGD) or free text in `body`/`title` containing one (e.g. "I want a $150 pen").
+An optional `to` overrides the seller address. Authorizations are pre-signed,
+transactions are built locally with consecutive nonces and sent back-to-back,
+and the confirmation tracker collects receipts while later chunks are still
+being sent. Requests whose policies would FAIL (an eth_call dry run) are not
+submitted at all. No LLM is involved.
+"""
+import argparse
+import json
+import sys
+import time
+from eth_account import Account
+from hexbytes import HexBytes
+from web3 import Web3
+from src.config import ADDRS, BUYER_PK, CHAIN_ID, COMPLIANCE_PK, BATCH_GAS_LIMIT
+from src.agents.intent import parse_amount
+from src.blockchain.client import w3, get_contract, is_connected
+from src.blockchain.nonces import is_already_known, nonce_manager
+from src.blockchain.confirmations import confirmation_tracker
+from src.blockchain.utils import ATTESTATION_STATUS, get_transfer_signer
+from src.blockchain.indexer import index_receipts
+from src.blockchain.policies import dry_run
+
+def load_requests(path):
+    with open(path, "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def request_amount(request):
+    """Amount in SGD from an explicit `amount` or the (single) amount in the text."""
+    if request.get("amount") is not None:
+        return float(request["amount"])
+    return parse_amount(f"{request.get('title', '')} {request.get('body', '')}")
+
+def _error_message(response):
+    error = response.get("error") if isinstance(response, dict) else None
+    if error is None:
+        return None
+    message = error.get("message", str(error)) if isinstance(error, dict) else str(error)
+    return None if is_already_known(message) else message
+
+def _send_raw(raw_txs):
+    """Sends signed transactions in one JSON-RPC batch; returns (tx_hash, error or None) per transaction.
+
+    Responses are checked one by one, so one rejected transaction doesn't
+    sink the rest of the batch, and "already known" counts as sent. The hash
+    is the keccak of the raw transaction, known whatever the node answers. A
+    node without batch support (a single error response) or a failed batch
+    gets them one at a time.
+    """
+    hashes = [Web3.keccak(raw) for raw in raw_txs]
+    try:
+        responses = w3.provider.make_batch_request(
+            [("eth_sendRawTransaction", [HexBytes(raw).to_0x_hex()]) for raw in raw_txs]
+        )
+    except Exception:
+        responses = None
+    if not isinstance(responses, list) or len(responses) != len(raw_txs):
+        responses = []
+        for raw in raw_txs:
+            try:
+                w3.eth.send_raw_transaction(raw)
+                responses.append({})
+            except Exception as e:
+                responses.append({"error": {"message": str(e)}})
+    return [(tx_hash, _error_message(response)) for tx_hash, response in zip(hashes, responses)]
+
+def _fill_gaps(account, template, nonces):
+    """Sends a 0-value self-transfer at each of `nonces`; True if the node took them all."""
+    fees = {k: template[k] for k in ("chainId", "type", "gasPrice", "maxFeePerGas", "maxPriorityFeePerGas") if k in template}
+    fillers = [account.sign_transaction(dict(fees, to=account.address, value=0, gas=21000, nonce=nonce)).raw_transaction
+               for nonce in nonces]
+    return all(error is None for _, error in _send_raw(fillers))
+
+def settle_batch(requests, chunk_size=500, receipt_timeout=120):
+    """Settles `requests` and returns one result dict per request, in input order."""
+    results = [{"request_id": r.get("request_id"), "status": None, "error": None} for r in requests]
+    if not (is_connected() and ADDRS):
+        for result in results:
+            result["error"] = "Blockchain not connected"
+        return results
+
+    wrapper = get_contract("PolicyWrapper")
+    ca_account = Account.from_key(COMPLIANCE_PK)
+
+    # 1. Pre-sign every buyer authorization (spread over a process pool)
+    valid = []
+    for request, result in zip(requests, results):
+        amount = request_amount(request)
+        result["amount"] = amount
+        if not amount or amount <= 0:
+            result["status"], result["error"] = "SKIPPED", "No amount found"
+            continue
+        valid.append((request, result))
+    if not valid:
+        return results
+
+    # 1b. Dry-run the policies for every request in one read: the gas is fixed
+    #     (no estimate to catch a revert), so requests that would FAIL are
+    #     dropped here instead of being broadcast
+    buyer = Account.from_key(BUYER_PK).address
+    outcomes = dry_run([
+        (buyer, request.get("to") or ADDRS["Seller"], int(result["amount"] * 1e6)) for request, result in valid
+    ])
+    if outcomes is not None:
+        for (_, result), (status, _) in zip(valid, outcomes):
+            if status == "FAIL":
+                result["status"], result["error"] = "FAIL", "Policy dry run failed; not submitted"
+        valid = [(request, result) for request, result in valid if result["status"] is None]
+        if not valid:
+            return results
+
+    signer = get_transfer_signer(ADDRS["DemoSGD"], BUYER_PK, CHAIN_ID)
+    auths = signer.sign_many([
+        {"to": ADDRS["PolicyWrapper"], "value": int(result["amount"] * 1e6)} for _, result in valid
+    ])
+    pending = []
+    for (request, result), auth in zip(valid, auths):
+        to = request.get("to") or ADDRS["Seller"]
+        pending.append((result, [
+            auth["from"], to, auth["value"], auth["validAfter"], auth["validBefore"],
+            auth["nonce"], auth["v"], auth["r"], auth["s"]
+        ]))
+
+    # 2. Build and sign locally: fee fields are fetched once and gas is fixed,
+    #    so there's no estimate_gas round trip per transaction
+    template = wrapper.functions.payWithAuthorization(*pending[0][1]).build_transaction(
+        {"from": ca_account.address, "gas": BATCH_GAS_LIMIT}
+    )
+    first_nonce = nonce_manager.reserve(ca_account.address, count=len(pending))
+    signed = []
+    for i, (result, args) in enumerate(pending):
+        tx_data = dict(template, data=wrapper.encode_abi("payWithAuthorization", args=args), nonce=first_nonce + i)
+        signed.append(ca_account.sign_transaction(tx_data))
+
+    # 3. Pipeline the sends (no waiting for receipts in between)
+    submitted = []
+    failed = False
+    for start in range(0, len(signed), chunk_size):
+        chunk = signed[start:start + chunk_size]
+        sent = _send_raw([s.raw_transaction for s in chunk])
+        gaps, queued = [], []
+        for i, ((result, _), (tx_hash, error)) in enumerate(zip(pending[start:start + chunk_size], sent)):
+            result["tx_hash"] = tx_hash.hex()
+            if error:
+                result["status"], result["error"] = "NOT_SUBMITTED", error
+                gaps.append(first_nonce + start + i)
+            else:
+                queued.append((result, tx_hash, bool(gaps)))
+        # The rest of the chunk already holds the nonces after a rejected one:
+        # fill the gaps so they're mined as sent (re-signing them would leave
+        # the queued copies behind)
+        if gaps and not _fill_gaps(ca_account, template, gaps):
+            failed = True
+        for result, tx_hash, behind_gap in queued:
+            if failed and behind_gap:
+                result["status"], result["error"] = "UNCONFIRMED", f"Queued behind nonce {gaps[0]}, which couldn't be filled"
+                continue
+            # Tracked while later chunks are still being sent
+            submitted.append((result, confirmation_tracker.track(tx_hash, timeout=receipt_timeout)))
+        if failed:
+            for result, _ in pending[start + chunk_size:]:
+                result["status"], result["error"] = "NOT_SUBMITTED", "Not sent after an earlier send failed"
+            break
+    nonce_manager.release(ca_account.address, count=len(pending), failed=failed)
+
+    # 4. Collect receipts as the tracker resolves them
+    confirmed = []
+    for result, confirmation in submitted:
+        try:
+            receipt = confirmation.result()
+        except TimeoutError:
+            result["status"], result["error"] = "UNCONFIRMED", "Receipt not found before timeout"
+            continue
+        result["block_number"] = receipt["blockNumber"]
+        result["gas_used"] = receipt["gasUsed"]
+        confirmed.append((result, receipt))
+
+    # 5. Index all attestations in one write, then read the outcome from them
+    for (result, receipt), events in zip(confirmed, index_receipts([r for _, r in confirmed])):
+        attested = [e for e in events if e["event"] == "TransactionAttested"]
+        if receipt["status"] != 1:
+            # Reverted: "Policy Check Failed" (FAIL) or an invalid authorization
+            result["status"] = "FAIL"
+        elif attested:
+            result["status"] = ATTESTATION_STATUS.get(attested[0]["status"], "PENDING")
+            result["transaction_id"] = attested[0]["transaction_id"]
+        else:
+            result["status"] = "PENDING"
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Settle a file of payment requests in one pass.")
+    parser.add_argument("input", help="JSONL file of payment requests")
+    parser.add_argument("--out", default="batch_results.jsonl", help="JSONL file for per-request results")
+    parser.add_argument("--chunk-size", type=int, default=500, help="Transactions per JSON-RPC send batch")
+    args = parser.parse_args(argv)
+
+    requests = load_requests(args.input)
+    start = time.perf_counter()
+    results = settle_batch(requests, chunk_size=args.chunk_size)
+    elapsed = time.perf_counter() - start
+
+    with open(args.out, "w") as f:
+        for result in results:
+            f.write(json.dumps(result) + "\n")
+
+    settled = sum(1 for r in results if r["status"] in ATTESTATION_STATUS.values())
+    rate = settled / elapsed * 60 if elapsed else 0.0
+    print(f"Settled {settled}/{len(results)} requests in {elapsed:.2f}s ({rate:,.0f}/min). Results: {args.out}")
+    return 0 if settled == len(results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,22 @@
-# Generated ABIs
-DEMO_SGD_ABI = [{'type': 'constructor', 'inputs': [], 'stateMutability': 'nonpayable'}, {'type': 'function', 'name': 'DOMAIN_SEPARATOR', 'inputs': [], 'outputs': [{'name': '', 'type': 'bytes32', 'internalType': 'bytes32'}], 'stateMutability': 'view'}, {'type': 'function', 'name': 'TRANSFER_WITH_AUTHORIZATION_TYPEHASH', 'inputs': [], 'outputs': [{'name': '', 'type': 'bytes32', 'internalType': 'bytes32'}], 'stateMutability': 'view'}, {'type': 'function', 'name': 'allowance', 'inputs': [{'name': '', 'type': 'address', 'internalType': 'address'}, {'name': '', 'type': 'address', 'internalType': 'address'}], 'outputs': [{'name': '', 'type': 'uint256', 'internalType': 'uint256'}], 'stateMutability': 'view'}, {'type': 'function', 'name': 'approve', 'inputs': [{'name': 'spender', 'type': 'address', 'internalType': 'address'}, {'name': 'value', 'type': 'uint256', 'internalType': 'uint256'}], 'outputs': [{'name': '', 'type': 'bool', 'internalType': 'bool'}], 'stateMutability': 'nonpayable'}, {'type': 'function', 'name': 'authorizationState', 'inputs': [{'name': '', 'type': 'address', 'internalType': 'address'}, {'name': '', 'type': 'bytes32', 'internalType': 'bytes32'}], 'outputs': [{'name': '', 'type': 'bool', 'internalType': 'bool'}], 'stateMutability': 'view'}, {'type': 'function', 'name': 'balanceOf', 'inputs': [{'name': '', 'type': 'address', 'internalType': 'address'}], 'outputs': [{'name': '', 'type': 'uint256', 'internalType': 'uint256'}], 'stateMutability': 'view'}, {'type': 'function', 'name': 'decimals', 'inputs': [], 'outputs': [{'name': '', 'type': 'uint8', 'internalType': 'uint8'}], 'stateMutability': 'view'}, {'type': 'function', 'name': 'mint', 'inputs': [{'name': 'to', 'type': 'address', 'internalType': 'address'}, {'name': 'amount', 'type': 'uint256', 'internalType': 'uint256'}], 'outputs': [], 'stateMutability': 'nonpayable'}, {'type': 'function', 'name': 'name', 'inputs': [], 'outputs': [{'name': '', 'type': 'string', 'internalType': 'string'}], 'stateMutability': 'view'}, {'type': 'function', 'name': 'symbol', 'inputs': [], 'outputs': [{'name': '', 'type': 'string', 'internalType': 'string'}], 'stateMutability': 'view'}, {'type': 'function', 'name': 'totalSupply', 'inputs': [], 'outputs': [{'name': '', 'type': 'uint256', 'internalType': 'uint256'}], 'stateMutability': 'view'}, {'type': 'function', 'name': 'transfer', 'inputs': [{'name': 'to', 'type': 'address', 'internalType': 'address'}, {'name': 'value', 'type': 'uint256', 'internalType': 'uint256'}], 'outputs': [{'name': '', 'type': 'bool', 'internalType': 'bool'}], 'stateMutability': 'nonpayable'}, {'type': 'function', 'name': 'transferFrom', 'inputs': [{'name': 'from', 'type': 'address', 'internalType': 'address'}, {'name': 'to', 'type': 'address', 'internalType': 'address'}, {'name': 'value', 'type': 'uint256', 'internalType': 'uint256'}], 'outputs': [{'name': '', 'type': 'bool', 'internalType': 'bool'}], 'stateMutability': 'nonpayable'}, {'type': 'function', 'name': 'transferWithAuthorization', 'inputs': [{'name': 'from', 'type': 'address', 'internalType': 'address'}, {'name': 'to', 'type': 'address', 'internalType': 'address'}, {'name': 'value', 'type': 'uint256', 'internalType': 'uint256'}, {'name': 'validAfter', 'type': 'uint256', 'internalType': 'uint256'}, {'name': 'validBefore', 'type': 'uint256', 'internalType': 'uint256'}, {'name': 'nonce', 'type': 'bytes32', 'internalType': 'bytes32'}, {'name': 'v', 'type': 'uint8', 'internalType': 'uint8'}, {'name': 'r', 'type': 'bytes32', 'internalType': 'bytes32'}, {'name': 's', 'type': 'bytes32', 'internalType': 'bytes32'}], 'outputs': [], 'stateMutability': 'nonpayable'}, {'type': 'event', 'name': 'Approval', 'inputs': [{'name': 'owner', 'type': 'address', 'indexed': True, 'internalType': 'address'}, {'name': 'spender', 'type': 'address', 'indexed': True, 'internalType': 'address'}, {'name': 'value', 'type': 'uint256', 'indexed': False, 'internalType': 'uint256'}], 'anonymous': False}, {'type': 'event', 'name': 'AuthorizationUsed', 'inputs': [{'name': 'authorizer', 'type': 'address', 'indexed': True, 'internalType': 'address'}, {'name': 'nonce', 'type': 'bytes32', 'indexed': True, 'internalType': 'bytes32'}], 'anonymous': False}, {'type': 'event', 'name': 'Transfer', 'inputs': [{'name': 'from', 'type': 'address', 'indexed': True, 'internalType': 'address'}, {'name': 'to', 'type': 'address', 'indexed': True, 'internalType': 'address'}, {'name': 'value', 'type': 'uint256', 'indexed': False, 'internalType': 'uint256'}], 'anonymous': False}]
+"""ABIs by constant name, read lazily from the Foundry artifacts.
 
-WRAPPER_ABI = [{'type': 'constructor', 'inputs': [{'name': '_token', 'type': 'address', 'internalType': 'address'}, {'name': '_policyManager', 'type': 'address', 'internalType': 'address'}], 'stateMutability': 'nonpayable'}, {'type': 'function', 'name': 'admin', 'inputs': [], 'outputs': [{'name': '', 'type': 'address', 'internalType': 'address'}], 'stateMutability': 'view'}, {'type': 'function', 'name': 'attestations', 'inputs': [{'name': '', 'type': 'bytes32', 'internalType': 'bytes32'}], 'outputs': [{'name': 'status', 'type': 'uint8', 'internalType': 'enum IPolicySimple.Status'}, {'name': 'timestamp', 'type': 'uint256', 'internalType': 'uint256'}], 'stateMutability': 'view'}, {'type': 'function', 'name': 'calculateTransactionId', 'inputs': [{'name': 'from', 'type': 'address', 'internalType': 'address'}, {'name': 'to', 'type': 'address', 'internalType': 'address'}, {'name': 'amount', 'type': 'uint256', 'internalType': 'uint256'}, {'name': 'nonce', 'type': 'bytes32', 'internalType': 'bytes32'}], 'outputs': [{'name': '', 'type': 'bytes32', 'internalType': 'bytes32'}], 'stateMutability': 'pure'}, {'type': 'function', 'name': 'getAttestation', 'inputs': [{'name': 'transactionId', 'type': 'bytes32', 'internalType': 'bytes32'}], 'outputs': [{'name': '', 'type': 'uint8', 'internalType': 'enum IPolicySimple.Status'}, {'name': '', 'type': 'tuple[]', 'internalType': 'struct IPolicySimple.PolicyResult[]', 'components': [{'name': 'policyId', 'type': 'bytes32', 'internalType': 'bytes32'}, {'name': 'status', 'type': 'uint8', 'internalType': 'enum IPolicySimple.Status'}, {'name': 'reason', 'type': 'bytes32', 'internalType': 'bytes32'}]}], 'stateMutability': 'view'}, {'type': 'function', 'name': 'payWithAuthorization', 'inputs': [{'name': 'from', 'type': 'address', 'internalType': 'address'}, {'name': 'to', 'type': 'address', 'internalType': 'address'}, {'name': 'value', 'type': 'uint256', 'internalType': 'uint256'}, {'name': 'validAfter', 'type': 'uint256', 'internalType': 'uint256'}, {'name': 'validBefore', 'type': 'uint256', 'internalType': 'uint256'}, {'name': 'nonce', 'type': 'bytes32', 'internalType': 'bytes32'}, {'name': 'v', 'type': 'uint8', 'internalType': 'uint8'}, {'name': 'r', 'type': 'bytes32', 'internalType': 'bytes32'}, {'name': 's', 'type': 'bytes32', 'internalType': 'bytes32'}], 'outputs': [], 'stateMutability': 'nonpayable'}, {'type': 'function', 'name': 'policyManager', 'inputs': [], 'outputs': [{'name': '', 'type': 'address', 'internalType': 'contract SimplePolicyManager'}], 'stateMutability': 'view'}, {'type': 'function', 'name': 'resolvePending', 'inputs': [{'name': 'transactionId', 'type': 'bytes32', 'internalType': 'bytes32'}, {'name': 'failNow', 'type': 'bool', 'internalType': 'bool'}], 'outputs': [], 'stateMutability': 'nonpayable'}, {'type': 'function', 'name': 'token', 'inputs': [], 'outputs': [{'name': '', 'type': 'address', 'internalType': 'contract DemoSGD'}], 'stateMutability': 'view'}, {'type': 'event', 'name': 'TransactionAttested', 'inputs': [{'name': 'transactionId', 'type': 'bytes32', 'indexed': True, 'internalType': 'bytes32'}, {'name': 'status', 'type': 'uint8', 'indexed': False, 'internalType': 'enum IPolicySimple.Status'}], 'anonymous': False}, {'type': 'event', 'name': 'TransactionCompleted', 'inputs': [{'name': 'transactionId', 'type': 'bytes32', 'indexed': True, 'internalType': 'bytes32'}, {'name': 'from', 'type': 'address', 'indexed': True, 'internalType': 'address'}, {'name': 'to', 'type': 'address', 'indexed': True, 'internalType': 'address'}, {'name': 'amount', 'type': 'uint256', 'indexed': False, 'internalType': 'uint256'}], 'anonymous': False}]
+Kept for scripts that import e.g. `WRAPPER_ABI`; the code goes through
+`src.blockchain.contracts`, which loads and caches the artifacts in out/.
+"""
+from src.blockchain.contracts import contracts
 
-ESCROW_ABI = [{'type': 'constructor', 'inputs': [{'name': '_token', 'type': 'address', 'internalType': 'address'}, {'name': '_buyer', 'type': 'address', 'internalType': 'address'}, {'name': '_seller', 'type': 'address', 'internalType': 'address'}, {'name': '_amount', 'type': 'uint256', 'internalType': 'uint256'}, {'name': '_expiresAt', 'type': 'uint256', 'internalType': 'uint256'}], 'stateMutability': 'nonpayable'}, {'type': 'function', 'name': 'admin', 'inputs': [], 'outputs': [{'name': '', 'type': 'address', 'internalType': 'address'}], 'stateMutability': 'view'}, {'type': 'function', 'name': 'amount', 'inputs': [], 'outputs': [{'name': '', 'type': 'uint256', 'internalType': 'uint256'}], 'stateMutability': 'view'}, {'type': 'function', 'name': 'buyer', 'inputs': [], 'outputs': [{'name': '', 'type': 'address', 'internalType': 'address'}], 'stateMutability': 'view'}, {'type': 'function', 'name': 'expiresAt', 'inputs': [], 'outputs': [{'name': '', 'type': 'uint256', 'internalType': 'uint256'}], 'stateMutability': 'view'}, {'type': 'function', 'name': 'fundWithAuthorization', 'inputs': [{'name': 'validAfter', 'type': 'uint256', 'internalType': 'uint256'}, {'name': 'validBefore', 'type': 'uint256', 'internalType': 'uint256'}, {'name': 'nonce', 'type': 'bytes32', 'internalType': 'bytes32'}, {'name': 'v', 'type': 'uint8', 'internalType': 'uint8'}, {'name': 'r', 'type': 'bytes32', 'internalType': 'bytes32'}, {'name': 's', 'type': 'bytes32', 'internalType': 'bytes32'}], 'outputs': [], 'stateMutability': 'nonpayable'}, {'type': 'function', 'name': 'refund', 'inputs': [], 'outputs': [], 'stateMutability': 'nonpayable'}, {'type': 'function', 'name': 'refunded', 'inputs': [], 'outputs': [{'name': '', 'type': 'bool', 'internalType': 'bool'}], 'stateMutability': 'view'}, {'type': 'function', 'name': 'release', 'inputs': [], 'outputs': [], 'stateMutability': 'nonpayable'}, {'type': 'function', 'name': 'released', 'inputs': [], 'outputs': [{'name': '', 'type': 'bool', 'internalType': 'bool'}], 'stateMutability': 'view'}, {'type': 'function', 'name': 'seller', 'inputs': [], 'outputs': [{'name': '', 'type': 'address', 'internalType': 'address'}], 'stateMutability': 'view'}, {'type': 'function', 'name': 'token', 'inputs': [], 'outputs': [{'name': '', 'type': 'address', 'internalType': 'contract DemoSGD'}], 'stateMutability': 'view'}, {'type': 'event', 'name': 'Funded', 'inputs': [{'name': 'from', 'type': 'address', 'indexed': False, 'internalType': 'address'}, {'name': 'amount', 'type': 'uint256', 'indexed': False, 'internalType': 'uint256'}], 'anonymous': False}, {'type': 'event', 'name': 'Refunded', 'inputs': [{'name': 'to', 'type': 'address', 'indexed': False, 'internalType': 'address'}, {'name': 'amount', 'type': 'uint256', 'indexed': False, 'internalType': 'uint256'}], 'anonymous': False}, {'type': 'event', 'name': 'Released', 'inputs': [{'name': 'to', 'type': 'address', 'indexed': False, 'internalType': 'address'}, {'name': 'amount', 'type': 'uint256', 'indexed': False, 'internalType': 'uint256'}], 'anonymous': False}]
+_CONTRACTS = {
+    "DEMO_SGD_ABI": "DemoSGD",
+    "WRAPPER_ABI": "PolicyWrapper",
+    "ESCROW_ABI": "SimpleEscrow",
+    "ESCROW_FACTORY_ABI": "SimpleEscrowFactory",
+    "POLICY_MANAGER_ABI": "PolicyManager",
+    "REGISTRY_ABI": "IdentityRegistry",
+    "SOF_POLICY_ABI": "SourceOfFundsPolicy",
+    "MULTICALL3_ABI": "Multicall3",
+}
 
-REGISTRY_ABI = [{'type': 'function', 'name': 'hasSanctionsCheck', 'inputs': [{'name': 'wallet', 'type': 'address', 'internalType': 'address'}], 'outputs': [{'name': '', 'type': 'bool', 'internalType': 'bool'}], 'stateMutability': 'view'}, {'type': 'function', 'name': 'hasSourceOfFunds', 'inputs': [{'name': 'wallet', 'type': 'address', 'internalType': 'address'}], 'outputs': [{'name': '', 'type': 'bool', 'internalType': 'bool'}], 'stateMutability': 'view'}, {'type': 'function', 'name': 'sanctionsRef', 'inputs': [{'name': '', 'type': 'address', 'internalType': 'address'}], 'outputs': [{'name': '', 'type': 'bytes32', 'internalType': 'bytes32'}], 'stateMutability': 'view'}, {'type': 'function', 'name': 'setSanctionsCheck', 'inputs': [{'name': 'wallet', 'type': 'address', 'internalType': 'address'}, {'name': 'ref', 'type': 'bytes32', 'internalType': 'bytes32'}], 'outputs': [], 'stateMutability': 'nonpayable'}, {'type': 'function', 'name': 'setSourceOfFunds', 'inputs': [{'name': 'wallet', 'type': 'address', 'internalType': 'address'}, {'name': 'ref', 'type': 'bytes32', 'internalType': 'bytes32'}], 'outputs': [], 'stateMutability': 'nonpayable'}, {'type': 'function', 'name': 'sourceOfFundsRef', 'inputs': [{'name': '', 'type': 'address', 'internalType': 'address'}], 'outputs': [{'name': '', 'type': 'bytes32', 'internalType': 'bytes32'}], 'stateMutability': 'view'}]
+def __getattr__(name):
+    if name in _CONTRACTS:
+        return contracts.abi(_CONTRACTS[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,16 +1,77 @@
-from web3 import Web3
-from src.config import RPC_URL, ADDRS
-from src.blockchain import abis
-
-try:
-    w3 = Web3(Web3.HTTPProvider(RPC_URL))
-except Exception:
-    w3 = None
-
-def get_contract(name, abi):
-    if w3 and w3.is_connected() and name in ADDRS:
-        return w3.eth.contract(address=ADDRS[name], abi=abi)
+"""Shared web3 clients.
+
+`w3` and `aw3` are created on first access (`client.w3`, `from
+src.blockchain.client import w3`, or any helper below), so importing this
+module doesn't import web3.
+"""
+import threading
+from src.config import ADDRS
+from src.blockchain.contracts import contracts
+
+_init_lock = threading.Lock()
+
+def _connect():
+    from web3 import AsyncWeb3, Web3
+    from src.blockchain.provider import FailoverHTTPProvider, AsyncFailoverHTTPProvider
+
+    # Pooled keep-alive sessions with failover over RPC_URLS (see provider.py)
+    try:
+        w3 = Web3(FailoverHTTPProvider())
+    except Exception:
+        w3 = None
+
+    # Async client for the async graph nodes (app_graph.astream); shares the endpoints' health
+    try:
+        aw3 = AsyncWeb3(AsyncFailoverHTTPProvider(sync_provider=w3.provider if w3 else None))
+    except Exception:
+        aw3 = None
+    return w3, aw3
+
+def get_clients():
+    """(w3, aw3), created once."""
+    if "w3" not in globals():
+        with _init_lock:
+            if "w3" not in globals():
+                w3, aw3 = _connect()
+                globals().update(w3=w3, aw3=aw3)
+    return globals()["w3"], globals()["aw3"]
+
+def set_clients(w3, aw3=None):
+    """Swaps the shared clients (e.g. for an in-process chain in benchmarks).
+
+    Modules that did `from src.blockchain.client import w3` keep the client
+    they got, so call this before importing them.
+    """
+    with _init_lock:
+        globals().update(w3=w3, aw3=aw3)
+
+def __getattr__(name):
+    if name == "w3":
+        return get_clients()[0]
+    if name == "aw3":
+        return get_clients()[1]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def get_contract(name, address=None):
+    """Contract `name` from ADDRS, or at `address` (e.g. a pooled escrow clone); built once per address."""
+    address = address or ADDRS.get(name)
+    if address and is_connected():
+        return contracts.contract(name, address, get_clients()[0])
     return None
 
 def is_connected():
-    return w3 and w3.is_connected()
+    """Cached endpoint health: no RPC call (refreshed in the background)."""
+    w3 = get_clients()[0]
+    return bool(w3) and w3.is_connected()
+
+async def ais_connected():
+    aw3 = get_clients()[1]
+    return bool(aw3) and await aw3.is_connected()
+
+def aget_contract(name, address=None):
+    """AsyncContract for `name` (or `address`); callers check `ais_connected()` first."""
+    address = address or ADDRS.get(name)
+    aw3 = get_clients()[1]
+    if aw3 and address:
+        return contracts.contract(name, address, aw3)
+    return None
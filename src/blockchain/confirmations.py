@@ -0,0 +1,146 @@
+"""Background confirmation tracking for submitted transactions.
+
+`track(tx_hash)` returns a future right away. One poller thread serves every
+pending hash: per new block it reads the block's transaction hashes
+(`eth_getBlockByNumber`) and fetches receipts only for the tracked hashes in
+it, as one batch. Callers wait only on the futures they need:
+
+    tx_hash, confirmation = confirmation_tracker.submit(call, COMPLIANCE_PK)
+    receipt = confirmation.result(timeout=60)                 # sync
+    receipt = await confirmation_tracker.wait_async(tx_hash)  # async
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, wait
+from hexbytes import HexBytes
+from src.blockchain.client import w3
+from src.blockchain.nonces import send_transaction
+from src.metrics import instrumentation
+
+# Past this many new blocks, asking for every pending receipt is cheaper than scanning
+MAX_SCAN_BLOCKS = 256
+
+def _batched(method, args):
+    """`method(arg)` for each arg in one JSON-RPC batch (one by one if unsupported); None on errors."""
+    try:
+        with w3.batch_requests() as batch:
+            for arg in args:
+                batch.add(method(arg))
+            return batch.execute()
+    except Exception:
+        results = []
+        for arg in args:
+            try:
+                results.append(method(arg))
+            except Exception:
+                # e.g. TransactionNotFound: not mined yet
+                results.append(None)
+        return results
+
+class ConfirmationTracker:
+    def __init__(self, poll_interval=0.2, timeout=120):
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self._pending = {}    # tx hash -> (future, deadline)
+        self._unchecked = set()  # tracked since the last poll; may already be mined
+        self._last_block = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def track(self, tx_hash, timeout=None) -> Future:
+        """Future resolving to the receipt (also for reverted transactions) or raising TimeoutError."""
+        tx_hash = HexBytes(tx_hash)
+        with self._lock:
+            if tx_hash in self._pending:
+                return self._pending[tx_hash][0]
+            future = Future()
+            # Gas is charged to the graph thread/node that tracks the hash first
+            instrumentation.watch_transaction(tx_hash, future)
+            self._pending[tx_hash] = (future, time.monotonic() + (timeout or self.timeout))
+            self._unchecked.add(tx_hash)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="confirmation-tracker", daemon=True)
+                self._thread.start()
+        return future
+
+    def submit(self, call, private_key, tx_params=None):
+        """Sends the call and returns `(tx_hash, future)` without waiting for it to be mined."""
+        tx_hash = send_transaction(call, private_key, tx_params)
+        return tx_hash, self.track(tx_hash)
+
+    def wait_all(self, tx_hashes, timeout=None):
+        """Receipts for `tx_hashes` (same order); raises TimeoutError if one isn't mined in time."""
+        futures = [self.track(tx_hash, timeout) for tx_hash in tx_hashes]
+        wait(futures, timeout=timeout or self.timeout)
+        return [future.result(timeout=0) for future in futures]
+
+    async def wait_async(self, tx_hash, timeout=None):
+        return await asyncio.wrap_future(self.track(tx_hash, timeout))
+
+    async def wait_all_async(self, tx_hashes, timeout=None):
+        return await asyncio.gather(*(self.wait_async(tx_hash, timeout) for tx_hash in tx_hashes))
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    # --- Poller ---
+
+    def _resolve(self, receipts):
+        with self._lock:
+            for tx_hash, receipt in receipts:
+                entry = self._pending.pop(tx_hash, None)
+                self._unchecked.discard(tx_hash)
+                if entry and not entry[0].done():
+                    entry[0].set_result(receipt)
+
+    def _expire(self):
+        now = time.monotonic()
+        with self._lock:
+            expired = [h for h, (_, deadline) in self._pending.items() if deadline < now]
+            for tx_hash in expired:
+                future, _ = self._pending.pop(tx_hash)
+                self._unchecked.discard(tx_hash)
+                future.set_exception(TimeoutError(f"Transaction {tx_hash.hex()} not mined in time"))
+
+    def _mined_hashes(self):
+        """Tracked hashes included in blocks since the last poll."""
+        latest = w3.eth.block_number
+        last, self._last_block = self._last_block, latest
+        if last is None or latest <= last:
+            return []
+        with self._lock:
+            tracked = set(self._pending)
+        if latest - last > MAX_SCAN_BLOCKS:
+            return list(tracked)
+        blocks = _batched(w3.eth.get_block, range(last + 1, latest + 1))
+        return [HexBytes(h) for block in blocks if block for h in block["transactions"] if HexBytes(h) in tracked]
+
+    def poll(self):
+        """One round: checks newly tracked hashes directly and scans new blocks for the rest."""
+        with self._lock:
+            unchecked = list(self._unchecked)
+            self._unchecked.clear()
+        # Newly tracked hashes may have been mined before they were tracked
+        candidates = list(dict.fromkeys(unchecked + self._mined_hashes()))
+        if candidates:
+            receipts = _batched(w3.eth.get_transaction_receipt, candidates)
+            self._resolve([(h, r) for h, r in zip(candidates, receipts) if r is not None])
+        self._expire()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._pending:
+                    # Exit when idle; the next track() starts a new poller
+                    self._thread = None
+                    self._last_block = None
+                    return
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"Confirmation poll failed: {e}")
+            time.sleep(self.poll_interval)
+
+confirmation_tracker = ConfirmationTracker()
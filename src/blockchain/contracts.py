@@ -0,0 +1,163 @@
+"""Contract registry: ABIs from the Foundry artifacts, contract objects built once.
+
+    contracts.abi("PolicyWrapper")                              # X402PolicyWrapper's ABI
+    contracts.contract("SimpleEscrow", clone_address, w3)       # Contract, cached per (name, address)
+    contracts.selector("PolicyWrapper", "settleSplit")          # 4-byte selector
+    contracts.topic("PolicyWrapper", "TransactionAttested")     # topic0
+    contracts.event_topics("SimpleEscrow")                      # {topic0: event name}
+
+Names are the deployed_addresses.json keys (`ARTIFACTS` maps them to the
+artifact in ARTIFACTS_DIR). An artifact is read on first use, with its
+selectors and event topics computed once, and read again when `forge build`
+changes its mtime; contracts built from the old ABI are rebuilt then.
+out/ is only ever written by forge: `python update_abis.py` rebuilds it and
+lists artifacts built from older sources (`contracts.stale_sources(name)`).
+Building a web3 Contract parses the whole ABI (~1.5 ms for the wrapper), so
+callers should go through here rather than `w3.eth.contract(...)`.
+"""
+import json
+import os
+import threading
+from collections import namedtuple
+from src.config import ARTIFACTS_DIR
+
+# deployed_addresses.json key -> Foundry artifact (contract) name
+ARTIFACTS = {
+    "DemoSGD": "DemoSGD",
+    "PolicyWrapper": "X402PolicyWrapper",
+    "SimpleEscrow": "SimpleEscrow",
+    "SimpleEscrowFactory": "SimpleEscrowFactory",
+    "PolicyManager": "SimplePolicyManager",
+    "IdentityRegistry": "DemoIdentityRegistry",
+    "SourceOfFundsPolicy": "SourceOfFundsPolicy",
+    "SanctionsPolicy": "SanctionsPolicy",
+    "Multicall3": "IMulticall3",
+}
+
+class StaleArtifact(Exception):
+    """The artifact is missing, has no bytecode, or bytecode older than its ABI: run `forge build`."""
+
+def dispatches(code, selector):
+    """Whether runtime `code` compares calldata against `selector` (solc pushes it with the
+    shortest PUSHn, e.g. PUSH3 for a selector with a leading zero byte)."""
+    stripped = selector.lstrip(b"\0")
+    return bytes([0x5f + len(stripped)]) + stripped in code
+
+# selectors: {signature: bytes4}, functions: {name: signature} (first overload),
+# topics: {event name: topic0}, events: {topic0: event name}
+Artifact = namedtuple("Artifact", "abi selectors functions topics events mtime")
+
+def _load(path, mtime):
+    from eth_utils import event_abi_to_log_topic, function_abi_to_4byte_selector
+    from eth_utils.abi import abi_to_signature
+    from hexbytes import HexBytes
+    with open(path) as f:
+        abi = json.load(f)["abi"]
+    selectors, functions, topics = {}, {}, {}
+    for item in abi:
+        if item["type"] == "function":
+            signature = abi_to_signature(item)
+            selectors[signature] = function_abi_to_4byte_selector(item)
+            functions.setdefault(item["name"], signature)
+        elif item["type"] == "event":
+            topics[item["name"]] = HexBytes(event_abi_to_log_topic(item))
+    return Artifact(abi, selectors, functions, topics, {topic: name for name, topic in topics.items()}, mtime)
+
+class ContractRegistry:
+    def __init__(self, artifacts_dir=ARTIFACTS_DIR):
+        self.artifacts_dir = artifacts_dir
+        self._artifacts = {}   # name -> Artifact
+        self._contracts = {}   # (name, address, id(client)) -> (artifact mtime, Contract)
+        self._lock = threading.Lock()
+
+    def path(self, name):
+        artifact = ARTIFACTS.get(name, name)
+        return os.path.join(self.artifacts_dir, f"{artifact}.sol", f"{artifact}.json")
+
+    def artifact(self, name):
+        path = self.path(name)
+        mtime = os.stat(path).st_mtime_ns
+        cached = self._artifacts.get(name)
+        if cached is None or cached.mtime != mtime:
+            cached = _load(path, mtime)
+            with self._lock:
+                self._artifacts[name] = cached
+        return cached
+
+    def abi(self, name):
+        return self.artifact(name).abi
+
+    def exists(self, name):
+        return os.path.exists(self.path(name))
+
+    def _build(self, name):
+        try:
+            with open(self.path(name)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise StaleArtifact(f"{self.path(name)} doesn't exist; run `forge build`") from None
+
+    def stale_sources(self, name):
+        """Sources of `name` that changed since forge built it (keccak256 in the artifact's metadata)."""
+        from eth_utils import keccak
+        root = os.path.dirname(os.path.abspath(self.artifacts_dir))
+        stale = []
+        for source, info in ((self._build(name).get("metadata") or {}).get("sources") or {}).items():
+            try:
+                with open(os.path.join(root, source), "rb") as f:
+                    changed = "0x" + keccak(f.read()).hex() != info.get("keccak256")
+            except FileNotFoundError:
+                changed = True
+            if changed:
+                stale.append(source)
+        return stale
+
+    def bytecode(self, name):
+        """Creation bytecode, for deploying `name` (e.g. to an in-process chain).
+
+        Only checks that the build is whole (its bytecode dispatches the ABI);
+        it may still predate the sources, see `stale_sources`.
+        """
+        build = self._build(name)
+        code = (build.get("bytecode") or {}).get("object", "")
+        runtime = bytes.fromhex((build.get("deployedBytecode") or {}).get("object", "").removeprefix("0x"))
+        if not code.removeprefix("0x"):
+            raise StaleArtifact(f"{self.path(name)} has no bytecode; run `forge build`")
+        missing = [signature for signature, selector in self.artifact(name).selectors.items()
+                   if not dispatches(runtime, selector)]
+        if missing:
+            raise StaleArtifact(f"{self.path(name)}: bytecode has no {', '.join(missing)}; run `forge build`")
+        return code
+
+    def contract(self, name, address, client):
+        """`client.eth.contract` for `name` at `address` (None for an address-less template)."""
+        artifact = self.artifact(name)
+        key = (name, address and address.lower(), id(client))
+        cached = self._contracts.get(key)
+        if cached is None or cached[0] != artifact.mtime:
+            cached = (artifact.mtime, client.eth.contract(address=address, abi=artifact.abi))
+            with self._lock:
+                self._contracts[key] = cached
+        return cached[1]
+
+    def selector(self, name, function):
+        """Selector of `function`, a name (first overload) or a full signature."""
+        artifact = self.artifact(name)
+        return artifact.selectors[artifact.functions.get(function, function)]
+
+    def has_function(self, name, function):
+        artifact = self.artifact(name)
+        return function in artifact.functions or function in artifact.selectors
+
+    def topic(self, name, event):
+        return self.artifact(name).topics[event]
+
+    def event_topics(self, name):
+        return dict(self.artifact(name).events)
+
+    def clear(self):
+        with self._lock:
+            self._artifacts.clear()
+            self._contracts.clear()
+
+contracts = ContractRegistry()
@@ -0,0 +1,223 @@
+"""Cached identity registry reads (hasSourceOfFunds / hasSanctionsCheck).
+
+Entries are keyed by (registry, wallet, check, block). Reads pinned to a block
+number never change, so they only leave the cache through LRU eviction. Reads
+at "latest" expire after a TTL and are invalidated on registry writes, either
+explicitly (`invalidate`) or by a `RegistryWatcher` following the registry's
+events. A read that was in flight when its key was invalidated isn't stored.
+"""
+import threading
+import time
+from collections import OrderedDict
+from eth_utils import event_abi_to_log_topic
+from hexbytes import HexBytes
+from src.config import ADDRS, CREDENTIAL_CACHE_SIZE, CREDENTIAL_CACHE_TTL
+from src.blockchain.client import w3, get_contract, aget_contract
+
+SOURCE_OF_FUNDS = "hasSourceOfFunds"
+SANCTIONS_CHECK = "hasSanctionsCheck"
+
+# Registry writes (events, and the calls for registries built before them) and the read they affect
+_EVENTS = {"SourceOfFundsSet": SOURCE_OF_FUNDS, "SanctionsCheckSet": SANCTIONS_CHECK}
+_WRITES = {"setSourceOfFunds": SOURCE_OF_FUNDS, "setSanctionsCheck": SANCTIONS_CHECK}
+
+# Called with (wallet, check, value) for every registry write a RegistryWatcher sees
+registry_listeners = []
+
+class CredentialCache:
+    def __init__(self, maxsize=CREDENTIAL_CACHE_SIZE, ttl=CREDENTIAL_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> (value, expires_at)
+        # Bumped by invalidate(), per (registry,), (registry, wallet) and (registry, wallet, check)
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def _generation(self, key):
+        # Called with the lock held
+        registry, wallet, check, _ = key
+        return tuple(self._generations.get(scope, 0) for scope in ((registry,), (registry, wallet), (registry, wallet, check)))
+
+    def _lookup(self, key):
+        """Returns (hit, value or the key's generation) and updates the counters."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[0]
+            self.misses += 1
+            return False, self._generation(key)
+
+    def _store(self, key, value, generation):
+        expires_at = time.monotonic() + self.ttl if key[3] == "latest" else float("inf")
+        with self._lock:
+            if key[3] == "latest" and self._generation(key) != generation:
+                # Invalidated while the read was in flight: the value may predate the write
+                return
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    @staticmethod
+    def _key(registry, wallet, check, block_identifier):
+        return (registry.address.lower(), wallet.lower(), check, block_identifier)
+
+    def get(self, registry, wallet, check, block_identifier="latest"):
+        """Returns `registry.<check>(wallet)`, calling the chain only on a miss."""
+        key = self._key(registry, wallet, check, block_identifier)
+        hit, value = self._lookup(key)
+        if not hit:
+            generation = value
+            value = getattr(registry.functions, check)(wallet).call(block_identifier=block_identifier)
+            self._store(key, value, generation)
+        return value
+
+    async def aget(self, registry, wallet, check, block_identifier="latest"):
+        """`get` for an AsyncContract registry."""
+        key = self._key(registry, wallet, check, block_identifier)
+        hit, value = self._lookup(key)
+        if not hit:
+            generation = value
+            value = await getattr(registry.functions, check)(wallet).call(block_identifier=block_identifier)
+            self._store(key, value, generation)
+        return value
+
+    def invalidate(self, registry_address, wallet=None, check=None):
+        """Drops "latest" entries for a registry (optionally one wallet / one check)."""
+        registry_address = registry_address.lower()
+        wallet = wallet.lower() if wallet else None
+        scope = (registry_address,) if wallet is None else (registry_address, wallet) if check is None else (registry_address, wallet, check)
+        with self._lock:
+            self._generations[scope] = self._generations.get(scope, 0) + 1
+            for key in list(self._entries):
+                reg, w, c, block = key
+                if reg != registry_address or block != "latest":
+                    continue
+                if (wallet is None or w == wallet) and (check is None or c == check):
+                    del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+class RegistryWatcher(threading.Thread):
+    """Invalidates wallets touched by registry writes, from the registry's logs.
+
+    One eth_getLogs per poll, filtered by the registry's address and its
+    SourceOfFundsSet / SanctionsCheckSet events. A registry built before those
+    events emits nothing; for one of those every new block is fetched and only
+    direct calls to the registry are seen (writes made through another
+    contract are then covered by the cache TTL).
+    """
+
+    def __init__(self, cache, registry, interval=1.0):
+        super().__init__(name="registry-watcher", daemon=True)
+        self.cache = cache
+        self.registry = registry
+        self.interval = interval
+        # topic0 -> event name, for the write events the registry's ABI has
+        self._topics = {HexBytes(event_abi_to_log_topic(abi)): abi["name"]
+                        for abi in registry.abi if abi["type"] == "event" and abi["name"] in _EVENTS}
+        self._stop_event = threading.Event()
+        self._last_block = None
+
+    def _logged_writes(self, from_block, to_block):
+        logs = w3.eth.get_logs({
+            "fromBlock": from_block, "toBlock": to_block, "address": self.registry.address,
+            "topics": [["0x" + topic.hex().removeprefix("0x") for topic in self._topics]],
+        })
+        for log in logs:
+            name = self._topics.get(HexBytes(log["topics"][0]))
+            if name:
+                args = getattr(self.registry.events, name)().process_log(log)["args"]
+                yield args["wallet"], _EVENTS[name], args["ref"]
+
+    def _called_writes(self, from_block, to_block):
+        registry_address = self.registry.address.lower()
+        for number in range(from_block, to_block + 1):
+            block = w3.eth.get_block(number, full_transactions=True)
+            for tx in block["transactions"]:
+                if not tx.get("to") or tx["to"].lower() != registry_address:
+                    continue
+                try:
+                    # eth-tester reports calldata as "data" rather than "input"
+                    fn, args = self.registry.decode_function_input(tx.get("input") or tx.get("data"))
+                except Exception:
+                    continue
+                if fn.fn_name in _WRITES:
+                    yield args["wallet"], _WRITES[fn.fn_name], args["ref"]
+
+    def poll(self):
+        head = w3.eth.block_number
+        if self._last_block is None:
+            self._last_block = head
+            return
+        if head <= self._last_block:
+            return
+        writes = self._logged_writes if self._topics else self._called_writes
+        for wallet, check, ref in writes(self._last_block + 1, head):
+            self.cache.invalidate(self.registry.address, wallet, check)
+            for listener in registry_listeners:
+                listener(wallet, check, ref != bytes(32))
+        self._last_block = head
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"Registry watcher error: {e}")
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+
+credential_cache = CredentialCache()
+_watcher = None
+
+def watch_registry(interval=1.0):
+    """Starts the process-wide registry watcher (no-op if already running)."""
+    global _watcher
+    registry = get_contract("IdentityRegistry")
+    if registry is None or (_watcher and _watcher.is_alive()):
+        return _watcher
+    _watcher = RegistryWatcher(credential_cache, registry, interval)
+    _watcher.start()
+    return _watcher
+
+def has_source_of_funds(wallet, block_identifier="latest"):
+    registry = get_contract("IdentityRegistry")
+    return credential_cache.get(registry, wallet, SOURCE_OF_FUNDS, block_identifier)
+
+def has_sanctions_check(wallet, block_identifier="latest"):
+    registry = get_contract("IdentityRegistry")
+    return credential_cache.get(registry, wallet, SANCTIONS_CHECK, block_identifier)
+
+def get_buyer_credentials(wallet=None):
+    """Credential flags in the `buyer_credentials` shape used by the graph state."""
+    wallet = wallet or ADDRS["Buyer"]
+    return {
+        "has_sanctions": has_sanctions_check(wallet),
+        "has_sof": has_source_of_funds(wallet),
+    }
+
+async def ahas_source_of_funds(wallet, block_identifier="latest"):
+    registry = aget_contract("IdentityRegistry")
+    return await credential_cache.aget(registry, wallet, SOURCE_OF_FUNDS, block_identifier)
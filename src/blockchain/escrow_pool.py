@@ -0,0 +1,130 @@
+"""Warm pool of pre-deployed escrows (SimpleEscrowFactory clones).
+
+Deploying an escrow per transaction would put a contract creation on the
+critical path of `execute_escrow`. The pool keeps up to `target_size`
+unassigned clones instead: `acquire()` hands one out in O(1) and, once fewer
+than `low_water` are left, a background thread tops the pool up with
+`createEscrows(batch)`. The caller opens the escrow with its terms in the
+same pipeline as the funding transaction.
+
+    escrow_address = get_escrow_pool().acquire()
+    calls = [escrow.functions.open(buyer, seller, amount, expires_at), escrow.functions.fundWithAuthorization(...)]
+
+Without a factory in deployed_addresses.json `get_escrow_pool()` returns None
+and the agents use the shared SimpleEscrow. Clones are single-use; ones still
+in the pool when the process exits are simply never handed out.
+"""
+import asyncio
+import threading
+from collections import deque
+from eth_account import Account
+from web3.logs import DISCARD
+from src.config import ADDRS, COMPLIANCE_PK, ESCROW_POOL_SIZE, ESCROW_POOL_BATCH
+from src.blockchain.client import w3
+from src.blockchain.contracts import contracts
+from src.blockchain.confirmations import confirmation_tracker
+
+class EscrowPool:
+    def __init__(self, factory, admin_pk, target_size=ESCROW_POOL_SIZE, batch=ESCROW_POOL_BATCH, low_water=None):
+        self.factory = factory
+        self.admin_pk = admin_pk
+        self.admin = Account.from_key(admin_pk).address
+        self.target_size = target_size
+        self.batch = batch
+        self.low_water = target_size // 2 if low_water is None else low_water
+        self.handed_out = 0
+        self.misses = 0
+        self.created = 0
+        self._free = deque()
+        self._lock = threading.Lock()
+        self._refill_thread = None
+
+    def _create(self, count):
+        """Deploys `count` clones and returns their addresses once mined."""
+        call = self.factory.functions.createEscrows(count, self.admin)
+        _, confirmation = confirmation_tracker.submit(call, self.admin_pk)
+        receipt = confirmation.result()
+        if receipt["status"] != 1:
+            raise RuntimeError("createEscrows reverted")
+        escrows = [event["args"]["escrow"] for event in self.factory.events.EscrowCreated().process_receipt(receipt, errors=DISCARD)]
+        with self._lock:
+            self.created += len(escrows)
+        return escrows
+
+    def _pop(self):
+        with self._lock:
+            self.handed_out += 1
+            if self._free:
+                return self._free.popleft()
+            self.misses += 1
+            return None
+
+    def acquire(self):
+        """An unassigned escrow address; deploys one on the spot only if the pool ran dry."""
+        escrow = self._pop()
+        if escrow is None:
+            escrow = self._create(1)[0]
+        self.refill()
+        return escrow
+
+    async def aacquire(self):
+        escrow = self._pop()
+        if escrow is None:
+            escrow = (await asyncio.to_thread(self._create, 1))[0]
+        self.refill()
+        return escrow
+
+    def refill(self, force=False):
+        """Starts the background top-up if the pool is low (or `force`) and none is running."""
+        with self._lock:
+            if not force and len(self._free) >= self.low_water:
+                return
+            if self._refill_thread is not None and self._refill_thread.is_alive():
+                return
+            self._refill_thread = threading.Thread(target=self._refill, name="escrow-pool-refill", daemon=True)
+            self._refill_thread.start()
+
+    def _refill(self):
+        while True:
+            with self._lock:
+                missing = self.target_size - len(self._free)
+            if missing <= 0:
+                return
+            try:
+                escrows = self._create(min(missing, self.batch))
+            except Exception as e:
+                print(f"Escrow pool refill failed: {e}")
+                return
+            with self._lock:
+                self._free.extend(escrows)
+
+    def wait_refill(self, timeout=None):
+        thread = self._refill_thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def available(self):
+        with self._lock:
+            return len(self._free)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "available": len(self._free),
+                "handed_out": self.handed_out,
+                "misses": self.misses,
+                "created": self.created,
+            }
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_escrow_pool():
+    """Process-wide pool for the deployed factory (None without one); starts filling on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None and ADDRS.get("SimpleEscrowFactory") and w3 and w3.is_connected():
+            factory = contracts.contract("SimpleEscrowFactory", ADDRS["SimpleEscrowFactory"], w3)
+            _pool = EscrowPool(factory, COMPLIANCE_PK)
+            _pool.refill(force=True)
+        return _pool
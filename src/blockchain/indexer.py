@@ -0,0 +1,303 @@
+"""Local index of the Policy Wrapper and escrow events (SQLite).
+
+`EventIndexer` follows X402PolicyWrapper (TransactionAttested,
+TransactionCompleted) and every SimpleEscrow, shared or pooled clone (Opened,
+Funded, Released, Refunded), with eth_getLogs over block ranges and stores one
+row per event. Attestation
+status, escrow state and history are then indexed queries on a local file
+instead of contract calls:
+
+    watch_events()                            # background indexer
+    event_store.attestation(transaction_id)   # {"status", "completed", ...} or None
+    event_store.escrow_state(escrow_address)  # {"funded", "released", "refunded", "balance"}
+    event_store.history(account=buyer)
+
+Receipts the agents already hold are indexed directly (`index_receipts`), so
+a lookup right after a submission doesn't wait for the next poll.
+"""
+import os
+import sqlite3
+import threading
+from eth_utils import event_abi_to_log_topic
+from hexbytes import HexBytes
+from src.config import ADDRS, EVENT_INDEX_PATH, EVENT_INDEX_BLOCK_RANGE
+from src.blockchain.client import w3
+from src.blockchain.contracts import contracts
+from src.blockchain.utils import ATTESTATION_STATUS
+
+# Amounts are uint256, so they are stored as text
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    tx_hash TEXT NOT NULL,
+    log_index INTEGER NOT NULL,
+    block_number INTEGER NOT NULL,
+    contract TEXT NOT NULL,
+    event TEXT NOT NULL,
+    transaction_id TEXT,
+    account TEXT,
+    counterparty TEXT,
+    amount TEXT,
+    status INTEGER,
+    PRIMARY KEY (tx_hash, log_index)
+);
+CREATE INDEX IF NOT EXISTS events_transaction ON events (transaction_id, block_number);
+CREATE INDEX IF NOT EXISTS events_contract ON events (contract, event, block_number);
+CREATE INDEX IF NOT EXISTS events_account ON events (account, block_number);
+CREATE TABLE IF NOT EXISTS cursors (
+    contracts TEXT PRIMARY KEY,
+    block_number INTEGER NOT NULL
+);
+"""
+
+_COLUMNS = ("tx_hash", "log_index", "block_number", "contract", "event",
+            "transaction_id", "account", "counterparty", "amount", "status")
+
+def _hex(value):
+    return HexBytes(value).hex().removeprefix("0x").lower()
+
+def _row(name, log, args):
+    """Event args -> table row (account is the address the event is about)."""
+    row = {
+        "tx_hash": _hex(log["transactionHash"]),
+        "log_index": log["logIndex"],
+        "block_number": log["blockNumber"],
+        "contract": log["address"].lower(),
+        "event": name,
+        "transaction_id": None, "account": None, "counterparty": None, "amount": None, "status": None,
+    }
+    if name == "TransactionAttested":
+        row.update(transaction_id=_hex(args["transactionId"]), status=args["status"])
+    elif name == "TransactionCompleted":
+        row.update(transaction_id=_hex(args["transactionId"]), account=args["from"].lower(),
+                   counterparty=args["to"].lower(), amount=str(args["amount"]))
+    elif name == "Opened":
+        row.update(account=args["buyer"].lower(), counterparty=args["seller"].lower(), amount=str(args["amount"]))
+    elif name == "Funded":
+        row.update(account=args["from"].lower(), amount=str(args["amount"]))
+    else:  # Released / Refunded
+        row.update(account=args["to"].lower(), amount=str(args["amount"]))
+    return row
+
+def _event(row):
+    event = {k: v for k, v in row.items() if v is not None}
+    if "amount" in event:
+        event["amount"] = int(event["amount"])
+    if "status" in event:
+        event["status"] = ATTESTATION_STATUS.get(event["status"], "PENDING")
+    return event
+
+class EventStore:
+    def __init__(self, path):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        # Written by the indexer thread and by the agents' worker threads
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def add(self, rows, cursor=None, block_number=None):
+        """Stores rows (re-indexing the same log is a no-op) and optionally advances a cursor."""
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT OR IGNORE INTO events VALUES ({', '.join('?' * len(_COLUMNS))})",
+                [tuple(row[c] for c in _COLUMNS) for row in rows],
+            )
+            if cursor is not None:
+                self._conn.execute("INSERT OR REPLACE INTO cursors VALUES (?, ?)", (cursor, block_number))
+            self._conn.commit()
+
+    def cursor(self, cursor):
+        """Last block indexed for a set of contracts, or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT block_number FROM cursors WHERE contracts = ?", (cursor,)).fetchone()
+        return row[0] if row else None
+
+    def _select(self, sql, params=()):
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params).fetchall()]
+
+    def attestation(self, transaction_id):
+        """Latest attestation of a transaction id (hex), or None if it was never attested."""
+        rows = self._select(
+            "SELECT * FROM events WHERE transaction_id = ? ORDER BY block_number, log_index",
+            (_hex(transaction_id),),
+        )
+        attested = [row for row in rows if row["event"] == "TransactionAttested"]
+        if not attested:
+            return None
+        latest = attested[-1]
+        return {
+            "transaction_id": latest["transaction_id"],
+            "status": ATTESTATION_STATUS.get(latest["status"], "PENDING"),
+            "completed": any(row["event"] == "TransactionCompleted" for row in rows),
+            "block_number": latest["block_number"],
+            "tx_hash": latest["tx_hash"],
+        }
+
+    def escrow_state(self, escrow_address):
+        """Amounts funded / released / refunded for an escrow, from its events."""
+        totals = {"Funded": 0, "Released": 0, "Refunded": 0}
+        rows = self._select(
+            "SELECT event, amount FROM events WHERE contract = ? AND event IN ('Funded', 'Released', 'Refunded')",
+            (escrow_address.lower(),),
+        )
+        for row in rows:
+            totals[row["event"]] += int(row["amount"])
+        return {
+            "funded": totals["Funded"],
+            "released": totals["Released"],
+            "refunded": totals["Refunded"],
+            "balance": totals["Funded"] - totals["Released"] - totals["Refunded"],
+        }
+
+    def history(self, transaction_id=None, account=None, contract=None, event=None, limit=100):
+        """Indexed events, newest first, filtered by any of the arguments."""
+        clauses, params = [], []
+        if transaction_id is not None:
+            clauses.append("transaction_id = ?"); params.append(_hex(transaction_id))
+        if account is not None:
+            clauses.append("(account = ? OR counterparty = ?)"); params += [account.lower()] * 2
+        if contract is not None:
+            clauses.append("contract = ?"); params.append(contract.lower())
+        if event is not None:
+            clauses.append("event = ?"); params.append(event)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._select(
+            f"SELECT * FROM events {where} ORDER BY block_number DESC, log_index DESC LIMIT ?",
+            (*params, limit),
+        )
+        return [_event(row) for row in rows]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM events")
+            self._conn.execute("DELETE FROM cursors")
+            self._conn.commit()
+
+def _event_topics(contract):
+    return {HexBytes(event_abi_to_log_topic(abi)): abi["name"] for abi in contract.abi if abi["type"] == "event"}
+
+class EventIndexer(threading.Thread):
+    """Follows the given contracts' events into an EventStore with eth_getLogs.
+
+    `templates` are address-less contracts whose events are taken from any
+    address (escrow clones are created all the time). Blocks are treated as
+    final (Anvil doesn't reorg), so the cursor only moves forward.
+    """
+
+    def __init__(self, store, contracts, templates=(), interval=1.0, block_range=EVENT_INDEX_BLOCK_RANGE, start_block=0):
+        super().__init__(name="event-indexer", daemon=True)
+        self.store = store
+        self.contracts = {contract.address.lower(): contract for contract in contracts}
+        self.interval = interval
+        self.block_range = block_range
+        self.start_block = start_block
+        self._stop_event = threading.Event()
+        # topic0 -> event name, per followed address and for templates
+        self._topics = {address: _event_topics(contract) for address, contract in self.contracts.items()}
+        self._templates = {topic: (name, contract) for contract in templates for topic, name in _event_topics(contract).items()}
+        self._cursor = ",".join(sorted(self.contracts) + sorted(f"*{name}" for name, _ in self._templates.values()))
+
+    def _contract_event(self, log):
+        if not log["topics"]:
+            return None, None
+        topic = HexBytes(log["topics"][0])
+        address = log["address"].lower()
+        if topic in self._topics.get(address, {}):
+            return self._topics[address][topic], self.contracts[address]
+        return self._templates.get(topic, (None, None))
+
+    def decode(self, logs):
+        """Rows for the followed contracts' events; other logs are skipped."""
+        rows = []
+        for log in logs:
+            name, contract = self._contract_event(log)
+            if name is None:
+                continue
+            args = getattr(contract.events, name)().process_log(log)["args"]
+            rows.append(_row(name, log, args))
+        return rows
+
+    def index_receipts(self, receipts):
+        """Indexes receipts already at hand; returns their rows per receipt."""
+        rows = [self.decode(receipt["logs"]) for receipt in receipts]
+        self.store.add([row for receipt_rows in rows for row in receipt_rows])
+        return rows
+
+    def _get_logs(self, from_block, to_block):
+        params = {"fromBlock": from_block, "toBlock": to_block}
+        if self._templates:
+            # Any address, filtered by event signature instead
+            topics = [topic for topics in self._topics.values() for topic in topics] + list(self._templates)
+            params["topics"] = [["0x" + topic.hex().removeprefix("0x") for topic in topics]]
+        else:
+            params["address"] = [contract.address for contract in self.contracts.values()]
+        return w3.eth.get_logs(params)
+
+    def poll(self):
+        """Indexes every block since the cursor, `block_range` blocks per request."""
+        head = w3.eth.block_number
+        last = self.store.cursor(self._cursor)
+        if last is not None and last > head:
+            # Chain restarted (Anvil redeploys to the same addresses): start over
+            self.store.clear()
+            last = None
+        start = self.start_block if last is None else last + 1
+        block_range = self.block_range
+        while start <= head:
+            end = min(start + block_range - 1, head)
+            try:
+                logs = self._get_logs(start, end)
+            except Exception:
+                # Too many results (or a node limit): retry with a smaller range
+                if block_range == 1:
+                    raise
+                block_range = max(1, block_range // 2)
+                continue
+            self.store.add(self.decode(logs), self._cursor, end)
+            start = end + 1
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"Event indexer error: {e}")
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+
+event_store = EventStore(EVENT_INDEX_PATH)
+_indexer = None
+_indexer_lock = threading.Lock()
+
+def get_event_indexer(interval=1.0):
+    """Process-wide indexer for the deployed wrapper and escrow (None without addresses)."""
+    global _indexer
+    with _indexer_lock:
+        if _indexer is None or (_indexer.ident is not None and not _indexer.is_alive()):
+            if not (w3 and ADDRS.get("PolicyWrapper")):
+                return None
+            wrapper = contracts.contract("PolicyWrapper", ADDRS["PolicyWrapper"], w3)
+            # Escrow events from the shared SimpleEscrow and from every pooled clone
+            _indexer = EventIndexer(event_store, [wrapper], [contracts.contract("SimpleEscrow", None, w3)], interval)
+        return _indexer
+
+def watch_events(interval=1.0):
+    """Starts the background indexer (no-op if already running)."""
+    indexer = get_event_indexer(interval)
+    with _indexer_lock:
+        if indexer is not None and indexer.ident is None:
+            indexer.start()
+    return indexer
+
+def index_receipts(receipts):
+    """Indexes receipts with the process-wide indexer; rows per receipt ([] without one)."""
+    indexer = get_event_indexer()
+    if indexer is None:
+        return [[] for _ in receipts]
+    return indexer.index_receipts(receipts)
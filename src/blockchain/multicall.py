@@ -0,0 +1,150 @@
+"""Batched contract reads pinned to a single block.
+
+`read_calls` prefers a Multicall3 `aggregate` (one `eth_call`, atomic) and
+falls back to a JSON-RPC batch pinned to an explicit block number. Providers
+that can't batch get sequential calls, still pinned to that block.
+"""
+import asyncio
+from eth_utils.abi import function_abi_to_4byte_selector, get_abi_input_types, get_abi_output_types
+from src.config import ADDRS
+from src.blockchain.client import aw3, w3
+from src.blockchain.contracts import contracts
+
+# Canonical deterministic deployment (present on most public chains and forks)
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+
+_has_code = {}
+
+def _multicall_address():
+    """Returns the Multicall3 address if a contract is deployed there (checked once)."""
+    address = ADDRS.get("Multicall3", MULTICALL3_ADDRESS)
+    if address not in _has_code:
+        try:
+            _has_code[address] = len(w3.eth.get_code(address)) > 0
+        except Exception:
+            _has_code[address] = False
+    return address if _has_code[address] else None
+
+_codecs = {}
+
+def _codec(fn):
+    """(selector, input types, output types) of a bound call, computed once per function ABI.
+
+    Contracts come from the registry, so the same ABI dicts recur; the entry
+    keeps a reference to its dict so the id can't be reused while cached.
+    """
+    entry = _codecs.get(id(fn.abi))
+    if entry is None or entry[0] is not fn.abi:
+        if len(_codecs) > 1024:
+            _codecs.clear()
+        entry = _codecs[id(fn.abi)] = (
+            fn.abi, function_abi_to_4byte_selector(fn.abi), get_abi_input_types(fn.abi), get_abi_output_types(fn.abi)
+        )
+    return entry
+
+def _encode(fn):
+    _, selector, input_types, _ = _codec(fn)
+    return selector + w3.codec.encode(input_types, fn.args)
+
+def _decode(fn, data):
+    values = w3.codec.decode(_codec(fn)[3], bytes(data))
+    return values[0] if len(values) == 1 else values
+
+def _read_multicall(address, calls, block_identifier):
+    multicall = contracts.contract("Multicall3", address, w3)
+    block_number, return_data = multicall.functions.aggregate(
+        [(fn.address, _encode(fn)) for fn in calls]
+    ).call(block_identifier=block_identifier)
+    return block_number, [_decode(fn, data) for fn, data in zip(calls, return_data)]
+
+def _read_batch(calls, block_identifier):
+    # Pin every call to one concrete block so the reads can't straddle blocks
+    if isinstance(block_identifier, int):
+        block_number = block_identifier
+    else:
+        block_number = w3.eth.get_block(block_identifier)["number"]
+    txs = [{"to": fn.address, "data": _encode(fn)} for fn in calls]
+    try:
+        with w3.batch_requests() as batch:
+            for tx in txs:
+                batch.add(w3.eth.call(tx, block_number))
+            return_data = batch.execute()
+    except Exception:
+        # Provider can't batch (e.g. eth-tester): same reads, one at a time
+        return_data = [w3.eth.call(tx, block_number) for tx in txs]
+    return block_number, [_decode(fn, data) for fn, data in zip(calls, return_data)]
+
+def read_calls(calls, block_identifier="latest"):
+    """Executes bound contract calls (e.g. `token.functions.balanceOf(addr)`) as one snapshot.
+
+    Returns `(block_number, [result, ...])` in the order of `calls`.
+    """
+    address = _multicall_address()
+    if address:
+        try:
+            return _read_multicall(address, calls, block_identifier)
+        except Exception as e:
+            print(f"Multicall failed, falling back to batch: {e}")
+    return _read_batch(calls, block_identifier)
+
+def read_balances(token, accounts, block_identifier="latest"):
+    """Token balances of any number of accounts plus total supply, from one block."""
+    calls = [token.functions.balanceOf(account) for account in accounts]
+    calls.append(token.functions.totalSupply())
+    block_number, results = read_calls(calls, block_identifier)
+    return {
+        "block_number": block_number,
+        "balances": dict(zip(accounts, results[:-1])),
+        "total_supply": results[-1],
+    }
+
+# --- Async (AsyncWeb3) ---
+
+async def _amulticall_address():
+    address = ADDRS.get("Multicall3", MULTICALL3_ADDRESS)
+    if address not in _has_code:
+        try:
+            _has_code[address] = len(await aw3.eth.get_code(address)) > 0
+        except Exception:
+            _has_code[address] = False
+    return address if _has_code[address] else None
+
+async def _aread_batch(calls, block_identifier):
+    if isinstance(block_identifier, int):
+        block_number = block_identifier
+    else:
+        block_number = (await aw3.eth.get_block(block_identifier))["number"]
+    txs = [{"to": fn.address, "data": _encode(fn)} for fn in calls]
+    try:
+        async with aw3.batch_requests() as batch:
+            for tx in txs:
+                batch.add(aw3.eth.call(tx, block_number))
+            return_data = await batch.async_execute()
+    except Exception:
+        # No batching: issue the pinned reads concurrently instead
+        return_data = await asyncio.gather(*(aw3.eth.call(tx, block_number) for tx in txs))
+    return block_number, [_decode(fn, data) for fn, data in zip(calls, return_data)]
+
+async def aread_calls(calls, block_identifier="latest"):
+    """Async `read_calls` for AsyncContract functions."""
+    address = await _amulticall_address()
+    if address:
+        try:
+            multicall = contracts.contract("Multicall3", address, aw3)
+            block_number, return_data = await multicall.functions.aggregate(
+                [(fn.address, _encode(fn)) for fn in calls]
+            ).call(block_identifier=block_identifier)
+            return block_number, [_decode(fn, data) for fn, data in zip(calls, return_data)]
+        except Exception as e:
+            print(f"Multicall failed, falling back to batch: {e}")
+    return await _aread_batch(calls, block_identifier)
+
+async def aread_balances(token, accounts, block_identifier="latest"):
+    calls = [token.functions.balanceOf(account) for account in accounts]
+    calls.append(token.functions.totalSupply())
+    block_number, results = await aread_calls(calls, block_identifier)
+    return {
+        "block_number": block_number,
+        "balances": dict(zip(accounts, results[:-1])),
+        "total_supply": results[-1],
+    }
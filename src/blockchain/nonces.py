@@ -0,0 +1,143 @@
+"""Process-wide nonce allocation for signer keys.
+
+Nonces are reserved locally so a signer can send several transactions
+back-to-back without a `get_transaction_count` round trip each, and without
+two sessions sharing a key racing for the same nonce. Every reservation is
+released once its send has finished; after a failed send the manager resyncs
+from the node ("pending" count), but only when no other reservation for that
+key is still outstanding, so a send in flight can't have its nonce handed out
+again. A retry after a nonce error first moves the counter up to the node's
+pending count, in case something else sent with the key.
+"""
+import threading
+from eth_account import Account
+from eth_utils import keccak
+from hexbytes import HexBytes
+from src.blockchain.client import aw3, w3
+
+# Node errors that mean the nonce was wrong or already used: geth/anvil, and
+# eth-tester's "invalid transaction nonce". Reverts that mention a nonce (e.g.
+# "authorization nonce used") aren't among them
+_NONCE_ERRORS = (
+    "nonce too low", "nonce too high", "replacement transaction underpriced", "invalid transaction nonce",
+)
+
+# The node already has this exact signed transaction, e.g. when the provider
+# retried a send whose response was lost: it was sent, don't sign it again
+_ALREADY_KNOWN = ("already known", "known transaction")
+
+def is_nonce_error(error) -> bool:
+    message = str(error).lower()
+    return any(fragment in message for fragment in _NONCE_ERRORS)
+
+def is_already_known(error) -> bool:
+    message = str(error).lower()
+    return any(fragment in message for fragment in _ALREADY_KNOWN)
+
+class NonceManager:
+    def __init__(self):
+        self._next = {}
+        self._outstanding = {}  # address -> nonces reserved and not yet released
+        self._stale = set()  # addresses to resync once nothing is outstanding
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def _lock_for(self, address):
+        with self._guard:
+            return self._locks.setdefault(address, threading.Lock())
+
+    def reserve(self, address, count=1) -> int:
+        """Reserves `count` consecutive nonces and returns the first one.
+
+        Pair with `release(address, count)` once the transactions were sent.
+        """
+        with self._lock_for(address):
+            if address not in self._next:
+                self._next[address] = w3.eth.get_transaction_count(address, "pending")
+            nonce = self._next[address]
+            self._next[address] = nonce + count
+            self._outstanding[address] = self._outstanding.get(address, 0) + count
+            return nonce
+
+    async def areserve(self, address, count=1) -> int:
+        """`reserve` that seeds the counter through AsyncWeb3."""
+        if address not in self._next:
+            pending = await aw3.eth.get_transaction_count(address, "pending")
+            with self._lock_for(address):
+                self._next.setdefault(address, pending)
+        return self.reserve(address, count)
+
+    def release(self, address, count=1, failed=False):
+        """Ends `count` reservations. `failed` means a nonce may not have been consumed."""
+        with self._lock_for(address):
+            self._outstanding[address] = max(self._outstanding.get(address, 0) - count, 0)
+            if failed:
+                self._stale.add(address)
+            if address in self._stale and not self._outstanding[address]:
+                # Nothing else is in flight: the next reservation re-reads the node
+                self._stale.discard(address)
+                self._next.pop(address, None)
+
+    def advance(self, address, pending):
+        """Moves the counter up to the node's pending count, e.g. after another
+        process used the key. Reserved nonces are all below the counter, so
+        none is handed out twice, even with sends still in flight."""
+        with self._lock_for(address):
+            if address in self._next:
+                self._next[address] = max(self._next[address], pending)
+
+    def outstanding(self, address) -> int:
+        with self._lock_for(address):
+            return self._outstanding.get(address, 0)
+
+nonce_manager = NonceManager()
+
+def send_transaction(call, private_key, tx_params=None, retries=1):
+    """Builds, signs and sends a contract call using a locally reserved nonce.
+
+    Returns the transaction hash without waiting for the receipt. The
+    transaction is built (and gas estimated) before the nonce is reserved, so
+    a call that would revert never leaves a gap in the sequence.
+    """
+    account = Account.from_key(private_key)
+    tx_data = call.build_transaction({"from": account.address, **(tx_params or {})})
+
+    for attempt in range(retries + 1):
+        tx_data["nonce"] = nonce_manager.reserve(account.address)
+        try:
+            signed_tx = account.sign_transaction(tx_data)
+            tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+        except Exception as e:
+            if is_already_known(e):
+                nonce_manager.release(account.address)
+                return HexBytes(keccak(signed_tx.raw_transaction))
+            # The nonce may not have been consumed; start again from the node's view
+            nonce_manager.release(account.address, failed=True)
+            if attempt == retries or not is_nonce_error(e):
+                raise
+            nonce_manager.advance(account.address, w3.eth.get_transaction_count(account.address, "pending"))
+        else:
+            nonce_manager.release(account.address)
+            return tx_hash
+
+async def asend_transaction(call, private_key, tx_params=None, retries=1):
+    """`send_transaction` for an AsyncContract call."""
+    account = Account.from_key(private_key)
+    tx_data = await call.build_transaction({"from": account.address, **(tx_params or {})})
+
+    for attempt in range(retries + 1):
+        tx_data["nonce"] = await nonce_manager.areserve(account.address)
+        try:
+            signed_tx = account.sign_transaction(tx_data)
+            tx_hash = await aw3.eth.send_raw_transaction(signed_tx.raw_transaction)
+        except Exception as e:
+            if is_already_known(e):
+                nonce_manager.release(account.address)
+                return HexBytes(keccak(signed_tx.raw_transaction))
+            nonce_manager.release(account.address, failed=True)
+            if attempt == retries or not is_nonce_error(e):
+                raise
+            nonce_manager.advance(account.address, await aw3.eth.get_transaction_count(account.address, "pending"))
+        else:
+            nonce_manager.release(account.address)
+            return tx_hash
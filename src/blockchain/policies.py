@@ -0,0 +1,59 @@
+"""Policy dry runs: SimplePolicyManager.runPolicies over eth_call.
+
+`runPolicies` is a view, so a payment's policy outcome is known before
+anything is broadcast. A payment that FAILs would only revert on-chain
+("Policy Check Failed") after spending gas and a nonce. Calls built with gas
+estimation already get this from `eth_estimateGas`; the fixed-gas paths
+(batch settlement, pooled escrows) check here first:
+
+    dry_run([(buyer, seller, 150 * 10**6), ...])   # [("PASS", {0: "PASS", 1: "PASS"}), ...]
+    would_fail(buyer, seller, 300 * 10**6)        # True if the upfront tranche can't pass
+
+Any number of payments is one snapshot read (Multicall3 when deployed).
+"""
+from src.config import ADDRS
+from src.blockchain.client import get_contract
+from src.blockchain.multicall import read_calls
+from src.blockchain.utils import ATTESTATION_STATUS
+
+def decode_results(results):
+    """runPolicies bitmap -> {policy index: status} for the policies that were evaluated.
+
+    Managers built before the bitmap return every policy's
+    (policyId, status, reason) instead; those are decoded by position.
+    """
+    if not isinstance(results, int):
+        return {index: ATTESTATION_STATUS.get(result[1], "PENDING") for index, result in enumerate(results)}
+    decoded = {}
+    index = 0
+    while results:
+        bits = results & 3
+        if bits:
+            decoded[index] = ATTESTATION_STATUS.get(bits - 1, "PENDING")
+        results >>= 2
+        index += 1
+    return decoded
+
+def dry_run(payments, block_identifier="latest"):
+    """(status, {policy index: status}) per (from, to, amount) payment, amounts in token units.
+
+    Returns None if the manager can't be called; callers then just send.
+    """
+    manager = get_contract("PolicyManager")
+    if manager is None or not payments:
+        return None
+    calls = [
+        manager.functions.runPolicies((ADDRS["DemoSGD"], sender, to, amount, b""))
+        for sender, to, amount in payments
+    ]
+    try:
+        _, outcomes = read_calls(calls, block_identifier)
+    except Exception as e:
+        print(f"Policy dry run failed: {e}")
+        return None
+    return [(ATTESTATION_STATUS.get(status, "PENDING"), decode_results(results)) for status, results in outcomes]
+
+def would_fail(sender, to, amount):
+    """Whether one payment would FAIL the policies (False if it can't be checked)."""
+    outcomes = dry_run([(sender, to, amount)])
+    return bool(outcomes) and outcomes[0][0] == "FAIL"
@@ -0,0 +1,235 @@
+"""Web3 providers with keep-alive pools, cached health, retries and failover.
+
+`FailoverHTTPProvider` (and `AsyncFailoverHTTPProvider` for `aw3`) send each
+JSON-RPC request to the first healthy endpoint in RPC_URLS:
+
+- Each endpoint has its own `requests.Session` with up to RPC_POOL_SIZE
+  keep-alive connections, so concurrent sessions don't reconnect per call.
+- `is_connected()` answers from the cached endpoint health instead of a
+  `web3_clientVersion` round trip. Health is updated by every request and by
+  `HealthMonitor`, which probes idle and failed endpoints every
+  RPC_HEALTH_INTERVAL seconds.
+- `eth_chainId` and `net_version` are answered from web3's request cache
+  after the first call (every endpoint must serve the same chain); signing
+  and gas filling otherwise ask for the chain id on every transaction.
+- Connection errors, timeouts and HTTP errors mark the endpoint down and move
+  on to the next one. Idempotent methods (web3's retry allowlist, which
+  includes eth_sendRawTransaction) go round the endpoints up to RPC_RETRIES
+  times with exponential backoff; anything else fails on the first error.
+
+Every request is counted in `src.metrics.rpc_calls` and timed in the
+`payment_rpc_seconds` histogram (health probes aren't).
+"""
+import asyncio
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from web3 import AsyncWeb3, Web3
+from web3._utils.caching import handle_request_caching, async_handle_request_caching
+from web3.providers import JSONBaseProvider
+from web3.providers.async_base import AsyncJSONBaseProvider
+from web3.providers.rpc.utils import check_if_retry_on_failure
+from src.config import (RPC_URLS, RPC_POOL_SIZE, RPC_TIMEOUT, RPC_RETRIES, RPC_RETRY_BACKOFF,
+                        RPC_HEALTH_INTERVAL)
+from src.metrics import instrumentation
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+# Constant for a chain: served from web3's request cache after the first call
+CACHED_METHODS = {"eth_chainId", "net_version"}
+
+# Failures that say nothing about the request itself
+RETRY_ERRORS = (ConnectionError, TimeoutError, requests.ConnectionError, requests.Timeout, requests.HTTPError)
+if aiohttp:
+    RETRY_ERRORS += (aiohttp.ClientConnectionError, aiohttp.ClientResponseError)
+
+class EndpointHealth:
+    """Last known state of one RPC URL, shared by the sync and async providers."""
+
+    def __init__(self, url):
+        self.url = url
+        self.healthy = None   # None until the first request or probe
+        self.checked_at = 0.0
+        self.failures = 0
+
+    def mark(self, ok):
+        self.healthy = ok
+        self.checked_at = time.monotonic()
+        self.failures = 0 if ok else self.failures + 1
+
+_health = {}
+_health_lock = threading.Lock()
+
+def endpoint_health(url):
+    with _health_lock:
+        return _health.setdefault(url, EndpointHealth(url))
+
+def _session(pool_size):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def _order(endpoints):
+    # Healthy (or not yet known) endpoints first, in configured order; the
+    # failed ones last, so a recovered node is still found before the probe runs
+    return sorted(endpoints, key=lambda endpoint: endpoint[0].healthy is False)
+
+def _probe_ok(response):
+    return isinstance(response, dict) and "result" in response
+
+class FailoverHTTPProvider(JSONBaseProvider):
+    def __init__(self, urls=RPC_URLS, pool_size=RPC_POOL_SIZE, timeout=RPC_TIMEOUT, retries=RPC_RETRIES,
+                 backoff=RPC_RETRY_BACKOFF, health_interval=RPC_HEALTH_INTERVAL, providers=None, **kwargs):
+        """`providers` replaces the HTTP providers, one per url (e.g. an in-process test chain)."""
+        kwargs.setdefault("cache_allowed_requests", True)
+        kwargs.setdefault("cacheable_requests", CACHED_METHODS)
+        # No block-age validation needed for these (it costs an extra eth_chainId)
+        kwargs.setdefault("request_cache_validation_threshold", None)
+        super().__init__(**kwargs)
+        if providers is None:
+            providers = [Web3.HTTPProvider(url, request_kwargs={"timeout": timeout}, session=_session(pool_size),
+                                           exception_retry_configuration=None)
+                         for url in urls]
+        self.endpoints = [(endpoint_health(url), provider) for url, provider in zip(urls, providers)]
+        self.retries = max(1, retries)
+        self.backoff = backoff
+        self.health_interval = health_interval
+        self._monitor = None
+        self._monitor_lock = threading.Lock()
+
+    def __str__(self):
+        return f"RPC failover over {', '.join(health.url for health, _ in self.endpoints)}"
+
+    def _send(self, method, call):
+        attempts = self.retries if check_if_retry_on_failure(method) else 1
+        error = None
+        for attempt in range(attempts):
+            for health, provider in _order(self.endpoints):
+                try:
+                    response = call(provider)
+                except RETRY_ERRORS as e:
+                    health.mark(False)
+                    if attempts == 1:
+                        raise
+                    error = e
+                    continue
+                health.mark(True)
+                return response
+            if attempt < attempts - 1:
+                time.sleep(self.backoff * 2 ** attempt)
+        raise error
+
+    @handle_request_caching
+    def make_request(self, method, params):
+        with instrumentation.rpc(method):
+            return self._send(method, lambda provider: provider.make_request(method, params))
+
+    def make_batch_request(self, batch_requests):
+        with instrumentation.rpc("batch"):
+            # Batches here are reads and signed transactions (multicall, confirmations, batch), safe to resend
+            return self._send("eth_call", lambda provider: provider.make_batch_request(batch_requests))
+
+    def check_health(self, max_age=0.0):
+        """Probes endpoints not heard from for `max_age` seconds; True if any is up."""
+        now = time.monotonic()
+        for health, provider in self.endpoints:
+            if not health.healthy or now - health.checked_at >= max_age:
+                try:
+                    health.mark(_probe_ok(provider.make_request("web3_clientVersion", [])))
+                except Exception:
+                    health.mark(False)
+        return self.healthy
+
+    @property
+    def healthy(self):
+        return any(health.healthy for health, _ in self.endpoints)
+
+    def is_connected(self, show_traceback=False):
+        # The first call probes, then starts the background monitor
+        with self._monitor_lock:
+            if self._monitor is None:
+                self.check_health()
+                self._monitor = HealthMonitor(self, self.health_interval)
+                self._monitor.start()
+        return self.healthy
+
+class AsyncFailoverHTTPProvider(AsyncJSONBaseProvider):
+    """Async counterpart; shares endpoint health with the sync provider's monitor."""
+
+    def __init__(self, urls=RPC_URLS, timeout=RPC_TIMEOUT, retries=RPC_RETRIES, backoff=RPC_RETRY_BACKOFF,
+                 sync_provider=None, providers=None, **kwargs):
+        kwargs.setdefault("cache_allowed_requests", True)
+        kwargs.setdefault("cacheable_requests", CACHED_METHODS)
+        # No block-age validation needed for these (it costs an extra eth_chainId)
+        kwargs.setdefault("request_cache_validation_threshold", None)
+        super().__init__(**kwargs)
+        if providers is None:
+            # aiohttp keeps connections alive per event loop (100 per session by default)
+            request_kwargs = {"timeout": aiohttp.ClientTimeout(total=timeout)} if aiohttp else {}
+            providers = [AsyncWeb3.AsyncHTTPProvider(url, request_kwargs=request_kwargs,
+                                                     exception_retry_configuration=None)
+                         for url in urls]
+        self.endpoints = [(endpoint_health(url), provider) for url, provider in zip(urls, providers)]
+        self.retries = max(1, retries)
+        self.backoff = backoff
+        self.sync_provider = sync_provider
+
+    async def _send(self, method, call):
+        attempts = self.retries if check_if_retry_on_failure(method) else 1
+        error = None
+        for attempt in range(attempts):
+            for health, provider in _order(self.endpoints):
+                try:
+                    response = await call(provider)
+                except RETRY_ERRORS as e:
+                    health.mark(False)
+                    if attempts == 1:
+                        raise
+                    error = e
+                    continue
+                health.mark(True)
+                return response
+            if attempt < attempts - 1:
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+        raise error
+
+    @async_handle_request_caching
+    async def make_request(self, method, params):
+        with instrumentation.rpc(method):
+            return await self._send(method, lambda provider: provider.make_request(method, params))
+
+    async def make_batch_request(self, batch_requests):
+        with instrumentation.rpc("batch"):
+            return await self._send("eth_call", lambda provider: provider.make_batch_request(batch_requests))
+
+    async def is_connected(self, show_traceback=False):
+        if self.sync_provider is not None:
+            return self.sync_provider.is_connected()
+        if not any(health.healthy for health, _ in self.endpoints):
+            try:
+                await self._send("web3_clientVersion", lambda provider: provider.make_request("web3_clientVersion", []))
+            except Exception:
+                return False
+        return any(health.healthy for health, _ in self.endpoints)
+
+class HealthMonitor(threading.Thread):
+    """Re-probes endpoints that failed or haven't served a request for `interval` seconds."""
+
+    def __init__(self, provider, interval=RPC_HEALTH_INTERVAL):
+        super().__init__(name="rpc-health", daemon=True)
+        self.provider = provider
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.provider.check_health(max_age=self.interval)
+
+    def stop(self):
+        self._stop_event.set()
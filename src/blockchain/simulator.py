@@ -0,0 +1,212 @@
+"""In-process mirror of the demo policies (IPolicySimple), for pre-flight checks.
+
+`PolicySimulator` evaluates SanctionsPolicy and SourceOfFundsPolicy the way
+SimplePolicyManager.runPolicies does (cheapest first, stop at the first
+FAIL, 2-bit result bitmap) against a `RegistrySnapshot`: the Source of Funds
+threshold and the wallets' credential flags, synced from chain once and then
+updated from the registry writes the RegistryWatcher sees. Evaluating makes
+no RPC calls, and `evaluate_many` runs over NumPy arrays of amounts and
+credential flags for bulk what-if analysis:
+
+    simulator = get_policy_simulator()
+    simulator.preflight(buyer, seller, 1500 * 10**6)                  # "PENDING"
+    statuses, results = simulator.evaluate_many(senders, amounts)     # uint8 statuses, uint64 bitmaps
+
+The chain stays authoritative; this is for routing and estimates, the
+attestation still comes from the wrapper.
+"""
+import threading
+import time
+from collections import namedtuple
+import numpy as np
+from eth_utils import keccak
+from web3 import Web3
+from src.config import ADDRS, CREDENTIAL_CACHE_TTL
+from src.blockchain.client import get_contract, is_connected
+from src.blockchain.credentials import SANCTIONS_CHECK, SOURCE_OF_FUNDS, registry_listeners
+from src.blockchain.multicall import read_calls
+from src.blockchain.utils import ATTESTATION_STATUS
+
+# IPolicySimple.Status
+PASS, FAIL, PENDING = 0, 1, 2
+
+TxContext = namedtuple("TxContext", "token sender to amount extra_data", defaults=(b"",))
+PolicyResult = namedtuple("PolicyResult", "policy_id status reason")
+
+def _bytes32(text):
+    return text.encode().ljust(32, b"\0")
+
+class RegistrySnapshot:
+    """DemoIdentityRegistry flags as arrays, one row per wallet.
+
+    Wallets never loaded read as unregistered, which is what the registry
+    returns for a wallet nobody wrote to.
+    """
+
+    def __init__(self):
+        self._rows = {}
+        self.sanctions = np.zeros(0, dtype=bool)
+        self.source_of_funds = np.zeros(0, dtype=bool)
+        self.block_number = None
+        self._lock = threading.Lock()
+
+    def _ensure_rows(self, keys):
+        # Called with the lock held; appends unregistered rows for new wallets
+        new = [key for key in dict.fromkeys(keys) if key not in self._rows]
+        if new:
+            for key in new:
+                self._rows[key] = len(self._rows)
+            self.sanctions = np.concatenate([self.sanctions, np.zeros(len(new), dtype=bool)])
+            self.source_of_funds = np.concatenate([self.source_of_funds, np.zeros(len(new), dtype=bool)])
+        return np.fromiter((self._rows[key] for key in keys), dtype=np.int64, count=len(keys))
+
+    def rows(self, wallets):
+        """Row index per wallet (new wallets get an unregistered row)."""
+        with self._lock:
+            return self._ensure_rows([wallet.lower() for wallet in wallets])
+
+    def wallets(self):
+        with self._lock:
+            return [Web3.to_checksum_address(key) for key in self._rows]
+
+    def set(self, wallet, check, value):
+        with self._lock:
+            row = self._ensure_rows([wallet.lower()])[0]
+            flags = self.sanctions if check == SANCTIONS_CHECK else self.source_of_funds
+            flags[row] = bool(value)
+
+    def has_sanctions_check(self, wallet):
+        row = self.rows([wallet])[0]
+        return bool(self.sanctions[row])
+
+    def has_source_of_funds(self, wallet):
+        row = self.rows([wallet])[0]
+        return bool(self.source_of_funds[row])
+
+class SanctionsPolicy:
+    policy_id = keccak(text="SANCTIONS_POLICY")
+    REASON_NOT_VERIFIED = _bytes32("SANCTIONS_NOT_VERIFIED")
+
+    def evaluate(self, ctx, registry):
+        if registry.has_sanctions_check(ctx.sender):
+            return PolicyResult(self.policy_id, PASS, bytes(32))
+        return PolicyResult(self.policy_id, FAIL, self.REASON_NOT_VERIFIED)
+
+    def evaluate_many(self, senders, amounts, registry):
+        """Status per payment; `senders` are registry rows."""
+        return np.where(registry.sanctions[senders], PASS, FAIL).astype(np.uint8)
+
+class SourceOfFundsPolicy:
+    policy_id = keccak(text="SOURCE_OF_FUNDS_POLICY")
+    REASON_MISSING = _bytes32("MISSING_SOURCE_OF_FUNDS")
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+
+    def evaluate(self, ctx, registry):
+        if ctx.amount <= self.threshold or registry.has_source_of_funds(ctx.sender):
+            return PolicyResult(self.policy_id, PASS, bytes(32))
+        return PolicyResult(self.policy_id, PENDING, self.REASON_MISSING)
+
+    def evaluate_many(self, senders, amounts, registry):
+        passed = (amounts <= self.threshold) | registry.source_of_funds[senders]
+        return np.where(passed, PASS, PENDING).astype(np.uint8)
+
+class PolicySimulator:
+    def __init__(self, policies, registry=None):
+        """`policies` are (policy, cost) pairs in the manager's addPolicy order."""
+        self.policies = [policy for policy, _ in policies]
+        # Stable sort by cost, as SimplePolicyManager.addPolicy inserts them
+        self.order = sorted(range(len(policies)), key=lambda i: policies[i][1])
+        self.registry = registry or RegistrySnapshot()
+        self.synced_at = None
+
+    def evaluate(self, ctx):
+        """runPolicies for one TxContext: (status, results of the evaluated policies in manager order)."""
+        results = {}
+        pending = False
+        for index in self.order:
+            result = self.policies[index].evaluate(ctx, self.registry)
+            results[index] = result
+            if result.status == FAIL:
+                return FAIL, [results[i] for i in sorted(results)]
+            pending = pending or result.status == PENDING
+        return (PENDING if pending else PASS), [results[i] for i in sorted(results)]
+
+    def evaluate_many(self, senders, amounts):
+        """Statuses (uint8) and runPolicies bitmaps (uint64) for many payments.
+
+        `senders` are wallet addresses or registry rows, `amounts` token units.
+        Every policy is computed for every payment; the masks only reproduce
+        the short-circuit in the bitmap.
+        """
+        senders = np.asarray(senders)
+        if senders.dtype.kind not in "iu":
+            senders = self.registry.rows(senders)
+        amounts = np.asarray(amounts, dtype=np.uint64)
+        alive = np.ones(len(amounts), dtype=bool)  # no FAIL yet
+        pending = np.zeros(len(amounts), dtype=bool)
+        results = np.zeros(len(amounts), dtype=np.uint64)
+        for index in self.order:
+            status = self.policies[index].evaluate_many(senders, amounts, self.registry)
+            results |= np.where(alive, status.astype(np.uint64) + 1, 0).astype(np.uint64) << np.uint64(2 * index)
+            pending |= alive & (status == PENDING)
+            alive &= status != FAIL
+        statuses = np.where(alive, np.where(pending, PENDING, PASS), FAIL).astype(np.uint8)
+        return statuses, results
+
+    def preflight(self, sender, to, amount):
+        """Status name a payment would get from the policies."""
+        status, _ = self.evaluate(TxContext(ADDRS.get("DemoSGD"), sender, to, amount))
+        return ATTESTATION_STATUS[status]
+
+    def sync(self, wallets=()):
+        """Reloads the SoF threshold and `wallets`' credentials from chain, from one block."""
+        registry = get_contract("IdentityRegistry")
+        sof_policy = get_contract("SourceOfFundsPolicy")
+        wallets = list(dict.fromkeys(Web3.to_checksum_address(wallet) for wallet in wallets))
+        calls = [sof_policy.functions.threshold()]
+        for wallet in wallets:
+            calls += [registry.functions.hasSanctionsCheck(wallet), registry.functions.hasSourceOfFunds(wallet)]
+        block_number, values = read_calls(calls)
+
+        for policy in self.policies:
+            if isinstance(policy, SourceOfFundsPolicy):
+                policy.threshold = values[0]
+        for i, wallet in enumerate(wallets):
+            self.registry.set(wallet, SANCTIONS_CHECK, values[1 + 2 * i])
+            self.registry.set(wallet, SOURCE_OF_FUNDS, values[2 + 2 * i])
+        self.registry.block_number = block_number
+        self.synced_at = time.monotonic()
+
+    def on_registry_write(self, wallet, check, value):
+        self.registry.set(wallet, check, value)
+
+def demo_policies(threshold=0):
+    """The demo suite's policies, as DeployDemoSuite registers them."""
+    return [(SourceOfFundsPolicy(threshold), 2), (SanctionsPolicy(), 1)]
+
+_simulator = None
+_simulator_lock = threading.Lock()
+
+def get_policy_simulator(max_age=CREDENTIAL_CACHE_TTL):
+    """Process-wide simulator for the demo suite (None without a chain).
+
+    Registry writes seen by the RegistryWatcher are applied as they come; the
+    whole snapshot is re-synced after `max_age` seconds for writes it can't see.
+    """
+    global _simulator
+    with _simulator_lock:
+        if _simulator is None:
+            if not (ADDRS.get("SourceOfFundsPolicy") and is_connected()):
+                return None
+            _simulator = PolicySimulator(demo_policies())
+            registry_listeners.append(_simulator.on_registry_write)
+        if _simulator.synced_at is None or time.monotonic() - _simulator.synced_at > max_age:
+            try:
+                demo_wallets = [ADDRS[name] for name in ("Buyer", "Seller") if name in ADDRS]
+                _simulator.sync(demo_wallets + _simulator.registry.wallets())
+            except Exception as e:
+                print(f"Policy simulator sync failed: {e}")
+                return None
+        return _simulator
@@ -1,9 +1,116 @@
-import time
+import atexit
+import multiprocessing
+import os
 import uuid
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from eth_abi import encode
 from eth_account import Account
-from eth_account.messages import encode_typed_data
+from eth_utils import keccak
 from src.config import CHAIN_ID
 from src.blockchain.client import w3
+from src.blockchain.contracts import contracts, dispatches
+
+EIP712_DOMAIN_TYPEHASH = keccak(text="EIP712Domain(string name,string version,uint256 chainId,address verifyingContract)")
+# Matches DemoSGD.TRANSFER_WITH_AUTHORIZATION_TYPEHASH
+TRANSFER_WITH_AUTHORIZATION_TYPEHASH = keccak(
+    text="TransferWithAuthorization(address from,address to,uint256 value,uint256 validAfter,uint256 validBefore,bytes32 nonce)"
+)
+
+# Below this many signatures a process pool costs more than it saves
+POOL_MIN_BATCH = 64
+
+class TransferAuthorizationSigner:
+    """EIP-3009 TransferWithAuthorization signer for one (token, key) pair.
+
+    The account and the EIP-712 domain separator are derived once; each
+    signature is then one struct hash plus one ECDSA sign over the digest.
+    """
+
+    def __init__(self, token_address, owner_pk, chain_id=None, token_name="Demo Singapore Dollar", version="1"):
+        self.token_address = token_address
+        self.owner_pk = owner_pk
+        self.chain_id = CHAIN_ID if chain_id is None else chain_id
+        self.account = Account.from_key(owner_pk)
+        self.owner = self.account.address
+        self.domain_separator = keccak(encode(
+            ["bytes32", "bytes32", "bytes32", "uint256", "address"],
+            [EIP712_DOMAIN_TYPEHASH, keccak(text=token_name), keccak(text=version), self.chain_id, token_address]
+        ))
+        self._pool = None
+        self._workers = 0
+
+    def digest(self, to, value, valid_after, valid_before, nonce):
+        struct_hash = keccak(encode(
+            ["bytes32", "address", "address", "uint256", "uint256", "uint256", "bytes32"],
+            [TRANSFER_WITH_AUTHORIZATION_TYPEHASH, self.owner, to, value, valid_after, valid_before, nonce]
+        ))
+        return keccak(b"\x19\x01" + self.domain_separator + struct_hash)
+
+    def sign(self, to, value, valid_after=0, valid_before=2**256 - 1, nonce=None):
+        if nonce is None:
+            nonce = keccak(text=str(uuid.uuid4()))
+        signed = self.account.unsafe_sign_hash(self.digest(to, value, valid_after, valid_before, nonce))
+        return {
+            "v": signed.v,
+            "r": signed.r.to_bytes(32, 'big'),
+            "s": signed.s.to_bytes(32, 'big'),
+            "from": self.owner,
+            "to": to,
+            "value": value,
+            "validAfter": valid_after,
+            "validBefore": valid_before,
+            "nonce": nonce
+        }
+
+    def sign_many(self, requests, processes=None):
+        """Signs a list of `sign()` keyword dicts, spread across a process pool.
+
+        Nonces are generated up front so results don't depend on which worker
+        signed them. Small batches are signed in-process. The pool is kept
+        between calls and rebuilt when `processes` asks for a different size
+        (None keeps the current pool, or uses one worker per CPU).
+        """
+        requests = [dict(r, nonce=r.get("nonce") or keccak(text=str(uuid.uuid4()))) for r in requests]
+        if processes == 1 or len(requests) < POOL_MIN_BATCH:
+            return [self.sign(**r) for r in requests]
+        if self._pool is not None and processes is not None and processes != self._workers:
+            self.close()
+        if self._pool is None:
+            self._workers = processes or os.cpu_count() or 1
+            # Workers start clean instead of forking a process that has RPC and event-loop threads
+            start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            self._pool = ProcessPoolExecutor(
+                max_workers=self._workers,
+                mp_context=multiprocessing.get_context(start_method),
+                initializer=_init_signer_worker,
+                initargs=(self.token_address, self.owner_pk, self.chain_id),
+            )
+            # get_transfer_signer's signers live until exit; don't leave their workers behind
+            atexit.register(self.close)
+        chunk_size = max(1, len(requests) // (self._workers * 4))
+        return list(self._pool.map(_sign_in_worker, requests, chunksize=chunk_size))
+
+    def close(self):
+        if self._pool is not None:
+            atexit.unregister(self.close)
+            self._pool.shutdown()
+            self._pool = None
+            self._workers = 0
+
+_worker_signer = None
+
+def _init_signer_worker(token_address, owner_pk, chain_id):
+    global _worker_signer
+    _worker_signer = TransferAuthorizationSigner(token_address, owner_pk, chain_id)
+
+def _sign_in_worker(request):
+    return _worker_signer.sign(**request)
+
+@lru_cache(maxsize=64)
+def get_transfer_signer(token_address, owner_pk, chain_id=None):
+    """Process-wide signer per (token, key, chain)."""
+    return TransferAuthorizationSigner(token_address, owner_pk, chain_id)
 
 def sign_transfer_authorization(
     token_address, 
@@ -17,51 +124,21 @@ def sign_transfer_authorization(
     """Signs EIP-3009 TransferWithAuthorization."""
     if not w3: return None
     
-    owner_account = Account.from_key(owner_pk)
-    owner = owner_account.address
-    
-    if nonce is None:
-        nonce = w3.keccak(text=str(uuid.uuid4()))
-
-    # EIP-712 Domain
-    domain = {
-        "name": "Demo Singapore Dollar",
-        "version": "1",
-        "chainId": CHAIN_ID,
-        "verifyingContract": token_address
-    }
-    
-    # EIP-3009 Types
-    types = {
-        "TransferWithAuthorization": [
-            {"name": "from", "type": "address"},
-            {"name": "to", "type": "address"},
-            {"name": "value", "type": "uint256"},
-            {"name": "validAfter", "type": "uint256"},
-            {"name": "validBefore", "type": "uint256"},
-            {"name": "nonce", "type": "bytes32"}
-        ]
-    }
-    
-    message = {
-        "from": owner,
-        "to": to,
-        "value": value,
-        "validAfter": valid_after,
-        "validBefore": valid_before,
-        "nonce": nonce
-    }
-    
-    signed = owner_account.sign_typed_data(domain, types, message)
-    
-    return {
-        "v": signed.v,
-        "r": signed.r.to_bytes(32, 'big'),
-        "s": signed.s.to_bytes(32, 'big'),
-        "from": owner,
-        "to": to,
-        "value": value,
-        "validAfter": valid_after,
-        "validBefore": valid_before,
-        "nonce": nonce
-    }
+    return get_transfer_signer(token_address, owner_pk, CHAIN_ID).sign(to, value, valid_after, valid_before, nonce)
+
+# IPolicySimple.Status
+ATTESTATION_STATUS = {0: "PASS", 1: "FAIL", 2: "PENDING"}
+
+def authorization_tuple(auth):
+    """A signed authorization as X402PolicyWrapper.Authorization."""
+    return (auth["from"], auth["value"], auth["validAfter"], auth["validBefore"], auth["nonce"], auth["v"], auth["r"], auth["s"])
+
+@lru_cache(maxsize=64)
+def has_function(address, name, function):
+    """Whether the contract at `address` dispatches `name`'s `function` (see `contracts.dispatches`).
+
+    False as well when out/ was built before `function` existed: calls to it can't be encoded.
+    """
+    if not contracts.has_function(name, function):
+        return False
+    return dispatches(bytes(w3.eth.get_code(address)), contracts.selector(name, function))
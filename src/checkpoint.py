@@ -0,0 +1,378 @@
+"""Durable LangGraph checkpointer on SQLite (WAL).
+
+Replaces the in-process MemorySaver so paused escrow threads survive restarts
+and any worker sharing the database file can resume them.
+
+- Writes are queued and committed in one transaction per batch (every
+  `flush_interval` seconds or `batch_size` statements). Reads flush first, so
+  a worker always sees its own writes.
+- Payloads use LangGraph's serializer (msgpack) and are zlib-compressed above
+  `compress_min` bytes.
+- Threads that ran to completion are deleted `ttl` seconds after their last
+  write, idle (abandoned) threads after `idle_ttl`.
+"""
+import random
+import sqlite3
+import threading
+import time
+import zlib
+
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    parent_id TEXT,
+    checkpoint_type TEXT NOT NULL,
+    checkpoint BLOB NOT NULL,
+    metadata_type TEXT NOT NULL,
+    metadata BLOB NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    version TEXT NOT NULL,
+    type TEXT NOT NULL,
+    value BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT NOT NULL,
+    value BLOB,
+    task_path TEXT NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+CREATE TABLE IF NOT EXISTS threads (
+    thread_id TEXT PRIMARY KEY,
+    updated REAL NOT NULL,
+    finished INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS threads_updated ON threads (finished, updated);
+"""
+
+_COMPRESSED = "z+"
+
+class CompressedSerializer:
+    """Wraps a LangGraph serializer and zlib-compresses large payloads."""
+
+    def __init__(self, serde=None, compress_min=512, level=6):
+        self.serde = serde or JsonPlusSerializer()
+        self.compress_min = compress_min
+        self.level = level
+
+    def dumps_typed(self, obj):
+        type_, data = self.serde.dumps_typed(obj)
+        if len(data) >= self.compress_min:
+            return _COMPRESSED + type_, zlib.compress(data, self.level)
+        return type_, data
+
+    def loads_typed(self, data):
+        type_, payload = data
+        if type_.startswith(_COMPRESSED):
+            return self.serde.loads_typed((type_[len(_COMPRESSED):], zlib.decompress(payload)))
+        return self.serde.loads_typed((type_, payload))
+
+def _is_finished(checkpoint):
+    # Nothing left to run: no trigger ("__start__" or "branch:to:<node>") holds a value its
+    # node hasn't seen (consumed triggers are emptied, so they drop out of channel_values)
+    seen = checkpoint.get("versions_seen", {})
+    versions = checkpoint.get("channel_versions", {})
+    for channel in checkpoint.get("channel_values", {}):
+        if channel == "__start__":
+            node = channel
+        elif channel.startswith("branch:to:"):
+            node = channel[len("branch:to:"):]
+        else:
+            continue
+        if seen.get(node, {}).get(channel) != versions.get(channel):
+            return False
+    return True
+
+def _config(thread_id, checkpoint_ns, checkpoint_id):
+    return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}}
+
+class SQLiteCheckpointer(BaseCheckpointSaver[str]):
+    def __init__(self, path, *, ttl=3600, idle_ttl=7 * 24 * 3600, batch_size=256,
+                 flush_interval=0.05, prune_interval=60, compress_min=512):
+        super().__init__(serde=CompressedSerializer(compress_min=compress_min))
+        self.path = path
+        self.ttl = ttl
+        self.idle_ttl = idle_ttl
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.prune_interval = prune_interval
+        self._lock = threading.RLock()
+        self._pending = []  # (sql, params); mutated in place, clones share it
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL: a commit survives a process crash; only an OS crash can lose the last batch
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.executescript(_SCHEMA)
+        self._stop = threading.Event()
+        self._flusher = threading.Thread(target=self._run, name="checkpoint-flusher", daemon=True)
+        self._flusher.start()
+
+    # --- Write batching ---
+
+    def _enqueue(self, statements):
+        with self._lock:
+            self._pending.extend(statements)
+            if len(self._pending) >= self.batch_size:
+                self.flush()
+
+    def flush(self):
+        """Commits all queued writes in one transaction."""
+        with self._lock:
+            if not self._pending:
+                return
+            statements = self._pending[:]
+            del self._pending[:]
+            self._conn.execute("BEGIN")
+            try:
+                for sql, params in statements:
+                    self._conn.execute(sql, params)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _run(self):
+        last_prune = time.monotonic()
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+                if time.monotonic() - last_prune >= self.prune_interval:
+                    self.prune_expired()
+                    last_prune = time.monotonic()
+            except Exception as e:
+                print(f"Checkpoint flush failed: {e}")
+
+    def close(self):
+        self._stop.set()
+        self.flush()
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            self.flush()
+            return self._conn.execute(sql, params).fetchall()
+
+    # --- BaseCheckpointSaver ---
+
+    def get_next_version(self, current, channel=None):
+        # Same format as InMemorySaver: sortable counter plus a random tiebreak
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    def _load_blobs(self, thread_id, checkpoint_ns, versions):
+        if not versions:
+            return {}
+        match = " OR ".join("(channel = ? AND version = ?)" for _ in versions)
+        rows = self._query(
+            f"SELECT channel, type, value FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND ({match})",
+            (thread_id, checkpoint_ns, *(x for item in versions.items() for x in item)),
+        )
+        return {channel: self.serde.loads_typed((type_, value)) for channel, type_, value in rows if type_ != "empty"}
+
+    def _pending_writes(self, thread_id, checkpoint_ns, checkpoint_id):
+        rows = self._query(
+            "SELECT task_id, channel, type, value FROM writes"
+            " WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_path, task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        )
+        return [(task_id, channel, self.serde.loads_typed((type_, value))) for task_id, channel, type_, value in rows]
+
+    def _tuple(self, thread_id, checkpoint_ns, row):
+        checkpoint_id, parent_id, checkpoint_type, checkpoint, metadata_type, metadata = row
+        checkpoint = self.serde.loads_typed((checkpoint_type, checkpoint))
+        return CheckpointTuple(
+            config=_config(thread_id, checkpoint_ns, checkpoint_id),
+            checkpoint={
+                **checkpoint,
+                "channel_values": self._load_blobs(thread_id, checkpoint_ns, checkpoint["channel_versions"]),
+            },
+            metadata=self.serde.loads_typed((metadata_type, metadata)),
+            parent_config=_config(thread_id, checkpoint_ns, parent_id) if parent_id else None,
+            pending_writes=self._pending_writes(thread_id, checkpoint_ns, checkpoint_id),
+        )
+
+    def get_tuple(self, config):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        columns = "checkpoint_id, parent_id, checkpoint_type, checkpoint, metadata_type, metadata"
+        if checkpoint_id := get_checkpoint_id(config):
+            rows = self._query(
+                f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                (thread_id, checkpoint_ns, checkpoint_id),
+            )
+        else:
+            rows = self._query(
+                f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?"
+                " ORDER BY checkpoint_id DESC LIMIT 1",
+                (thread_id, checkpoint_ns),
+            )
+        return self._tuple(thread_id, checkpoint_ns, rows[0]) if rows else None
+
+    def list(self, config, *, filter=None, before=None, limit=None):
+        where, params = [], []
+        if config:
+            where.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                where.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                where.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            where.append("checkpoint_id < ?")
+            params.append(before_id)
+        rows = self._query(
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_id, checkpoint_type, checkpoint, metadata_type, metadata"
+            f" FROM checkpoints {'WHERE ' + ' AND '.join(where) if where else ''} ORDER BY checkpoint_id DESC",
+            params,
+        )
+        for thread_id, checkpoint_ns, *row in rows:
+            if limit is not None and limit <= 0:
+                break
+            item = self._tuple(thread_id, checkpoint_ns, row)
+            # Metadata is stored serialized, so filter after loading (as MemorySaver does)
+            if filter and not all(item.metadata.get(k) == v for k, v in filter.items()):
+                continue
+            if limit is not None:
+                limit -= 1
+            yield item
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        c = checkpoint.copy()
+        values = c.pop("channel_values")
+        statements = [
+            ("INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?)",
+             (thread_id, checkpoint_ns, channel, version,
+              *(self.serde.dumps_typed(values[channel]) if channel in values else ("empty", None))))
+            for channel, version in new_versions.items()
+        ]
+        statements.append((
+            "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+             *self.serde.dumps_typed(c), *self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))),
+        ))
+        if checkpoint_ns:
+            # Subgraph checkpoints keep the thread alive but don't decide whether it finished
+            statements.append(("UPDATE threads SET updated = ? WHERE thread_id = ?", (time.time(), thread_id)))
+        else:
+            statements.append((
+                "INSERT OR REPLACE INTO threads VALUES (?, ?, ?)",
+                (thread_id, time.time(), int(_is_finished(checkpoint))),
+            ))
+        self._enqueue(statements)
+        return _config(thread_id, checkpoint_ns, checkpoint["id"])
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        statements = []
+        for idx, (channel, value) in enumerate(writes):
+            idx = WRITES_IDX_MAP.get(channel, idx)
+            # Special writes (errors, interrupts) are replaced, regular ones are written once
+            verb = "INSERT OR REPLACE" if idx < 0 else "INSERT OR IGNORE"
+            statements.append((
+                f"{verb} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, *self.serde.dumps_typed(value), task_path),
+            ))
+        self._enqueue(statements)
+
+    def _delete_statements(self, thread_id):
+        return [(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+                for table in ("checkpoints", "blobs", "writes", "threads")]
+
+    def delete_thread(self, thread_id):
+        self._enqueue(self._delete_statements(thread_id))
+        self.flush()
+
+    def prune(self, thread_ids, *, strategy="keep_latest"):
+        """`keep_latest` drops superseded checkpoints (and their writes/blobs); `delete` drops the threads."""
+        for thread_id in thread_ids:
+            if strategy == "delete":
+                self.delete_thread(thread_id)
+                continue
+            namespaces = self._query("SELECT DISTINCT checkpoint_ns FROM checkpoints WHERE thread_id = ?", (thread_id,))
+            for (checkpoint_ns,) in namespaces:
+                latest = self.get_tuple(_config(thread_id, checkpoint_ns, None))
+                keep_id = latest.config["configurable"]["checkpoint_id"]
+                statements = [
+                    ("DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id != ?",
+                     (thread_id, checkpoint_ns, keep_id)),
+                    ("DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id != ?",
+                     (thread_id, checkpoint_ns, keep_id)),
+                ]
+                versions = latest.checkpoint["channel_versions"]
+                keep = " OR ".join("(channel = ? AND version = ?)" for _ in versions) or "0"
+                statements.append((
+                    f"DELETE FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND NOT ({keep})",
+                    (thread_id, checkpoint_ns, *(x for item in versions.items() for x in item)),
+                ))
+                self._enqueue(statements)
+        self.flush()
+
+    def prune_expired(self, now=None):
+        """Deletes finished threads older than `ttl` and idle ones older than `idle_ttl`. Returns the count."""
+        now = time.time() if now is None else now
+        expired = [row[0] for row in self._query(
+            "SELECT thread_id FROM threads WHERE (finished = 1 AND updated < ?) OR updated < ?",
+            (now - self.ttl, now - self.idle_ttl),
+        )]
+        self._enqueue([statement for thread_id in expired for statement in self._delete_statements(thread_id)])
+        self.flush()
+        return len(expired)
+
+    def stats(self):
+        rows = self._query("SELECT finished, COUNT(*) FROM threads GROUP BY finished")
+        counts = dict(rows)
+        return {"active_threads": counts.get(0, 0), "finished_threads": counts.get(1, 0)}
+
+    # Async API: SQLite calls are short and local, run them inline like MemorySaver
+
+    async def aget_tuple(self, config):
+        return self.get_tuple(config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        for item in self.list(config, filter=filter, before=before, limit=limit):
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        return self.put_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id):
+        return self.delete_thread(thread_id)
+
+    async def aprune(self, thread_ids, *, strategy="keep_latest"):
+        return self.prune(thread_ids, strategy=strategy)
@@ -4,10 +4,93 @@ import json
 # --- LLM Config ---
 LLM_MODEL = "gpt-oss:120b"
 LLM_BASE_URL = "http://localhost:11434"
+# Persistent response cache for the (temperature 0) chains, see src/agents/llm_cache.py
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".cache/llm_responses.sqlite")
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+# Ollama embedding model for near-duplicate prompt lookups (empty = exact matches only)
+LLM_CACHE_EMBED_MODEL = os.getenv("LLM_CACHE_EMBED_MODEL", "")
+LLM_CACHE_SIMILARITY = float(os.getenv("LLM_CACHE_SIMILARITY", "0.97"))
+# Chains allowed near-duplicate hits (comma-separated names); none by default, every
+# current prompt with inputs carries the payment's request or amounts
+LLM_CACHE_SIMILAR_CHAINS = [c.strip() for c in os.getenv("LLM_CACHE_SIMILAR_CHAINS", "").split(",") if c.strip()]
+
+# --- Compliance Config ---
+# Amount (in SGD) above which Source of Funds is required (SourceOfFundsPolicy threshold)
+COMPLIANCE_THRESHOLD = 1000
+# Decide clear-cut cases with the rule engine instead of the LLM
+RULE_ENGINE_ENABLED = os.getenv("RULE_ENGINE_ENABLED", "1") == "1"
+# Also ask the LLM for the narrative when the rule engine decided (off: templated explanation, no LLM call)
+RULE_ENGINE_LLM_NARRATIVE = os.getenv("RULE_ENGINE_LLM_NARRATIVE", "0") == "1"
+
+# --- Buyer Config ---
+# Run intent extraction in the background while the buyer's thought streams
+PARALLEL_INTENT = os.getenv("PARALLEL_INTENT", "1") == "1"
+
+# --- UI ---
+# LLM tokens are rendered at most every STREAM_FLUSH_INTERVAL seconds or STREAM_FLUSH_CHARS characters
+STREAM_FLUSH_INTERVAL = float(os.getenv("STREAM_FLUSH_INTERVAL", "0.1"))
+STREAM_FLUSH_CHARS = int(os.getenv("STREAM_FLUSH_CHARS", "256"))
+
+# --- API Server ---
+# Graph runs in flight at once; requests beyond that wait in a queue of SERVER_QUEUE_SIZE, then get 503
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "32"))
+SERVER_QUEUE_SIZE = int(os.getenv("SERVER_QUEUE_SIZE", "256"))
+
+# --- Metrics ---
+# JSON lines, one per node run, LLM call and transaction ("" = off)
+METRICS_LOG_PATH = os.getenv("METRICS_LOG_PATH", "")
+# Prometheus /metrics for processes without the API server, e.g. the Streamlit UI (0 = off)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+# --- Graph Checkpoints ---
+# "sqlite" (durable, shared by workers on one host) or "memory" (MemorySaver)
+CHECKPOINT_BACKEND = os.getenv("CHECKPOINT_BACKEND", "sqlite")
+CHECKPOINT_PATH = os.getenv("CHECKPOINT_PATH", ".cache/checkpoints.sqlite")
+# Seconds to keep threads that ran to completion / threads nobody resumed
+CHECKPOINT_TTL = float(os.getenv("CHECKPOINT_TTL", "3600"))
+CHECKPOINT_IDLE_TTL = float(os.getenv("CHECKPOINT_IDLE_TTL", str(7 * 24 * 3600)))
 
 # --- Blockchain Config ---
 CHAIN_ID = 31337
 RPC_URL = "http://127.0.0.1:8545"
+# Comma-separated endpoints, tried in order (the first healthy one serves requests)
+RPC_URLS = [url.strip() for url in os.getenv("RPC_URLS", RPC_URL).split(",") if url.strip()]
+# Keep-alive connections per endpoint, request timeout (seconds), attempts and base backoff for idempotent calls
+RPC_POOL_SIZE = int(os.getenv("RPC_POOL_SIZE", "32"))
+RPC_TIMEOUT = float(os.getenv("RPC_TIMEOUT", "10"))
+RPC_RETRIES = int(os.getenv("RPC_RETRIES", "3"))
+RPC_RETRY_BACKOFF = float(os.getenv("RPC_RETRY_BACKOFF", "0.1"))
+# Seconds between background health probes of idle or failed endpoints
+RPC_HEALTH_INTERVAL = float(os.getenv("RPC_HEALTH_INTERVAL", "2"))
+
+# Identity registry read cache (hasSourceOfFunds / hasSanctionsCheck)
+CREDENTIAL_CACHE_SIZE = int(os.getenv("CREDENTIAL_CACHE_SIZE", "1024"))
+CREDENTIAL_CACHE_TTL = float(os.getenv("CREDENTIAL_CACHE_TTL", "30"))
+
+# Local index of wrapper / escrow events, see src/blockchain/indexer.py
+EVENT_INDEX_PATH = os.getenv("EVENT_INDEX_PATH", ".cache/events.sqlite")
+# Blocks per eth_getLogs request (halved when the node refuses a range)
+EVENT_INDEX_BLOCK_RANGE = int(os.getenv("EVENT_INDEX_BLOCK_RANGE", "2000"))
+
+# Pre-deployed escrow clones kept ready by src/blockchain/escrow_pool.py (needs SimpleEscrowFactory)
+ESCROW_POOL_SIZE = int(os.getenv("ESCROW_POOL_SIZE", "8"))
+ESCROW_POOL_BATCH = int(os.getenv("ESCROW_POOL_BATCH", "4"))
+# Seconds until a pooled escrow handed to a transaction expires
+ESCROW_EXPIRY = int(os.getenv("ESCROW_EXPIRY", str(30 * 24 * 3600)))
+# Funding is sent right behind open(), so it can't be estimated against mined state
+ESCROW_FUND_GAS = int(os.getenv("ESCROW_FUND_GAS", "250000"))
+
+# Settle the escrow mediation with one X402PolicyWrapper.settleSplit call when the wrapper has it
+SPLIT_SETTLEMENT = os.getenv("SPLIT_SETTLEMENT", "1") == "1"
+# Used instead of estimating when settleSplit follows an unmined open() of a pooled escrow
+SPLIT_SETTLEMENT_GAS = int(os.getenv("SPLIT_SETTLEMENT_GAS", "600000"))
+
+# Fixed gas limit for batch settlement (payWithAuthorization uses ~250k), skips per-tx estimation
+BATCH_GAS_LIMIT = int(os.getenv("BATCH_GAS_LIMIT", "400000"))
+
+# Foundry build output; ABIs are read from here (re-read after `forge build`)
+ARTIFACTS_DIR = os.getenv("ARTIFACTS_DIR", "out")
 
 # --- Keys (Demo Only) ---
 # Anvil #0: Compliance Agent (Deployer)
@@ -1,37 +1,69 @@
-from langgraph.graph import StateGraph, END
-from langgraph.checkpoint.memory import MemorySaver
-from langchain_core.messages import HumanMessage
+"""The payment graph.
+
+`app_graph` (and its checkpointer, `memory`) is built on first access, not at
+import: LangGraph, the agents and web3 are only imported then. Use
+`from src.graph import app_graph` where the graph is needed right away, or
+`get_app_graph()` at call time to keep an import cheap.
+"""
+import os
+import threading
 
 from src.state import GraphState
-from src.agents.buyer import node_analyze_intent, node_negotiate_acceptance
-from src.agents.compliance import (
-    node_evaluate_compliance, 
-    node_propose_escrow, 
-    node_execute_escrow, 
-    node_finalize_settlement
-)
+from src.config import CHECKPOINT_BACKEND, CHECKPOINT_PATH, CHECKPOINT_TTL, CHECKPOINT_IDLE_TTL
+from src.metrics import instrumentation
 
 # --- Routing Logic ---
 
 def route_compliance(state: GraphState):
-    status = state["compliance_status"]
-    if status == "PENDING":
+    # Pure: evaluate_compliance already turned a PENDING the escrow couldn't fix into FAIL
+    if state["compliance_status"] == "PENDING":
         return "propose_escrow"
     else:
         return "direct_settle" # Not fully implemented in happy path demo
 
 # --- Graph Construction ---
 
+def node(func, afunc):
+    """Graph node with a sync (app_graph.stream) and async (app_graph.astream) implementation.
+
+    Both paths are instrumented under the function name (wall time, RPC
+    requests, and the thread's LLM tokens and gas; see src/metrics.py).
+    """
+    from langchain_core.runnables import RunnableLambda
+    name = func.__name__
+
+    def timed(state: GraphState, config):
+        with instrumentation.node(name, config):
+            return func(state, config)
+
+    async def atimed(state: GraphState, config):
+        with instrumentation.node(name, config):
+            return await afunc(state, config)
+
+    return RunnableLambda(timed, afunc=atimed, name=name)
+
 def build_graph():
+    from langgraph.graph import StateGraph, END
+    from src.agents.buyer import (
+        node_analyze_intent, anode_analyze_intent,
+        node_negotiate_acceptance, anode_negotiate_acceptance
+    )
+    from src.agents.compliance import (
+        node_evaluate_compliance, anode_evaluate_compliance,
+        node_propose_escrow, anode_propose_escrow,
+        node_execute_escrow, anode_execute_escrow,
+        node_finalize_settlement, anode_finalize_settlement
+    )
+
     workflow = StateGraph(GraphState)
     
     # Add Nodes
-    workflow.add_node("analyze_intent", node_analyze_intent)
-    workflow.add_node("evaluate_compliance", node_evaluate_compliance)
-    workflow.add_node("propose_escrow", node_propose_escrow)
-    workflow.add_node("negotiate_acceptance", node_negotiate_acceptance)
-    workflow.add_node("execute_escrow", node_execute_escrow)
-    workflow.add_node("finalize_settlement", node_finalize_settlement)
+    workflow.add_node("analyze_intent", node(node_analyze_intent, anode_analyze_intent))
+    workflow.add_node("evaluate_compliance", node(node_evaluate_compliance, anode_evaluate_compliance))
+    workflow.add_node("propose_escrow", node(node_propose_escrow, anode_propose_escrow))
+    workflow.add_node("negotiate_acceptance", node(node_negotiate_acceptance, anode_negotiate_acceptance))
+    workflow.add_node("execute_escrow", node(node_execute_escrow, anode_execute_escrow))
+    workflow.add_node("finalize_settlement", node(node_finalize_settlement, anode_finalize_settlement))
     
     # Set Entry Point
     workflow.set_entry_point("analyze_intent")
@@ -57,6 +89,32 @@ def build_graph():
     
     return workflow
 
-# Create the graph instance with memory
-memory = MemorySaver()
-app_graph = build_graph().compile(checkpointer=memory, interrupt_after=["propose_escrow", "execute_escrow"])
+def build_checkpointer():
+    if CHECKPOINT_BACKEND == "memory":
+        from langgraph.checkpoint.memory import MemorySaver
+        return MemorySaver()
+    if os.path.dirname(CHECKPOINT_PATH):
+        os.makedirs(os.path.dirname(CHECKPOINT_PATH), exist_ok=True)
+    from src.checkpoint import SQLiteCheckpointer
+    return SQLiteCheckpointer(CHECKPOINT_PATH, ttl=CHECKPOINT_TTL, idle_ttl=CHECKPOINT_IDLE_TTL)
+
+_build_lock = threading.Lock()
+
+def get_app_graph():
+    """The compiled graph with a durable checkpointer (paused escrows survive restarts); built once."""
+    graph = globals().get("app_graph")
+    if graph is None:
+        with _build_lock:
+            graph = globals().get("app_graph")
+            if graph is None:
+                checkpointer = build_checkpointer()
+                graph = build_graph().compile(checkpointer=checkpointer,
+                                              interrupt_after=["propose_escrow", "execute_escrow"])
+                globals().update(memory=checkpointer, app_graph=graph)
+    return graph
+
+def __getattr__(name):
+    if name in ("app_graph", "memory"):
+        get_app_graph()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
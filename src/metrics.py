@@ -0,0 +1,430 @@
+"""Instrumentation for the payment graph.
+
+- `node_latency` and `rpc_calls`: rolling per-node latency and RPC counts
+  (GET /health).
+- `instrumentation`: what each payment (graph thread) spent. It records
+  wall time per node, LLM calls with their tokens in/out, RPC requests and
+  the gas of every transaction, both per thread and as Prometheus-style
+  counters and histograms (`metrics.render()`, served on /metrics). Each
+  event is also appended as a JSON line to METRICS_LOG_PATH.
+
+The hooks are `src.graph.node` (nodes), `src.agents.tools` (LLM callbacks),
+`src.blockchain.provider` (RPC) and `ConfirmationTracker.track` (gas). A
+thread's events are attributed through a context variable set around each
+node, so work a node hands to other threads must run in a copied context
+(`contextvars.copy_context().run`).
+"""
+import json
+import os
+import statistics
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from src.config import METRICS_LOG_PATH
+
+class LatencyRecorder:
+    """Keeps the last `window` durations per name, in seconds."""
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._samples = defaultdict(lambda: deque(maxlen=self.window))
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds):
+        with self._lock:
+            self._samples[name].append(seconds)
+
+    @contextmanager
+    def time(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def summary(self):
+        """{name: {"count", "mean_ms", "p50_ms", "p99_ms"}} over the current window."""
+        with self._lock:
+            samples = {name: list(values) for name, values in self._samples.items()}
+        out = {}
+        for name, values in samples.items():
+            ms = [v * 1000 for v in values]
+            if len(ms) > 1:
+                cuts = statistics.quantiles(ms, n=100, method="inclusive")
+                p50, p99 = cuts[49], cuts[98]
+            else:
+                p50 = p99 = ms[0]
+            out[name] = {"count": len(ms), "mean_ms": statistics.fmean(ms), "p50_ms": p50, "p99_ms": p99}
+        return out
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+
+node_latency = LatencyRecorder()
+
+class CallCounter:
+    """Counts calls by method, process-wide and per `track()` scope.
+
+    Scopes follow the context (contextvars), so calls made on the scope's
+    own thread or task, or on tasks and `asyncio.to_thread` calls it starts,
+    are counted; plain worker threads are only in the totals.
+    """
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._totals = Counter()
+        self._scopes = defaultdict(lambda: deque(maxlen=self.window))
+        self._current = ContextVar("call_scopes", default=())
+        self._lock = threading.Lock()
+
+    def record(self, method):
+        with self._lock:
+            self._totals[method] += 1
+            for scope in self._current.get():
+                scope[method] += 1
+
+    @contextmanager
+    def track(self, name=None):
+        """Yields a Counter of the calls made inside; kept under `name` in `summary()` if given."""
+        scope = Counter()
+        token = self._current.set(self._current.get() + (scope,))
+        try:
+            yield scope
+        finally:
+            self._current.reset(token)
+            if name:
+                with self._lock:
+                    self._scopes[name].append(sum(scope.values()))
+
+    def summary(self):
+        """{"total", "by_method", "per_scope": {name: {"count", "mean", "max"}}}"""
+        with self._lock:
+            scopes = {name: list(values) for name, values in self._scopes.items()}
+            by_method = dict(self._totals)
+        return {
+            "total": sum(by_method.values()),
+            "by_method": by_method,
+            "per_scope": {
+                name: {"count": len(values), "mean": statistics.fmean(values), "max": max(values)}
+                for name, values in scopes.items()
+            },
+        }
+
+    def reset(self):
+        with self._lock:
+            self._totals.clear()
+            self._scopes.clear()
+
+# JSON-RPC requests sent by src/blockchain/provider.py (a batch counts once)
+rpc_calls = CallCounter()
+
+# --- Prometheus-style counters and histograms ---
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+GAS_BUCKETS = (21000, 50000, 100000, 200000, 300000, 500000, 1000000, 3000000)
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+def _format_number(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+class Metric:
+    """A counter (`inc`) or histogram (`observe`), one series per label combination."""
+
+    def __init__(self, name, help, kind="counter", labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets) if kind == "histogram" else ()
+        self._series = {}  # label values -> total (counter) or [bucket counts..., sum, count] (histogram)
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def value(self, **labels):
+        """Counter total, or (sum, count) for a histogram."""
+        with self._lock:
+            series = self._series.get(self._key(labels))
+        if self.kind == "counter":
+            return series or 0
+        return (series[-2], series[-1]) if series else (0, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            series = {key: list(values) if isinstance(values, list) else values
+                      for key, values in sorted(self._series.items())}
+        for key, values in series.items():
+            if self.kind == "counter":
+                lines.append(f"{self.name}{_format_labels(self.labels, key)} {_format_number(values)}")
+                continue
+            for bound, count in zip(self.buckets + (float("inf"),), values[:-2] + [values[-1]]):
+                le = "+Inf" if bound == float("inf") else _format_number(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, ('le', le))} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_number(values[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {values[-1]}")
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+
+    def counter(self, name, help, labels=()):
+        return self._metrics.setdefault(name, Metric(name, help, "counter", labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self._metrics.setdefault(name, Metric(name, help, "histogram", labels, buckets))
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        return "\n".join(line for metric in self._metrics.values() for line in metric.render()) + "\n"
+
+    def reset(self):
+        for metric in self._metrics.values():
+            metric.reset()
+
+metrics = MetricsRegistry()
+
+node_seconds = metrics.histogram("payment_node_seconds", "Graph node wall time", ["node"])
+node_errors = metrics.counter("payment_node_errors_total", "Graph node runs that raised", ["node"])
+llm_seconds = metrics.histogram("payment_llm_seconds", "LLM call wall time", ["chain"])
+llm_tokens = metrics.counter("payment_llm_tokens_total", "LLM tokens by direction (in/out)", ["chain", "direction"])
+rpc_seconds = metrics.histogram("payment_rpc_seconds", "JSON-RPC request wall time (a batch counts once)", ["method"])
+rpc_errors = metrics.counter("payment_rpc_errors_total", "JSON-RPC requests that failed on every endpoint",
+                             ["method"])
+transactions = metrics.counter("payment_transactions_total", "Transactions by receipt status", ["status"])
+gas_used = metrics.histogram("payment_gas_used", "Gas used per mined transaction", ["node"], GAS_BUCKETS)
+
+# --- Per-thread traces and the JSON lines log ---
+
+class PaymentTrace:
+    """What one graph thread (payment) has spent so far."""
+
+    def __init__(self, thread_id):
+        self.thread_id = thread_id
+        self.node_seconds = Counter()
+        self.node_runs = Counter()
+        self.llm_calls = 0
+        self.tokens_in = 0
+        self.tokens_out = 0
+        self.rpc_calls = 0
+        self.transactions = []  # {"tx_hash", "node", "gas_used", "status"}
+        self._lock = threading.Lock()
+
+    def add_node(self, node, seconds, rpc_count):
+        with self._lock:
+            self.node_seconds[node] += seconds
+            self.node_runs[node] += 1
+            self.rpc_calls += rpc_count
+
+    def add_llm(self, tokens_in, tokens_out):
+        with self._lock:
+            self.llm_calls += 1
+            self.tokens_in += tokens_in
+            self.tokens_out += tokens_out
+
+    def add_transaction(self, transaction):
+        with self._lock:
+            self.transactions.append(transaction)
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "thread_id": self.thread_id,
+                "seconds": sum(self.node_seconds.values()),
+                "node_seconds": dict(self.node_seconds),
+                "node_runs": dict(self.node_runs),
+                "llm_calls": self.llm_calls,
+                "tokens_in": self.tokens_in,
+                "tokens_out": self.tokens_out,
+                "rpc_calls": self.rpc_calls,
+                "transactions": list(self.transactions),
+                "gas_used": sum(tx["gas_used"] for tx in self.transactions),
+            }
+
+class EventLog:
+    """Appends one JSON object per line; a no-op without a path."""
+
+    def __init__(self, path=METRICS_LOG_PATH):
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+
+    def write(self, event, **fields):
+        if not self.path:
+            return
+        line = json.dumps({"ts": time.time(), "event": event, **fields}, default=str)
+        with self._lock:
+            if self._file is None:
+                if os.path.dirname(self.path):
+                    os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                self._file = open(self.path, "a", buffering=1)
+            self._file.write(line + "\n")
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+class Instrumentation:
+    """Attributes node runs, LLM calls, RPC requests and gas to graph threads."""
+
+    def __init__(self, log=None, max_threads=1000):
+        self.log = log or EventLog()
+        self.max_threads = max_threads
+        self._traces = OrderedDict()  # thread_id -> PaymentTrace, least recently used first
+        self._current = ContextVar("payment_node", default=(None, None))  # (trace, node)
+        self._lock = threading.Lock()
+
+    def trace(self, thread_id, create=True):
+        with self._lock:
+            trace = self._traces.get(thread_id)
+            if trace is None and create:
+                trace = self._traces[thread_id] = PaymentTrace(thread_id)
+                while len(self._traces) > self.max_threads:
+                    self._traces.popitem(last=False)
+            if trace is not None:
+                self._traces.move_to_end(thread_id)
+            return trace
+
+    def summary(self, thread_id):
+        trace = self.trace(thread_id, create=False)
+        return trace.as_dict() if trace else None
+
+    @contextmanager
+    def node(self, name, config=None):
+        """Around a graph node: latency, RPC count, and the thread's trace as the current one."""
+        thread_id = ((config or {}).get("configurable") or {}).get("thread_id")
+        trace = self.trace(thread_id) if thread_id is not None else None
+        token = self._current.set((trace, name))
+        start = time.perf_counter()
+        ok = False
+        try:
+            with node_latency.time(name), rpc_calls.track(name) as calls:
+                yield
+            ok = True
+        finally:
+            seconds = time.perf_counter() - start
+            self._current.reset(token)
+            node_seconds.observe(seconds, node=name)
+            if not ok:
+                node_errors.inc(node=name)
+            rpc_count = sum(calls.values())
+            if trace:
+                trace.add_node(name, seconds, rpc_count)
+            self.log.write("node", thread_id=thread_id, node=name, seconds=seconds, ok=ok,
+                           rpc_calls=rpc_count, rpc_by_method=dict(calls))
+
+    def record_llm(self, chain, seconds, tokens_in=0, tokens_out=0, error=None):
+        trace, node = self._current.get()
+        llm_seconds.observe(seconds, chain=chain)
+        llm_tokens.inc(tokens_in, chain=chain, direction="in")
+        llm_tokens.inc(tokens_out, chain=chain, direction="out")
+        if trace:
+            trace.add_llm(tokens_in, tokens_out)
+        self.log.write("llm", thread_id=trace and trace.thread_id, node=node, chain=chain, seconds=seconds,
+                       tokens_in=tokens_in, tokens_out=tokens_out, error=error)
+
+    @contextmanager
+    def rpc(self, method):
+        rpc_calls.record(method)
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            rpc_errors.inc(method=method)
+            raise
+        finally:
+            rpc_seconds.observe(time.perf_counter() - start, method=method)
+
+    def watch_transaction(self, tx_hash, future):
+        """Records the receipt's gas against the current thread and node once `future` resolves."""
+        trace, node = self._current.get()
+        tx_hash = tx_hash.hex() if hasattr(tx_hash, "hex") else str(tx_hash)
+
+        def done(future):
+            if future.cancelled() or future.exception() is not None:
+                transactions.inc(status="timeout")
+                self.log.write("transaction", thread_id=trace and trace.thread_id, node=node,
+                               tx_hash=tx_hash, status="timeout")
+                return
+            receipt = future.result()
+            status = "success" if receipt["status"] == 1 else "reverted"
+            transaction = {"tx_hash": tx_hash, "node": node, "gas_used": receipt["gasUsed"], "status": status}
+            transactions.inc(status=status)
+            gas_used.observe(receipt["gasUsed"], node=node or "")
+            if trace:
+                trace.add_transaction(transaction)
+            self.log.write("transaction", thread_id=trace and trace.thread_id,
+                           block_number=receipt["blockNumber"], **transaction)
+
+        future.add_done_callback(done)
+
+    def reset(self):
+        with self._lock:
+            self._traces.clear()
+        metrics.reset()
+
+instrumentation = Instrumentation()
+
+# --- Local exporter ---
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+_exporter = None
+_exporter_lock = threading.Lock()
+
+def start_exporter(port, host="127.0.0.1"):
+    """Serves /metrics on `port` from a daemon thread (once per process); returns the server."""
+    global _exporter
+    with _exporter_lock:
+        if _exporter is None:
+            _exporter = ThreadingHTTPServer((host, port), _MetricsHandler)
+            threading.Thread(target=_exporter.serve_forever, name="metrics-exporter", daemon=True).start()
+        return _exporter
@@ -0,0 +1,172 @@
+"""Headless HTTP API for the payment graph (no Streamlit).
+
+    python -m src.server --port 8000
+
+    POST /payments                     {"request": "I want a $1500 luxury watch"[, "thread_id": ...]}
+    POST /payments/{thread_id}/accept  accept the proposed escrow
+    POST /payments/{thread_id}/sof     {"document": "<contents of mock_sof.txt>"}
+    POST /payments/{thread_id}/refund  refund the active escrow
+    GET  /payments/{thread_id}         current status and what the payment spent so far
+    GET  /health                       pool, node latency and RPC call stats
+    GET  /metrics                      Prometheus counters and histograms
+
+Each call runs the graph on the thread to its next pause (src/sessions.py)
+and returns the node updates. Calls on one thread_id run one at a time; at
+most SERVER_WORKERS graph runs are in flight and up to SERVER_QUEUE_SIZE
+more wait for a slot. Past that the server answers 503 with Retry-After
+instead of queueing without bound.
+"""
+import argparse
+import asyncio
+import uuid
+from contextlib import asynccontextmanager
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Route
+from src.config import SERVER_WORKERS, SERVER_QUEUE_SIZE
+from src.graph import get_app_graph
+from src.metrics import instrumentation, metrics, node_latency, rpc_calls
+from src import sessions
+
+class Overloaded(Exception):
+    pass
+
+class SessionPool:
+    """Bounds concurrent graph runs and serializes them per thread_id."""
+
+    def __init__(self, workers=SERVER_WORKERS, queue_size=SERVER_QUEUE_SIZE):
+        self.workers = workers
+        self.queue_size = queue_size
+        self._slots = asyncio.Semaphore(workers)
+        self._admitted = 0   # running plus waiting
+        self._running = 0
+        self._locks = {}     # thread_id -> [lock, users]
+        self.rejected = 0
+
+    @asynccontextmanager
+    async def session(self, thread_id):
+        if self._admitted >= self.workers + self.queue_size:
+            self.rejected += 1
+            raise Overloaded()
+        self._admitted += 1
+        entry = self._locks.setdefault(thread_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            # Thread lock first: a request queued behind its own thread doesn't hold a worker
+            async with entry[0], self._slots:
+                self._running += 1
+                try:
+                    yield
+                finally:
+                    self._running -= 1
+        finally:
+            self._admitted -= 1
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[thread_id]
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "running": self._running,
+            "queued": self._admitted - self._running,
+            "queue_size": self.queue_size,
+            "rejected": self.rejected,
+        }
+
+def _error(status, message, headers=None):
+    return JSONResponse({"error": message}, status_code=status, headers=headers)
+
+async def _run(request, thread_id, operation, *args):
+    try:
+        async with request.app.state.pool.session(thread_id):
+            with rpc_calls.track(operation.__name__) as calls:
+                updates = await operation(thread_id, *args)
+    except Overloaded:
+        return _error(503, "Server busy, retry later", {"Retry-After": "1"})
+    except sessions.SessionError as e:
+        return _error(409, str(e))
+    except ValueError as e:
+        return _error(400, str(e))
+    summary = await sessions.asummary(thread_id) or {}
+    return JSONResponse({"thread_id": thread_id, "updates": updates, "rpc_calls": sum(calls.values()), **summary})
+
+async def _body(request):
+    try:
+        body = await request.json()
+    except ValueError:
+        return None
+    return body if isinstance(body, dict) else None
+
+async def start_payment(request):
+    body = await _body(request)
+    if not body or not isinstance(body.get("request"), str):
+        return _error(400, 'Expected {"request": "..."}')
+    thread_id = str(body.get("thread_id") or f"api_{uuid.uuid4().hex}")
+    return await _run(request, thread_id, sessions.astart_payment, body["request"])
+
+async def accept_escrow(request):
+    return await _run(request, request.path_params["thread_id"], sessions.aaccept_escrow)
+
+async def submit_sof(request):
+    body = await _body(request)
+    if not body or not isinstance(body.get("document"), str):
+        return _error(400, 'Expected {"document": "..."}')
+    return await _run(request, request.path_params["thread_id"], sessions.asubmit_sof, body["document"])
+
+async def refund(request):
+    return await _run(request, request.path_params["thread_id"], sessions.arefund)
+
+async def get_payment(request):
+    summary = await sessions.asummary(request.path_params["thread_id"])
+    if summary is None:
+        return _error(404, "Unknown thread")
+    # Wall time, tokens, RPC requests and gas (for the graph runs this process has seen)
+    summary["metrics"] = instrumentation.summary(summary["thread_id"])
+    return JSONResponse(summary)
+
+async def health(request):
+    return JSONResponse({
+        "pool": request.app.state.pool.stats(),
+        "node_latency": node_latency.summary(),
+        "rpc_calls": rpc_calls.summary(),
+    })
+
+async def prometheus_metrics(request):
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+def create_app(workers=SERVER_WORKERS, queue_size=SERVER_QUEUE_SIZE, watch=True):
+    @asynccontextmanager
+    async def lifespan(app):
+        if watch:
+            await asyncio.to_thread(sessions.start_watchers)
+            # Build the graph now rather than in the first request
+            await asyncio.to_thread(get_app_graph)
+        yield
+
+    app = Starlette(routes=[
+        Route("/payments", start_payment, methods=["POST"]),
+        Route("/payments/{thread_id}", get_payment, methods=["GET"]),
+        Route("/payments/{thread_id}/accept", accept_escrow, methods=["POST"]),
+        Route("/payments/{thread_id}/sof", submit_sof, methods=["POST"]),
+        Route("/payments/{thread_id}/refund", refund, methods=["POST"]),
+        Route("/health", health, methods=["GET"]),
+        Route("/metrics", prometheus_metrics, methods=["GET"]),
+    ], lifespan=lifespan)
+    app.state.pool = SessionPool(workers, queue_size)
+    return app
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS)
+    parser.add_argument("--queue-size", type=int, default=SERVER_QUEUE_SIZE)
+    args = parser.parse_args()
+    # One process: the pool and the per-thread locks are in-process
+    uvicorn.run(create_app(args.workers, args.queue_size), host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""Payment sessions on the graph, shared by the Streamlit UI and the API server.
+
+One payment is one graph thread (`thread_id`). The graph pauses after
+propose_escrow (waiting for the buyer to accept the escrow) and after
+execute_escrow (waiting for the Source of Funds proof); each operation below
+moves a thread to its next pause:
+
+    await astart_payment(thread_id, "I want a $1500 luxury watch")  # -> PENDING
+    await aaccept_escrow(thread_id)                                   # -> ESCROW_ACTIVE
+    await asubmit_sof(thread_id, document_text)                       # -> PASS
+    await arefund(thread_id)                                          # instead of the proof
+
+Operations return the node updates they produced; `asummary` reads a
+thread's current state. Operations on one thread must not overlap (the
+server serializes them per thread_id).
+"""
+import asyncio
+from langchain_core.messages import HumanMessage
+from src.config import ADDRS, COMPLIANCE_PK
+from src.graph import get_app_graph
+from src.blockchain.client import w3, get_contract
+from src.blockchain.confirmations import confirmation_tracker
+from src.blockchain.credentials import get_buyer_credentials, watch_registry
+from src.blockchain.indexer import watch_events
+from src.agents.ledger import get_onchain_ledger, aget_onchain_ledger
+
+# What the mock document check looks for (see mock_sof.txt)
+SOF_PROOF_MARKER = "Balance: $50,000"
+
+# Update fields that are JSON-friendly (messages are LangChain objects)
+_PUBLIC_FIELDS = ("compliance_status", "active_agent", "current_thought", "negotiation_log",
+                  "ledger", "transaction_id", "escrow_address")
+
+class SessionError(Exception):
+    """The operation doesn't apply to the thread in its current state."""
+
+def thread_config(thread_id, callbacks=None):
+    config = {"configurable": {"thread_id": thread_id}}
+    if callbacks:
+        config["callbacks"] = callbacks
+    return config
+
+def start_watchers():
+    """Registry and event watchers the sessions rely on (no-op without a chain)."""
+    if w3 and ADDRS:
+        watch_registry()
+        watch_events()
+
+def load_credentials():
+    """The buyer's on-chain credentials (cached; the registry watcher keeps them fresh)."""
+    if not (w3 and ADDRS):
+        return {"has_sanctions": False, "has_sof": False}
+    start_watchers()
+    return get_buyer_credentials(ADDRS["Buyer"])
+
+def initial_inputs(request_text, credentials, ledger=None, escrow_address=None):
+    inputs = {
+        "messages": [HumanMessage(content=request_text)],
+        "ledger": ledger if ledger is not None else get_onchain_ledger(),
+        "buyer_credentials": credentials,
+        # Reset other keys if needed
+        "buyer_intent": {},
+        "negotiation_log": []
+    }
+    if escrow_address:
+        # A SimpleEscrow deployed for this payment (buyer, seller, amount), used instead of a pooled clone
+        inputs["escrow_address"] = escrow_address
+    return inputs
+
+def verify_sof_document(content):
+    """Mock verification of the uploaded Source of Funds document."""
+    return SOF_PROOF_MARKER in content
+
+def sof_update(values):
+    """State update recording the verified SoF, applied as execute_escrow's output
+    (so the thread resumes into finalize_settlement with its ledger and status)."""
+    intent = dict(values.get("buyer_intent") or {})
+    intent["attached_vcs"] = {"sanctions": True, "sof": True}
+    return {
+        "buyer_intent": intent,
+        "ledger": values.get("ledger", {}),
+        "compliance_status": "ESCROW_ACTIVE",
+        "active_agent": "LEDGER",
+        "negotiation_log": ["Chain: Tx confirmed. Funds Locked. (SoF Verified)"]
+    }
+
+def refund_escrow(thread_id):
+    """Refunds the thread's escrow (its pooled clone, else the shared one); True if confirmed."""
+    values = get_app_graph().get_state(thread_config(thread_id)).values
+    escrow_addr = values.get("escrow_address") or ADDRS.get("SimpleEscrow")
+    if not escrow_addr:
+        raise SessionError("No escrow for this thread")
+    escrow = get_contract("SimpleEscrow", escrow_addr)
+    _, confirmation = confirmation_tracker.submit(escrow.functions.refund(), COMPLIANCE_PK)
+    return confirmation.result()["status"] == 1
+
+def public_update(node, update):
+    return {"node": node, **{k: update[k] for k in _PUBLIC_FIELDS if k in update}}
+
+# --- Async operations (API server) ---
+
+async def _arun(inputs, thread_id):
+    updates = []
+    async for event in get_app_graph().astream(inputs, thread_config(thread_id)):
+        for node, update in event.items():
+            # Skip non-dict updates (like interrupts)
+            if isinstance(update, dict):
+                updates.append(public_update(node, update))
+    return updates
+
+async def _astatus(thread_id):
+    snapshot = await get_app_graph().aget_state(thread_config(thread_id))
+    return snapshot.values.get("compliance_status"), snapshot
+
+async def astart_payment(thread_id, request_text, credentials=None, escrow_address=None):
+    status, _ = await _astatus(thread_id)
+    if status is not None:
+        raise SessionError(f"Thread already started ({status})")
+    if credentials is None:
+        credentials = await asyncio.to_thread(load_credentials)
+    inputs = initial_inputs(request_text, credentials, await aget_onchain_ledger(), escrow_address)
+    return await _arun(inputs, thread_id)
+
+async def aaccept_escrow(thread_id):
+    status, snapshot = await _astatus(thread_id)
+    if status != "PENDING" or not snapshot.next:
+        raise SessionError(f"No escrow proposal to accept ({status})")
+    return await _arun(None, thread_id)
+
+async def asubmit_sof(thread_id, content):
+    status, snapshot = await _astatus(thread_id)
+    if status != "ESCROW_ACTIVE":
+        raise SessionError(f"No active escrow ({status})")
+    if not verify_sof_document(content):
+        raise ValueError("Invalid document: funds not verified")
+    await get_app_graph().aupdate_state(thread_config(thread_id), sof_update(snapshot.values), as_node="execute_escrow")
+    return await _arun(None, thread_id)
+
+async def arefund(thread_id):
+    status, _ = await _astatus(thread_id)
+    if status != "ESCROW_ACTIVE":
+        raise SessionError(f"No active escrow ({status})")
+    confirmed = await asyncio.to_thread(refund_escrow, thread_id)
+    return [{"node": "refund", "confirmed": confirmed}]
+
+async def asummary(thread_id):
+    """Current state of a thread, or None if it was never started."""
+    status, snapshot = await _astatus(thread_id)
+    if status is None:
+        return None
+    values = snapshot.values
+    return {
+        "thread_id": thread_id,
+        "status": status,
+        "transaction_id": values.get("transaction_id"),
+        "escrow_address": values.get("escrow_address"),
+        "ledger": values.get("ledger"),
+        "next": list(snapshot.next),
+    }
@@ -13,3 +13,4 @@ class GraphState(TypedDict):
     ledger: dict            # {buyer_balance, seller_balance, escrow_balance}
     current_thought: str    # The "internal monologue" of the active agent
     transaction_id: str     # Hex string of current tx ID
+    escrow_address: str     # Escrow holding this thread's second tranche
@@ -0,0 +1,70 @@
+"""Coalescing LLM token streamer.
+
+Re-rendering the whole response on every token costs O(n^2) over a response
+and sends one websocket message per token. `CoalescingTokenStreamer` buffers
+tokens and renders at most once per `interval` seconds or `max_chars` of new
+text, plus a final render on `on_llm_end`. Subclasses draw:
+
+    class Streamer(CoalescingTokenStreamer):
+        def start(self, agent_name): ...          # new message box
+        def render(self, text, final): ...        # full text so far
+
+`renders` counts the render calls, for benchmarks and tests.
+"""
+import time
+from langchain_core.callbacks import BaseCallbackHandler
+from src.config import STREAM_FLUSH_INTERVAL, STREAM_FLUSH_CHARS
+
+class CoalescingTokenStreamer(BaseCallbackHandler):
+    def __init__(self, interval=STREAM_FLUSH_INTERVAL, max_chars=STREAM_FLUSH_CHARS, clock=time.monotonic):
+        self.interval = interval
+        self.max_chars = max_chars
+        self.clock = clock
+        self.agent_name = "Agent"
+        self.renders = 0
+        self._text = ""       # rendered so far
+        self._pending = []    # tokens since the last render
+        self._pending_chars = 0
+        self._last_flush = 0.0
+
+    @property
+    def text(self):
+        return self._text + "".join(self._pending)
+
+    def start(self, agent_name):
+        """A new response begins (e.g. open a message box)."""
+
+    def render(self, text, final):
+        """Draws the response so far; `final` once it is complete."""
+
+    def flush(self, final=False):
+        if self._pending:
+            self._text += "".join(self._pending)
+            self._pending.clear()
+            self._pending_chars = 0
+        self._last_flush = self.clock()
+        self.renders += 1
+        self.render(self._text, final)
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self._text, self._pending, self._pending_chars = "", [], 0
+        # LangChain adds internal tags like 'seq:step:X', so find ours specifically
+        tags = kwargs.get("tags") or []
+        self.agent_name = next((t for t in tags if "Agent" in t), "Agent")
+        self.start(self.agent_name)
+        self._last_flush = self.clock()
+
+    def on_llm_new_token(self, token, **kwargs):
+        self._pending.append(token)
+        self._pending_chars += len(token)
+        if self._pending_chars >= self.max_chars or self.clock() - self._last_flush >= self.interval:
+            self.flush()
+
+    def on_llm_end(self, response, **kwargs):
+        # Cached responses arrive whole, without on_llm_new_token
+        if not self._text and not self._pending and response.generations and response.generations[0]:
+            self._pending.append(response.generations[0][0].text)
+        self.flush(final=True)
+
+    def on_llm_error(self, error, **kwargs):
+        self.flush(final=True)
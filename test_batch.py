@@ -0,0 +1,137 @@
+from concurrent.futures import Future
+
+import pytest
+from web3 import Web3
+
+import src.batch as batch
+from src.batch import request_amount, settle_batch
+from src.config import BUYER_PK, CHAIN_ID
+
+WRAPPER = "0x" + "11" * 20
+
+def test_request_amount():
+    assert request_amount({"amount": "25"}) == 25.0
+    assert request_amount({"title": "Pen", "body": "I want a $150 pen"}) == 150.0
+    assert request_amount({"body": "no number here"}) is None
+
+class FakeWrapper:
+    """payWithAuthorization built and encoded offline."""
+
+    def __init__(self):
+        self.functions = self
+
+    def payWithAuthorization(self, *args):
+        return self
+
+    def build_transaction(self, params):
+        return {"to": WRAPPER, "gas": params["gas"], "gasPrice": 10**9, "chainId": CHAIN_ID, "value": 0,
+                "data": "0x", "from": params["from"]}
+
+    def encode_abi(self, name, args):
+        return "0x" + args[5].hex()  # the authorization nonce keeps the transactions apart
+
+class FakeNode:
+    """A node answering eth_sendRawTransaction batches with a scripted error per transaction."""
+
+    def __init__(self, errors=()):
+        self.errors = dict(errors)  # transaction index -> error message
+        self.sent = []
+        self.provider = self
+        self.eth = self
+
+    def make_batch_request(self, requests):
+        responses = []
+        for _, (raw,) in requests:
+            index = len(self.sent)
+            self.sent.append(raw)
+            error = self.errors.get(index)
+            responses.append({"jsonrpc": "2.0", "id": index, **({"error": {"code": -32000, "message": error}}
+                                                                 if error else {"result": Web3.keccak(hexstr=raw).to_0x_hex()})})
+        return responses
+
+class FakeTracker:
+    def __init__(self, mined=None):
+        self.mined = mined  # tx hashes that get a receipt (all if None)
+        self.tracked = []
+
+    def track(self, tx_hash, timeout=None):
+        self.tracked.append(tx_hash)
+        future = Future()
+        if self.mined is None or tx_hash in self.mined:
+            future.set_result({"transactionHash": tx_hash, "blockNumber": 1, "gasUsed": 90000, "status": 1, "logs": []})
+        else:
+            future.set_exception(TimeoutError())
+        return future
+
+class FakeNonces:
+    def __init__(self):
+        self.released = []
+
+    def reserve(self, address, count=1):
+        return 0
+
+    def release(self, address, count=1, failed=False):
+        self.released.append((count, failed))
+
+class FakeSigner:
+    def sign_many(self, items):
+        return [{"from": "0x" + "33" * 20, "value": item["value"], "validAfter": 0, "validBefore": 2**40,
+                 "nonce": i.to_bytes(32, "big"), "v": 27, "r": bytes(32), "s": bytes(32)} for i, item in enumerate(items)]
+
+@pytest.fixture
+def settle(monkeypatch):
+    nonces = FakeNonces()
+    monkeypatch.setattr(batch, "is_connected", lambda: True)
+    monkeypatch.setattr(batch, "ADDRS", {"PolicyWrapper": WRAPPER, "Seller": "0x" + "44" * 20, "DemoSGD": "0x" + "55" * 20})
+    monkeypatch.setattr(batch, "get_contract", lambda name: FakeWrapper())
+    monkeypatch.setattr(batch, "dry_run", lambda payments: None)
+    monkeypatch.setattr(batch, "get_transfer_signer", lambda *args: FakeSigner())
+    monkeypatch.setattr(batch, "nonce_manager", nonces)
+    monkeypatch.setattr(batch, "index_receipts", lambda receipts: [
+        [{"event": "TransactionAttested", "status": 0, "transaction_id": "ab" * 32}] for _ in receipts])
+
+    def run(node, tracker, requests, **kwargs):
+        monkeypatch.setattr(batch, "w3", node)
+        monkeypatch.setattr(batch, "confirmation_tracker", tracker)
+        return settle_batch(requests, **kwargs), nonces
+    return run
+
+REQUESTS = [{"request_id": f"r{i}", "amount": 10 + i} for i in range(4)]
+
+def test_settle_batch_success(settle):
+    node, tracker = FakeNode(), FakeTracker()
+    results, nonces = settle(node, tracker, REQUESTS + [{"request_id": "none", "body": "no amount"}], chunk_size=2)
+    assert [r["status"] for r in results] == ["PASS"] * 4 + ["SKIPPED"]
+    # Each hash is the keccak of the raw transaction sent
+    assert [r["tx_hash"] for r in results[:4]] == [Web3.keccak(hexstr=raw).hex() for raw in node.sent]
+    assert nonces.released == [(4, False)]
+
+def test_settle_batch_partial_failure(settle):
+    # 0 was already in the node's pool (a resend), 1 is rejected
+    node = FakeNode({0: "already known", 1: "insufficient funds for gas * price + value"})
+    tracker = FakeTracker()
+    results, nonces = settle(node, tracker, REQUESTS + REQUESTS[:1], chunk_size=3)
+    assert [r["status"] for r in results] == ["PASS", "NOT_SUBMITTED", "PASS", "PASS", "PASS"]
+    assert results[1]["error"].startswith("insufficient funds")
+    assert results[1]["tx_hash"] == Web3.keccak(hexstr=node.sent[1]).hex()
+    # 2 was queued behind nonce 1: a filler takes that nonce, so 2 is mined as sent
+    assert len(node.sent) == 6
+    assert Web3.keccak(hexstr=node.sent[2]) in tracker.tracked
+    assert nonces.released == [(5, False)]
+
+def test_settle_batch_unfillable_gap(settle):
+    # 1 is rejected, then so is the filler for its nonce (sent 4th)
+    node = FakeNode({1: "insufficient funds for gas * price + value", 3: "insufficient funds for gas * price + value"})
+    results, nonces = settle(node, FakeTracker(), REQUESTS, chunk_size=3)
+    # 2 can't be mined behind the gap: reported now, not after the receipt timeout
+    assert [r["status"] for r in results] == ["PASS", "NOT_SUBMITTED", "UNCONFIRMED", "NOT_SUBMITTED"]
+    assert "nonce 1" in results[2]["error"]
+    assert len(node.sent) == 4  # nothing after the gap
+    assert nonces.released == [(4, True)]
+
+def test_settle_batch_timeout(settle):
+    node = FakeNode()
+    tracker = FakeTracker(mined=set())
+    results, _ = settle(node, tracker, REQUESTS[:2], receipt_timeout=0)
+    assert [r["status"] for r in results] == ["UNCONFIRMED"] * 2
+    assert all(r["tx_hash"] for r in results)
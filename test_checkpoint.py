@@ -0,0 +1,61 @@
+import operator
+import time
+from typing import Annotated, List, TypedDict
+
+from langgraph.graph import StateGraph, END
+
+from src.checkpoint import SQLiteCheckpointer
+
+class State(TypedDict):
+    log: Annotated[List[str], operator.add]
+    note: str
+
+def build(checkpointer):
+    graph = StateGraph(State)
+    graph.add_node("propose", lambda s: {"log": ["proposed"]})
+    graph.add_node("settle", lambda s: {"log": ["settled"], "note": "x" * 2000})
+    graph.set_entry_point("propose")
+    graph.add_edge("propose", "settle")
+    graph.add_edge("settle", END)
+    return graph.compile(checkpointer=checkpointer, interrupt_after=["propose"])
+
+def test_another_worker_resumes_a_paused_thread(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite")
+    config = {"configurable": {"thread_id": "escrow-1"}}
+
+    worker_a = SQLiteCheckpointer(path)
+    build(worker_a).invoke({"log": ["start"]}, config)
+    assert build(worker_a).get_state(config).next == ("settle",)
+    worker_a.close()
+
+    worker_b = SQLiteCheckpointer(path)
+    graph = build(worker_b)
+    assert graph.get_state(config).next == ("settle",)
+    result = graph.invoke(None, config)
+    assert result["log"] == ["start", "proposed", "settled"]
+    assert result["note"] == "x" * 2000  # compressed on disk, same value back
+    assert worker_b.stats() == {"active_threads": 0, "finished_threads": 1}
+
+def test_ttl_prunes_finished_then_idle_threads(tmp_path):
+    saver = SQLiteCheckpointer(str(tmp_path / "checkpoints.sqlite"), ttl=60, idle_ttl=3600)
+    graph = build(saver)
+    graph.invoke({"log": []}, {"configurable": {"thread_id": "done"}})
+    graph.invoke(None, {"configurable": {"thread_id": "done"}})
+    graph.invoke({"log": []}, {"configurable": {"thread_id": "paused"}})
+
+    assert saver.prune_expired(now=time.time() + 120) == 1
+    assert graph.get_state({"configurable": {"thread_id": "done"}}).values == {}
+    assert graph.get_state({"configurable": {"thread_id": "paused"}}).next == ("settle",)
+
+    assert saver.prune_expired(now=time.time() + 7200) == 1
+    assert saver.stats() == {"active_threads": 0, "finished_threads": 0}
+
+def test_keep_latest_keeps_the_state(tmp_path):
+    saver = SQLiteCheckpointer(str(tmp_path / "checkpoints.sqlite"))
+    graph = build(saver)
+    config = {"configurable": {"thread_id": "t"}}
+    graph.invoke({"log": ["start"]}, config)
+
+    saver.prune(["t"])
+    assert len(list(saver.list(config))) == 1
+    assert graph.invoke(None, config)["log"] == ["start", "proposed", "settled"]
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+from hexbytes import HexBytes
+
+import src.blockchain.confirmations as confirmations
+from src.blockchain.confirmations import ConfirmationTracker
+
+class FakeChain:
+    """Just enough of `w3.eth` for the tracker; counts receipt lookups."""
+
+    def __init__(self):
+        self.blocks = [[]]
+        self.receipt_calls = 0
+        self.eth = self
+
+    @property
+    def block_number(self):
+        return len(self.blocks) - 1
+
+    def mine(self, *tx_hashes):
+        self.blocks.append([HexBytes(h) for h in tx_hashes])
+
+    def get_block(self, number):
+        return {"number": number, "transactions": self.blocks[number]}
+
+    def get_transaction_receipt(self, tx_hash):
+        self.receipt_calls += 1
+        for number, hashes in enumerate(self.blocks):
+            if HexBytes(tx_hash) in hashes:
+                return {"transactionHash": HexBytes(tx_hash), "blockNumber": number, "status": 1}
+        raise LookupError("not found")
+
+    def batch_requests(self):
+        raise NotImplementedError
+
+@pytest.fixture
+def chain(monkeypatch):
+    chain = FakeChain()
+    monkeypatch.setattr(confirmations, "w3", chain)
+    return chain
+
+def test_receipts_resolve_when_their_block_lands(chain):
+    tracker = ConfirmationTracker(poll_interval=60)  # drive the polls by hand
+    a, b = tracker.track("0x" + "aa" * 32), tracker.track("0x" + "bb" * 32)
+    tracker.poll()  # first look: neither is mined
+    assert not a.done() and not b.done()
+
+    chain.mine("0x" + "aa" * 32)
+    chain.mine("0x" + "cc" * 32)  # someone else's transaction
+    calls = chain.receipt_calls
+    tracker.poll()
+    assert a.result(timeout=0)["blockNumber"] == 1
+    assert not b.done()
+    assert chain.receipt_calls == calls + 1  # only the tracked hash found in the new blocks
+
+def test_wait_all_and_async(chain):
+    hashes = ["0x" + "01" * 32, "0x" + "02" * 32]
+    chain.mine(*hashes)
+    tracker = ConfirmationTracker(poll_interval=0.01)
+    assert [r["blockNumber"] for r in tracker.wait_all(hashes, timeout=5)] == [1, 1]
+    receipt = asyncio.run(tracker.wait_async(hashes[0], timeout=5))
+    assert receipt["status"] == 1
+
+def test_unmined_transactions_time_out(chain):
+    tracker = ConfirmationTracker(poll_interval=0.01)
+    with pytest.raises(TimeoutError):
+        tracker.track("0x" + "dd" * 32, timeout=0.05).result(timeout=5)
+    assert tracker.pending() == 0
@@ -0,0 +1,98 @@
+import json
+import os
+
+from eth_utils import keccak
+from web3 import Web3
+
+from src.blockchain.contracts import ContractRegistry, StaleArtifact, dispatches
+
+EVENT_ABI = [
+    {"type": "function", "name": "refund", "inputs": [], "outputs": [], "stateMutability": "nonpayable"},
+    {"type": "event", "name": "Refunded", "anonymous": False,
+     "inputs": [{"name": "amount", "type": "uint256", "indexed": False, "internalType": "uint256"}]},
+]
+
+def _write(directory, name, abi):
+    os.makedirs(directory / f"{name}.sol", exist_ok=True)
+    path = directory / f"{name}.sol" / f"{name}.json"
+    path.write_text(json.dumps({"abi": abi}))
+    return path
+
+def test_selectors_topics_and_contracts_are_built_once(tmp_path):
+    _write(tmp_path, "SimpleEscrow", EVENT_ABI)
+    registry = ContractRegistry(str(tmp_path))
+    w3 = Web3()
+    address = "0x" + "11" * 20
+
+    assert registry.selector("SimpleEscrow", "refund") == keccak(text="refund()")[:4]
+    assert registry.selector("SimpleEscrow", "refund()") == keccak(text="refund()")[:4]
+    topic = registry.topic("SimpleEscrow", "Refunded")
+    assert topic == keccak(text="Refunded(uint256)")
+    assert registry.event_topics("SimpleEscrow") == {topic: "Refunded"}
+
+    contract = registry.contract("SimpleEscrow", address, w3)
+    assert registry.contract("SimpleEscrow", address.upper().replace("0X", "0x"), w3) is contract
+    assert registry.contract("SimpleEscrow", "0x" + "22" * 20, w3) is not contract
+
+def test_artifact_is_reloaded_when_rebuilt(tmp_path):
+    path = _write(tmp_path, "SimpleEscrow", EVENT_ABI)
+    registry = ContractRegistry(str(tmp_path))
+    w3 = Web3()
+    contract = registry.contract("SimpleEscrow", None, w3)
+    assert not registry.has_function("SimpleEscrow", "release")
+
+    release = {"type": "function", "name": "release", "inputs": [], "outputs": [], "stateMutability": "nonpayable"}
+    _write(tmp_path, "SimpleEscrow", EVENT_ABI + [release])
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    assert registry.has_function("SimpleEscrow", "release")
+    assert registry.contract("SimpleEscrow", None, w3) is not contract
+
+def test_deployed_names_map_to_artifacts():
+    registry = ContractRegistry()
+    assert registry.has_function("PolicyWrapper", "payWithAuthorization")
+    assert registry.topic("PolicyWrapper", "TransactionAttested") == keccak(text="TransactionAttested(bytes32,uint8)")
+
+def test_bytecode_must_dispatch_every_abi_function(tmp_path):
+    path = _write(tmp_path, "SimpleEscrow", EVENT_ABI)
+    registry = ContractRegistry(str(tmp_path))
+    refund = keccak(text="refund()")[:4]
+    # PUSH4 <selector> EQ: how solc's dispatcher compares calldata
+    runtime = b"\x63" + refund + b"\x14"
+
+    build = {"abi": EVENT_ABI, "bytecode": {"object": "0x6080"}, "deployedBytecode": {"object": "0x" + runtime.hex()}}
+    path.write_text(json.dumps(build))
+    assert registry.bytecode("SimpleEscrow") == "0x6080"
+
+    # An ABI newer than the build (e.g. edited without `forge build`)
+    release = {"type": "function", "name": "release", "inputs": [], "outputs": [], "stateMutability": "nonpayable"}
+    path.write_text(json.dumps({**build, "abi": EVENT_ABI + [release]}))
+    registry.clear()
+    try:
+        registry.bytecode("SimpleEscrow")
+        raise AssertionError("stale bytecode accepted")
+    except StaleArtifact as e:
+        assert "release()" in str(e)
+
+    # Selectors with a leading zero byte are pushed with PUSH3
+    assert dispatches(b"\x62\xab\xcd\xef", b"\x00\xab\xcd\xef")
+
+def test_stale_sources_compares_the_metadata_hashes(tmp_path):
+    artifacts = tmp_path / "out"
+    path = _write(artifacts, "SimpleEscrow", EVENT_ABI)
+    source = tmp_path / "SimpleEscrow.sol"
+    source.write_text("contract SimpleEscrow {}")
+    built = {"sources": {"SimpleEscrow.sol": {"keccak256": "0x" + keccak(source.read_bytes()).hex()}}}
+    path.write_text(json.dumps({"abi": EVENT_ABI, "metadata": built}))
+    registry = ContractRegistry(str(artifacts))
+    assert registry.stale_sources("SimpleEscrow") == []
+
+    source.write_text("contract SimpleEscrow { function release() external {} }")
+    assert registry.stale_sources("SimpleEscrow") == ["SimpleEscrow.sol"]
+
+    try:
+        registry.bytecode("SimpleEscrowFactory")
+        raise AssertionError("missing artifact accepted")
+    except StaleArtifact as e:
+        assert "forge build" in str(e)
@@ -0,0 +1,134 @@
+from src.blockchain.credentials import CredentialCache, SOURCE_OF_FUNDS, SANCTIONS_CHECK
+
+class FakeRegistry:
+    """Stands in for the IdentityRegistry contract and counts RPC reads."""
+    address = "0xe7f1725E7734CE288F8367e1Bb143E90bb3F0512"
+
+    def __init__(self):
+        self.calls = 0
+        self.sof = {}
+        self.functions = self
+
+    def hasSourceOfFunds(self, wallet):
+        return self._read(lambda: self.sof.get(wallet, False))
+
+    def hasSanctionsCheck(self, wallet):
+        return self._read(lambda: True)
+
+    def _read(self, value):
+        registry = self
+
+        class Call:
+            def call(self, block_identifier="latest"):
+                registry.calls += 1
+                return value()
+        return Call()
+
+BUYER = "0x70997970C51812dc3A010C7d01b50e0d17dc79C8"
+
+def test_hits_skip_the_rpc():
+    registry, cache = FakeRegistry(), CredentialCache(maxsize=8, ttl=60)
+    assert cache.get(registry, BUYER, SOURCE_OF_FUNDS) is False
+    assert cache.get(registry, BUYER, SOURCE_OF_FUNDS) is False
+    assert registry.calls == 1
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+def test_invalidate_after_write():
+    registry, cache = FakeRegistry(), CredentialCache(maxsize=8, ttl=60)
+    cache.get(registry, BUYER, SOURCE_OF_FUNDS)
+    cache.get(registry, BUYER, SANCTIONS_CHECK)
+    registry.sof[BUYER] = True
+    cache.invalidate(registry.address, BUYER, SOURCE_OF_FUNDS)
+    assert cache.get(registry, BUYER, SOURCE_OF_FUNDS) is True
+    assert cache.get(registry, BUYER, SANCTIONS_CHECK) is True
+    assert registry.calls == 3
+
+def test_ttl_and_pinned_blocks():
+    registry, cache = FakeRegistry(), CredentialCache(maxsize=8, ttl=0)
+    cache.get(registry, BUYER, SOURCE_OF_FUNDS)
+    cache.get(registry, BUYER, SOURCE_OF_FUNDS)
+    assert registry.calls == 2
+    cache.get(registry, BUYER, SOURCE_OF_FUNDS, block_identifier=12)
+    cache.get(registry, BUYER, SOURCE_OF_FUNDS, block_identifier=12)
+    assert registry.calls == 3
+
+def test_lru_eviction():
+    registry, cache = FakeRegistry(), CredentialCache(maxsize=2, ttl=60)
+    for block in (1, 2, 1, 3):
+        cache.get(registry, BUYER, SOURCE_OF_FUNDS, block_identifier=block)
+    assert cache.stats()["evictions"] == 1
+    cache.get(registry, BUYER, SOURCE_OF_FUNDS, block_identifier=1)
+    assert registry.calls == 3
+
+def test_read_in_flight_during_invalidate_isnt_stored():
+    registry, cache = FakeRegistry(), CredentialCache(maxsize=8, ttl=60)
+
+    def write_during_read():
+        # The registry is written and invalidated after this read has started
+        registry.sof[BUYER] = True
+        cache.invalidate(registry.address, BUYER)
+        return False
+    registry.hasSourceOfFunds = lambda wallet: registry._read(write_during_read)
+    assert cache.get(registry, BUYER, SOURCE_OF_FUNDS) is False
+
+    del registry.hasSourceOfFunds
+    assert cache.get(registry, BUYER, SOURCE_OF_FUNDS) is True
+    assert registry.calls == 2
+
+def test_watcher_follows_registry_events(monkeypatch):
+    from eth_abi import encode
+    from eth_account import Account
+    from web3 import Web3
+    import src.blockchain.credentials as credentials
+    from src.blockchain.abis import REGISTRY_ABI
+    from test_indexer import FakeChain, _address_topic, _topic
+
+    # The registry's write events, whether or not out/ was built with them
+    events = [{"type": "event", "name": name, "anonymous": False, "inputs": [
+        {"name": "wallet", "type": "address", "indexed": True}, {"name": "ref", "type": "bytes32", "indexed": False}]}
+        for name in ("SourceOfFundsSet", "SanctionsCheckSet")]
+    abi = [e for e in REGISTRY_ABI if e.get("type") != "event"] + events
+    registry = Web3().eth.contract(address=FakeRegistry.address, abi=abi)
+    chain, cache, seen = FakeChain(), CredentialCache(maxsize=8, ttl=60), []
+    monkeypatch.setattr(credentials, "w3", chain)
+    monkeypatch.setattr(credentials, "registry_listeners", [lambda *args: seen.append(args)])
+    watcher = credentials.RegistryWatcher(cache, registry)
+    watcher.poll()
+
+    reads = FakeRegistry()  # same address
+    cache.get(reads, BUYER, SOURCE_OF_FUNDS)
+    chain.emit(registry.address, [_topic(events, "SourceOfFundsSet"), _address_topic(BUYER)], encode(["bytes32"], [b"\x01" * 32]))
+    watcher.poll()
+    assert chain.get_logs_calls == 1
+    assert seen == [(BUYER, SOURCE_OF_FUNDS, True)]
+    cache.get(reads, BUYER, SOURCE_OF_FUNDS)
+    assert reads.calls == 2
+
+def test_watcher_on_chain(monkeypatch):
+    """The watcher against a deployed registry: logs when out/ has the events, else the block scan."""
+    from eth_account import Account
+    from web3 import Web3
+    import src.blockchain.credentials as credentials
+    from benchmarks.evm import InProcessChain
+    from src.blockchain.contracts import contracts
+    from src.config import COMPLIANCE_PK
+
+    chain = InProcessChain()
+    chain.fund(Account.from_key(COMPLIANCE_PK).address)
+    registry = chain.deploy("IdentityRegistry")
+    cache, seen = CredentialCache(maxsize=8, ttl=60), []
+    monkeypatch.setattr(credentials, "w3", chain.w3)
+    monkeypatch.setattr(credentials, "registry_listeners", [lambda *args: seen.append(args)])
+    watcher = credentials.RegistryWatcher(cache, registry)
+    if not contracts.stale_sources("IdentityRegistry"):
+        # Built from the current sources: the events are there and the logs are what's read
+        assert set(watcher._topics.values()) == {"SourceOfFundsSet", "SanctionsCheckSet"}
+        monkeypatch.setattr(chain.w3.eth, "get_block", None)
+    watcher.poll()
+
+    assert cache.get(registry, BUYER, SOURCE_OF_FUNDS) is False
+    chain.transact(registry.functions.setSourceOfFunds(BUYER, Web3.keccak(text="SOF")), COMPLIANCE_PK)
+    watcher.poll()
+    assert seen == [(BUYER, SOURCE_OF_FUNDS, True)]
+    assert cache.get(registry, BUYER, SOURCE_OF_FUNDS) is True
+    assert cache.stats()["misses"] == 2
@@ -0,0 +1,133 @@
+import asyncio
+import itertools
+from concurrent.futures import Future
+
+import pytest
+
+import src.blockchain.escrow_pool as escrow_pool
+from src.blockchain.escrow_pool import EscrowPool
+from src.config import COMPLIANCE_PK
+
+class FakeFactory:
+    """createEscrows(count, admin) -> receipt whose EscrowCreated events name new addresses."""
+
+    def __init__(self):
+        self.batches = []
+        self._addresses = (f"0x{i:040x}" for i in itertools.count(1))
+        self.functions = self
+        self.events = self
+
+    def createEscrows(self, count, admin):
+        return count
+
+    def EscrowCreated(self):
+        return self
+
+    def process_receipt(self, receipt, errors=None):
+        return [{"args": {"escrow": escrow}} for escrow in receipt["escrows"]]
+
+    def mine(self, count):
+        escrows = [next(self._addresses) for _ in range(count)]
+        self.batches.append(escrows)
+        future = Future()
+        future.set_result({"status": 1, "escrows": escrows})
+        return None, future
+
+@pytest.fixture
+def factory(monkeypatch):
+    factory = FakeFactory()
+
+    class Tracker:
+        def submit(self, count, private_key, tx_params=None):
+            return factory.mine(count)
+
+    monkeypatch.setattr(escrow_pool, "confirmation_tracker", Tracker())
+    return factory
+
+def test_acquire_hands_out_warm_escrows_and_refills(factory):
+    pool = EscrowPool(factory, COMPLIANCE_PK, target_size=4, batch=3)
+    pool.refill(force=True)
+    pool.wait_refill(5)
+    assert [len(batch) for batch in factory.batches] == [3, 1]
+    assert pool.available() == 4
+
+    first = pool.acquire()
+    assert first == factory.batches[0][0]
+    assert len(factory.batches) == 2  # 3 left, above the low-water mark: no refill
+    pool.acquire()
+    pool.acquire()  # 1 left: tops up in the background
+    pool.wait_refill(5)
+    assert pool.available() == 4
+    assert pool.stats() == {"available": 4, "handed_out": 3, "misses": 0, "created": 7}
+    assert len({first, *sum(factory.batches, [])}) == 7  # never handed out twice
+
+def test_empty_pool_deploys_on_the_spot(factory):
+    pool = EscrowPool(factory, COMPLIANCE_PK, target_size=2, batch=2)
+    escrow = asyncio.run(pool.aacquire())
+    assert escrow == factory.batches[0][0]
+    assert pool.stats()["misses"] == 1
+    pool.wait_refill(5)
+    assert pool.available() == 2
+
+def test_factory_clones_on_chain(monkeypatch):
+    """The pool over a real SimpleEscrowFactory: clones are minimal proxies that open, fund and release."""
+    from benchmarks.evm import InProcessChain
+    from src.blockchain.contracts import contracts
+    from src.blockchain.utils import TransferAuthorizationSigner
+    from src.config import BUYER_PK
+
+    chain = InProcessChain()
+    addresses = chain.deploy_demo_suite()
+    if "SimpleEscrowFactory" not in addresses or chain.stale_sources():
+        pytest.skip("needs out/ built from the current sources (python update_abis.py)")
+
+    class Tracker:
+        def submit(self, call, private_key, tx_params=None):
+            future = Future()
+            future.set_result(chain.transact(call, private_key))
+            return None, future
+
+    monkeypatch.setattr(escrow_pool, "confirmation_tracker", Tracker())
+    factory = chain.w3.eth.contract(address=addresses["SimpleEscrowFactory"], abi=contracts.abi("SimpleEscrowFactory"))
+    pool = EscrowPool(factory, COMPLIANCE_PK, target_size=2, batch=2)
+    pool.refill(force=True)
+    pool.wait_refill(30)
+    first, second = pool.acquire(), pool.acquire()
+    assert first != second
+
+    # EIP-1167: 45 bytes delegating to the implementation
+    implementation = factory.functions.implementation().call()
+    code = bytes(chain.w3.eth.get_code(first))
+    assert code == bytes.fromhex("363d3d373d3d3d363d73") + bytes.fromhex(implementation[2:]) + bytes.fromhex("5af43d82803e903d91602b57fd5bf3")
+
+    escrow = chain.w3.eth.contract(address=first, abi=contracts.abi("SimpleEscrow"))
+    buyer, seller, token = addresses["Buyer"], addresses["Seller"], addresses["DemoSGD"]
+    assert escrow.functions.admin().call() == pool.admin
+    amount = 1200 * 10**6
+    chain.transact(escrow.functions.open(buyer, seller, amount, 2**40), COMPLIANCE_PK)
+    auth = TransferAuthorizationSigner(token, BUYER_PK, chain.chain_id).sign(first, amount)
+    chain.transact(escrow.functions.fundWithAuthorization(
+        auth["validAfter"], auth["validBefore"], auth["nonce"], auth["v"], auth["r"], auth["s"]
+    ), COMPLIANCE_PK)
+    sgd = chain.w3.eth.contract(address=token, abi=contracts.abi("DemoSGD"))
+    before = sgd.functions.balanceOf(seller).call()
+    chain.transact(escrow.functions.release(), COMPLIANCE_PK)
+    assert sgd.functions.balanceOf(seller).call() == before + amount
+
+    # Clones don't share storage
+    other = chain.w3.eth.contract(address=second, abi=contracts.abi("SimpleEscrow"))
+    assert other.functions.buyer().call() == "0x" + "00" * 20
+    with pytest.raises(Exception, match="Already initialized"):
+        chain.transact(other.functions.initialize(token, buyer), COMPLIANCE_PK)
+
+def test_preassigned_escrow_skips_the_pool(monkeypatch):
+    """A session started with its own SimpleEscrow uses it, not a clone or the shared one."""
+    import src.agents.compliance as compliance
+
+    def no_pool():
+        raise AssertionError("pool consulted")
+
+    monkeypatch.setattr(compliance, "get_escrow_pool", no_pool)
+    own = "0x" + "ab" * 20
+    assert compliance._acquire_escrow({"escrow_address": own}) == (own, False)
+    assert asyncio.run(compliance._aacquire_escrow({"escrow_address": own})) == (own, False)
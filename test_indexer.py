@@ -0,0 +1,112 @@
+import pytest
+from eth_abi import encode
+from eth_utils import event_abi_to_log_topic
+from hexbytes import HexBytes
+from web3 import Web3
+
+import src.blockchain.indexer as indexer
+from src.blockchain.abis import WRAPPER_ABI, ESCROW_ABI
+from src.blockchain.indexer import EventIndexer, EventStore
+
+WRAPPER = "0x" + "11" * 20
+ESCROW = "0x" + "22" * 20
+BUYER = "0x" + "33" * 20
+SELLER = "0x" + "44" * 20
+TX_ID = "ab" * 32
+
+def _topic(abi, name):
+    return HexBytes(event_abi_to_log_topic(next(e for e in abi if e.get("name") == name)))
+
+def _address_topic(address):
+    return HexBytes(bytes(12) + HexBytes(address))
+
+class FakeChain:
+    """Just enough of `w3.eth` for the indexer; logs are built by hand."""
+
+    def __init__(self):
+        self.logs = []
+        self.head = 0
+        self.get_logs_calls = 0
+        self.eth = self
+
+    @property
+    def block_number(self):
+        return self.head
+
+    def emit(self, address, topics, data=b""):
+        self.head += 1
+        log = {
+            "address": Web3.to_checksum_address(address), "topics": topics, "data": HexBytes(data),
+            "blockNumber": self.head, "logIndex": 0, "transactionIndex": 0,
+            "transactionHash": HexBytes(self.head.to_bytes(32, "big")), "blockHash": HexBytes(bytes(32)),
+        }
+        self.logs.append(log)
+        return log
+
+    def attested(self, status):
+        return self.emit(WRAPPER, [_topic(WRAPPER_ABI, "TransactionAttested"), HexBytes(TX_ID)], encode(["uint8"], [status]))
+
+    def completed(self, amount):
+        return self.emit(WRAPPER, [_topic(WRAPPER_ABI, "TransactionCompleted"), HexBytes(TX_ID),
+                                   _address_topic(BUYER), _address_topic(SELLER)], encode(["uint256"], [amount]))
+
+    def escrow(self, name, account, amount):
+        return self.emit(ESCROW, [_topic(ESCROW_ABI, name)], encode(["address", "uint256"], [account, amount]))
+
+    def get_logs(self, params):
+        self.get_logs_calls += 1
+        return [log for log in self.logs if params["fromBlock"] <= log["blockNumber"] <= params["toBlock"]]
+
+@pytest.fixture
+def chain(monkeypatch):
+    chain = FakeChain()
+    monkeypatch.setattr(indexer, "w3", chain)
+    return chain
+
+@pytest.fixture
+def event_indexer(tmp_path):
+    wrapper = Web3().eth.contract(address=Web3.to_checksum_address(WRAPPER), abi=WRAPPER_ABI)
+    # Escrow events are taken from any address (pooled clones)
+    escrow = Web3().eth.contract(abi=ESCROW_ABI)
+    return EventIndexer(EventStore(str(tmp_path / "events.sqlite")), [wrapper], [escrow], block_range=2)
+
+def test_poll_indexes_attestations_and_escrow(chain, event_indexer):
+    chain.attested(2)  # PENDING
+    chain.escrow("Funded", BUYER, 1200)
+    chain.attested(0)  # resolved: PASS
+    chain.completed(300)
+    chain.escrow("Released", SELLER, 1200)
+    event_indexer.poll()
+    assert chain.get_logs_calls == 3  # 5 blocks, 2 per request
+
+    store = event_indexer.store
+    attestation = store.attestation(TX_ID)
+    assert attestation["status"] == "PASS" and attestation["completed"]
+    assert attestation["block_number"] == 3
+    assert store.attestation("cd" * 32) is None
+    assert store.escrow_state(ESCROW) == {"funded": 1200, "released": 1200, "refunded": 0, "balance": 0}
+    assert [e["event"] for e in store.history(account=BUYER)] == ["TransactionCompleted", "Funded"]
+
+    # Nothing new: no further requests
+    event_indexer.poll()
+    assert chain.get_logs_calls == 3
+
+def test_receipts_are_indexed_once(chain, event_indexer):
+    log = chain.attested(1)
+    other = dict(log, address=Web3.to_checksum_address("0x" + "55" * 20))  # someone else's event
+    rows = event_indexer.index_receipts([{"logs": [log, other]}])
+    assert [row["status"] for row in rows[0]] == [1]
+    assert event_indexer.store.attestation(TX_ID)["status"] == "FAIL"
+
+    event_indexer.poll()  # the same log again from eth_getLogs
+    assert len(event_indexer.store.history()) == 1
+
+def test_chain_reset_reindexes(chain, event_indexer):
+    chain.attested(0)
+    chain.attested(0)
+    event_indexer.poll()
+    chain.logs, chain.head = [], 0  # node restarted, contracts redeployed at the same addresses
+    chain.attested(2)
+    event_indexer.poll()
+    assert event_indexer.store.attestation(TX_ID)["status"] == "PENDING"
+    assert len(event_indexer.store.history()) == 1
@@ -0,0 +1,66 @@
+import json
+import threading
+from concurrent.futures import Future
+
+from langchain_core.language_models import FakeListChatModel
+
+from src.agents import tools
+from src.metrics import EventLog, Instrumentation, MetricsRegistry, gas_used
+
+def test_registry_renders_prometheus_text():
+    registry = MetricsRegistry()
+    calls = registry.counter("demo_calls_total", "Calls", ["method"])
+    latency = registry.histogram("demo_seconds", "Latency", ["method"], buckets=(0.1, 1))
+    calls.inc(method="eth_call")
+    calls.inc(2, method="eth_call")
+    latency.observe(0.5, method="eth_call")
+
+    lines = registry.render().splitlines()
+    assert "# TYPE demo_calls_total counter" in lines
+    assert 'demo_calls_total{method="eth_call"} 3' in lines
+    assert 'demo_seconds_bucket{method="eth_call",le="0.1"} 0' in lines
+    assert 'demo_seconds_bucket{method="eth_call",le="1"} 1' in lines
+    assert 'demo_seconds_bucket{method="eth_call",le="+Inf"} 1' in lines
+    assert 'demo_seconds_count{method="eth_call"} 1' in lines
+
+def test_node_charges_llm_rpc_and_gas_to_the_thread(tmp_path):
+    log_path = tmp_path / "metrics.jsonl"
+    instrumentation = Instrumentation(EventLog(str(log_path)))
+    gas_before = gas_used.value(node="evaluate")[0]
+
+    receipt = Future()
+    with instrumentation.node("evaluate", {"configurable": {"thread_id": "t1"}}):
+        instrumentation.record_llm("compliance", 0.25, tokens_in=120, tokens_out=30)
+        with instrumentation.rpc("eth_call"):
+            pass
+        instrumentation.watch_transaction(b"\x01" * 32, receipt)
+    # Mined after the node returned, on the confirmation poller's thread
+    poller = threading.Thread(target=receipt.set_result,
+                              args=({"status": 1, "gasUsed": 50000, "blockNumber": 7},))
+    poller.start()
+    poller.join()
+
+    summary = instrumentation.summary("t1")
+    assert summary["node_runs"] == {"evaluate": 1}
+    assert (summary["llm_calls"], summary["tokens_in"], summary["tokens_out"]) == (1, 120, 30)
+    assert summary["rpc_calls"] == 1
+    assert summary["gas_used"] == 50000
+    assert summary["transactions"][0]["status"] == "success"
+    assert gas_used.value(node="evaluate")[0] == gas_before + 50000
+
+    instrumentation.log.close()
+    events = [json.loads(line) for line in log_path.read_text().splitlines()]
+    assert [e["event"] for e in events] == ["llm", "node", "transaction"]
+    assert all(e["thread_id"] == "t1" for e in events)
+    assert events[1]["rpc_by_method"] == {"eth_call": 1}
+
+def test_chains_report_model_calls(monkeypatch):
+    monkeypatch.setattr(tools, "llm", FakeListChatModel(responses=["ok"]))
+    monkeypatch.setattr(tools, "response_cache", None)
+    monkeypatch.setattr(tools, "_chains", {})
+    recorded = []
+    monkeypatch.setattr(tools.instrumentation, "record_llm",
+                        lambda chain, seconds, tokens_in=0, tokens_out=0, error=None: recorded.append(chain))
+
+    assert tools.get_llm_chain("Say ok", name="probe").invoke({}) == "ok"
+    assert recorded == ["probe"]
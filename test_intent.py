@@ -0,0 +1,29 @@
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+import src.agents.tools as tools
+from src.agents.intent import IntentExtractor, parse_amount, parse_intent
+
+def test_parser_reads_common_phrasings():
+    assert parse_intent("I want a $1500 luxury watch") == ("Luxury Watch", 1500.0)
+    assert parse_intent("Buy a luxury watch for $1,500.00 please") == ("Luxury Watch", 1500.0)
+    assert parse_intent("I need to purchase an espresso machine at SGD 899") == ("Espresso Machine", 899.0)
+    assert parse_intent("Order 2 concert tickets for 1.2k SGD") == ("2 Concert Tickets", 1200.0)
+
+def test_parser_leaves_unclear_requests_alone():
+    assert parse_intent("I have $5000, get me a $1500 watch") is None  # two amounts
+    assert parse_intent("I want a luxury watch") is None  # no amount
+    assert parse_intent("$1500, you know what for") is None  # no item
+    assert parse_amount("$1500 SGD") == 1500.0
+
+def test_leftovers_go_to_the_llm(monkeypatch):
+    monkeypatch.setattr(tools, "response_cache", None)
+    monkeypatch.setattr(tools, "llm", FakeListChatModel(responses=['{"item": "Painting", "amount": 3200}', "not json"]))
+    extractor = IntentExtractor()
+
+    assert extractor.extract("I want a $1500 luxury watch") == ("Luxury Watch", 1500.0)
+    assert extractor.extract("That painting, the one around three grand") == ("Painting", 3200.0)
+    assert extractor.extract("hmm") == ("Unknown", 0.0)
+
+    stats = extractor.stats()
+    assert (stats["parser_hits"], stats["llm_hits"], stats["failures"]) == (1, 1, 1)
+    assert stats["hit_rate"] == 1 / 3
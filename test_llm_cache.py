@@ -0,0 +1,83 @@
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+import src.agents.tools as tools
+from src.agents.llm_cache import ResponseStore
+
+class WordEmbeddings(Embeddings):
+    """Bag-of-words vectors: prompts sharing most words come out close."""
+    vocab = ["accept", "proposal", "escrow", "for", "the", "luxury", "watch", "pen", "red"]
+
+    def embed_query(self, text):
+        words = text.lower().replace(".", " ").split()
+        return [float(words.count(w)) for w in self.vocab]
+
+    def embed_documents(self, texts):
+        return [self.embed_query(t) for t in texts]
+
+def use(monkeypatch, store, responses):
+    monkeypatch.setattr(tools, "llm", FakeListChatModel(responses=responses))
+    monkeypatch.setattr(tools, "response_cache", store)
+
+def test_repeated_prompts_skip_the_model(tmp_path, monkeypatch):
+    path = str(tmp_path / "cache.sqlite")
+    store = ResponseStore(path)
+    use(monkeypatch, store, ["first", "second", "third"])
+
+    chain = tools.get_llm_chain("Accept the proposal for {item}.", name="accept")
+    assert chain is tools.get_llm_chain("Accept the proposal for {item}.", name="accept")
+    assert chain.invoke({"item": "watch"}) == "first"
+    assert chain.invoke({"item": "watch"}) == "first"
+    assert chain.invoke({"item": "pen"}) == "second"
+    assert store.stats() == {
+        "entries": 2,
+        "chains": {"accept": {"hits": 1, "near_hits": 0, "misses": 2, "hit_rate": 1 / 3}},
+    }
+
+    # Persisted: a fresh store on the same file still answers
+    monkeypatch.setattr(tools, "response_cache", ResponseStore(path))
+    assert tools.get_llm_chain("Accept the proposal for {item}.", name="accept").invoke({"item": "watch"}) == "first"
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    store = ResponseStore(str(tmp_path / "cache.sqlite"), max_entries=2)
+    use(monkeypatch, store, ["a", "b", "c", "d"])
+    chain = tools.get_llm_chain("Echo {x}")
+
+    chain.invoke({"x": 1})
+    chain.invoke({"x": 2})
+    chain.invoke({"x": 1})  # hit, 2 is now the oldest
+    chain.invoke({"x": 3})
+    assert store.stats()["entries"] == 2
+    assert chain.invoke({"x": 1}) == "a"
+    assert chain.invoke({"x": 2}) == "d"  # evicted, asked the model again
+
+def test_near_duplicates_hit_with_embeddings(tmp_path, monkeypatch):
+    store = ResponseStore(str(tmp_path / "cache.sqlite"), embeddings=WordEmbeddings(), similarity=0.9,
+                          similar_chains=["accept"])
+    use(monkeypatch, store, ["accepted", "other"])
+    chain = tools.get_llm_chain("Accept the escrow proposal for the {item}.", name="accept")
+
+    assert chain.invoke({"item": "luxury watch"}) == "accepted"
+    assert chain.invoke({"item": "watch"}) == "accepted"
+    assert chain.invoke({"item": "red pen"}) == "other"
+    assert store.stats()["chains"]["accept"]["near_hits"] == 1
+
+def test_near_duplicates_are_opt_in(tmp_path, monkeypatch):
+    store = ResponseStore(str(tmp_path / "cache.sqlite"), embeddings=WordEmbeddings(), similarity=0.9)
+    use(monkeypatch, store, ['{"item": "watch", "amount": 1500}', '{"item": "watch", "amount": 1600}'])
+    chain = tools.get_llm_chain("Accept the escrow proposal for the {item}.", name="intent_extraction")
+
+    assert chain.invoke({"item": "luxury watch"}) == '{"item": "watch", "amount": 1500}'
+    # Close enough to be a near-duplicate, but it's another payment
+    assert chain.invoke({"item": "watch"}) == '{"item": "watch", "amount": 1600}'
+    assert store.stats()["chains"]["intent_extraction"]["near_hits"] == 0
+
+def test_hits_dont_write(tmp_path, monkeypatch):
+    store = ResponseStore(str(tmp_path / "cache.sqlite"))
+    use(monkeypatch, store, ["a"])
+    chain = tools.get_llm_chain("Echo {x}")
+    chain.invoke({"x": 1})
+    changes = store._conn.total_changes
+    for _ in range(10):
+        chain.invoke({"x": 1})
+    assert store._conn.total_changes == changes
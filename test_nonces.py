@@ -0,0 +1,110 @@
+from eth_account import Account
+from eth_utils import keccak
+
+import src.blockchain.nonces as nonces
+from src.blockchain.nonces import NonceManager, is_nonce_error, send_transaction
+from src.config import COMPLIANCE_PK
+
+SIGNER = "0x" + "cc" * 20
+
+class FakeEth:
+    def __init__(self, count):
+        self.count = count
+        self.sent = []
+        self.eth = self
+
+    def get_transaction_count(self, address, block_identifier):
+        return self.count
+
+    def send_raw_transaction(self, raw):
+        # The provider's retry of a send whose response was lost
+        self.sent.append(bytes(raw))
+        raise ValueError({"code": -32000, "message": "already known"})
+
+class Call:
+    def build_transaction(self, params):
+        return {"to": "0x" + "11" * 20, "value": 0, "gas": 100000, "gasPrice": 10**9, "chainId": 31337,
+                "data": "0x", **params}
+
+def test_only_node_nonce_errors_count():
+    assert is_nonce_error(ValueError("nonce too low: next nonce 5, tx nonce 4"))
+    assert not is_nonce_error(ValueError("already known"))
+    assert not is_nonce_error(ValueError("execution reverted: authorization nonce used"))
+
+def test_resync_waits_for_outstanding_reservations(monkeypatch):
+    node = FakeEth(5)
+    monkeypatch.setattr(nonces, "w3", node)
+    manager = NonceManager()
+    first, second = manager.reserve(SIGNER), manager.reserve(SIGNER)
+    assert (first, second) == (5, 6)
+
+    # 5 failed, 6 is still being sent: 6 must not be handed out again
+    node.count = 6
+    manager.release(SIGNER, failed=True)
+    assert manager.reserve(SIGNER) == 7
+    manager.release(SIGNER)
+    manager.release(SIGNER)
+    assert manager.outstanding(SIGNER) == 0
+    # Nothing in flight any more, so the failure resyncs from the node
+    assert manager.reserve(SIGNER) == 6
+
+def test_already_known_is_sent_not_resigned(monkeypatch):
+    node = FakeEth(3)
+    monkeypatch.setattr(nonces, "w3", node)
+    monkeypatch.setattr(nonces, "nonce_manager", NonceManager())
+    tx_hash = send_transaction(Call(), COMPLIANCE_PK)
+    # Sent once, under its own hash; no second signature with a new nonce
+    assert len(node.sent) == 1
+    assert bytes(tx_hash) == keccak(node.sent[0])
+    address = Account.from_key(COMPLIANCE_PK).address
+    assert nonces.nonce_manager.outstanding(address) == 0
+    assert nonces.nonce_manager.reserve(address) == 4
+
+def test_retry_skips_nonces_used_elsewhere(monkeypatch):
+    """Another process used the key: the retry starts from the node's count,
+    even though another send is still in flight."""
+    class Manager(NonceManager):
+        handed_out = []
+
+        def reserve(self, address, count=1):
+            nonce = super().reserve(address, count)
+            self.handed_out.append(nonce)
+            return nonce
+
+    class Node(FakeEth):
+        def send_raw_transaction(self, raw):
+            nonce = manager.handed_out[-1]
+            if nonce < self.count:
+                raise ValueError({"code": -32000, "message": f"nonce too low: next nonce {self.count}, tx nonce {nonce}"})
+            self.sent.append(nonce)
+            self.count = nonce + 1
+            return keccak(raw)
+
+    node, manager = Node(3), Manager()
+    monkeypatch.setattr(nonces, "w3", node)
+    monkeypatch.setattr(nonces, "nonce_manager", manager)
+    address = Account.from_key(COMPLIANCE_PK).address
+    assert manager.reserve(address) == 3  # in flight, so no resync
+    node.count = 8
+    send_transaction(Call(), COMPLIANCE_PK)
+    assert manager.handed_out == [3, 4, 8]
+    assert node.sent == [8]
+
+def test_in_process_chain_queues_nonces_ahead():
+    """Reserved nonces reach the bench chain out of order; like a node it mines them once the gap fills."""
+    from benchmarks.evm import InProcessChain
+
+    chain = InProcessChain()
+    account = Account.create()
+    chain.fund(account.address)
+    w3, _ = chain.clients()
+
+    def raw(nonce):
+        tx = {"to": account.address, "value": 0, "gas": 21000, "gasPrice": 10**10, "nonce": nonce, "chainId": chain.chain_id}
+        return account.sign_transaction(tx).raw_transaction
+
+    hashes = [w3.eth.send_raw_transaction(raw(nonce)) for nonce in (0, 2, 3)]
+    assert w3.eth.get_transaction_count(account.address) == 1
+    hashes.append(w3.eth.send_raw_transaction(raw(1)))
+    assert w3.eth.get_transaction_count(account.address) == 4
+    assert all(w3.eth.get_transaction_receipt(tx_hash)["status"] == 1 for tx_hash in hashes)
@@ -0,0 +1,37 @@
+import src.blockchain.policies as policies
+from src.blockchain.policies import decode_results, dry_run
+
+class FakeManager:
+    """runPolicies((token, from, to, amount, extraData)) bound calls, resolved by read_calls."""
+
+    def __init__(self):
+        self.functions = self
+
+    def runPolicies(self, ctx):
+        return ctx
+
+def test_decode_results():
+    # Policy 0 PASS, policy 1 not evaluated, policy 2 FAIL, policy 3 PENDING
+    assert decode_results(0b11_10_00_01) == {0: "PASS", 2: "FAIL", 3: "PENDING"}
+    assert decode_results(0) == {}
+    # A manager built before the bitmap: (policyId, status, reason) per policy
+    assert decode_results([(b"\x01" * 32, 0, b""), (b"\x02" * 32, 2, b"")]) == {0: "PASS", 1: "PENDING"}
+
+def test_dry_run_reads_all_payments_in_one_snapshot(monkeypatch):
+    reads = []
+
+    def read_calls(calls, block_identifier="latest"):
+        reads.append(calls)
+        # Amounts above 1000 SGD FAIL on policy 1 (evaluated first), others PASS both
+        return 7, [(1, 0b1000) if amount > 1000 * 10**6 else (0, 0b0101) for _, _, _, amount, _ in calls]
+
+    monkeypatch.setattr(policies, "get_contract", lambda name: FakeManager())
+    monkeypatch.setattr(policies, "read_calls", read_calls)
+    monkeypatch.setitem(policies.ADDRS, "DemoSGD", "0x" + "11" * 20)
+
+    outcomes = dry_run([("buyer", "seller", 150 * 10**6), ("buyer", "seller", 1500 * 10**6)])
+    assert outcomes == [("PASS", {0: "PASS", 1: "PASS"}), ("FAIL", {1: "FAIL"})]
+    assert len(reads) == 1
+
+    assert policies.would_fail("buyer", "seller", 1500 * 10**6)
+    assert not policies.would_fail("buyer", "seller", 150 * 10**6)
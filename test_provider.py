@@ -0,0 +1,93 @@
+import asyncio
+
+import requests
+
+from src.blockchain.provider import FailoverHTTPProvider, AsyncFailoverHTTPProvider
+from src.metrics import CallCounter, rpc_calls
+
+class FakeEndpoint:
+    def __init__(self, fail=0):
+        self.fail = fail  # requests to fail before answering
+        self.calls = []
+
+    def make_request(self, method, params):
+        self.calls.append(method)
+        if self.fail:
+            self.fail -= 1
+            raise requests.ConnectionError("connection refused")
+        return {"jsonrpc": "2.0", "id": 1, "result": "0x1"}
+
+def _provider(name, *endpoints, **kwargs):
+    urls = [f"http://{name}-{i}:8545" for i in range(len(endpoints))]
+    provider = FailoverHTTPProvider(urls, backoff=0, **kwargs)
+    provider.endpoints = [(health, endpoint) for (health, _), endpoint in zip(provider.endpoints, endpoints)]
+    return provider
+
+def test_fails_over_and_prefers_healthy_endpoints():
+    down, up = FakeEndpoint(fail=10), FakeEndpoint()
+    provider = _provider("failover", down, up)
+
+    assert provider.make_request("eth_blockNumber", [])["result"] == "0x1"
+    assert provider.make_request("eth_blockNumber", [])["result"] == "0x1"
+    # The failed endpoint is tried once, then skipped while marked down
+    assert down.calls == ["eth_blockNumber"]
+    assert up.calls == ["eth_blockNumber", "eth_blockNumber"]
+    assert provider.endpoints[0][0].healthy is False
+
+def test_retries_idempotent_methods_only():
+    flaky = FakeEndpoint(fail=2)
+    provider = _provider("retry", flaky, retries=3)
+    assert provider.make_request("eth_call", [{}, "latest"])["result"] == "0x1"
+    assert len(flaky.calls) == 3
+
+    flaky = FakeEndpoint(fail=1)
+    provider = _provider("no-retry", flaky, retries=3)
+    try:
+        provider.make_request("eth_sendTransaction", [{}])
+        raise AssertionError("should not be retried")
+    except requests.ConnectionError:
+        pass
+    assert len(flaky.calls) == 1
+
+def test_is_connected_is_cached_and_chain_id_fetched_once():
+    endpoint = FakeEndpoint()
+    provider = _provider("cached", endpoint, health_interval=3600)
+    assert provider.is_connected()
+    assert provider.is_connected()
+    assert endpoint.calls == ["web3_clientVersion"]  # the first call's probe
+
+    for _ in range(3):
+        provider.make_request("eth_chainId", [])
+    assert endpoint.calls.count("eth_chainId") == 1
+
+def test_async_provider_shares_health():
+    sync = _provider("shared", FakeEndpoint(), health_interval=3600)
+
+    class AsyncEndpoint(FakeEndpoint):
+        async def make_request(self, method, params):
+            return FakeEndpoint.make_request(self, method, params)
+
+    provider = AsyncFailoverHTTPProvider(["http://shared-0:8545"], sync_provider=sync)
+    provider.endpoints = [(provider.endpoints[0][0], AsyncEndpoint())]
+
+    async def scenario():
+        assert await provider.is_connected()
+        with rpc_calls.track() as calls:
+            await provider.make_request("eth_call", [{}, "latest"])
+        assert calls == {"eth_call": 1}
+
+    asyncio.run(scenario())
+
+def test_call_counter_scopes():
+    counter = CallCounter()
+    with counter.track("payment") as outer:
+        counter.record("eth_call")
+        with counter.track("node") as inner:
+            counter.record("eth_sendRawTransaction")
+    counter.record("eth_call")
+
+    assert outer == {"eth_call": 1, "eth_sendRawTransaction": 1}
+    assert inner == {"eth_sendRawTransaction": 1}
+    summary = counter.summary()
+    assert summary["total"] == 3
+    assert summary["per_scope"]["payment"] == {"count": 1, "mean": 2, "max": 2}
@@ -0,0 +1,53 @@
+from src.agents.rules import (
+    AMBIGUOUS, PASS, PENDING, Rule, RuleEngine, build_facts, default_rules
+)
+
+def intent(amount, sof=False, sanctions=True):
+    return {"item": "Luxury Watch", "amount": amount, "attached_vcs": {"sanctions": sanctions, "sof": sof}}
+
+def test_default_rules():
+    engine = RuleEngine()
+    assert engine.evaluate(build_facts(intent(500), False)).status == PASS
+    assert engine.evaluate(build_facts(intent(1000), False)).status == PASS
+    assert engine.evaluate(build_facts(intent(1500), False)).status == PENDING
+    assert engine.evaluate(build_facts(intent(1500, sof=True), False)).status == PASS
+    assert engine.evaluate(build_facts(intent(1500), True)).status == PASS
+
+def test_unclear_amount_is_ambiguous():
+    engine = RuleEngine()
+    assert engine.evaluate(build_facts(intent(0), False)).status == AMBIGUOUS
+    assert engine.evaluate(build_facts(intent("n/a"), False)).status == AMBIGUOUS
+    assert engine.evaluate(build_facts({}, False)).status == AMBIGUOUS
+
+def test_custom_rule_preempts_defaults():
+    engine = RuleEngine(default_rules(threshold=100))
+    engine.register(Rule("no-sanctions", "FAIL", {"sanctions_vc": False}, "sanctions missing."), first=True)
+    decision = engine.evaluate(build_facts(intent(50, sanctions=False), False))
+    assert (decision.status, decision.rule) == ("FAIL", "no-sanctions")
+    assert engine.evaluate(build_facts(intent(150), False)).status == PENDING
+
+def test_explain_formats_facts():
+    facts = build_facts(intent(1500), False)
+    text = RuleEngine().evaluate(facts).explain(facts)
+    assert "sof-missing" in text and "$1500.0" in text
+
+def test_llm_verdict_is_read_from_the_status_line():
+    from src.agents.compliance import _status_from_text
+
+    assert _status_from_text("SoF is on file, nothing is pending.\nStatus: PASS") == "PASS"
+    assert _status_from_text("A pass would need SoF.\n**Status:** PENDING") == "PENDING"
+    assert _status_from_text("Looks fine, PASS.") == "PENDING"
+
+def test_pending_payment_whose_upfront_would_fail_is_failed(monkeypatch):
+    import src.agents.compliance as compliance
+    from src.graph import route_compliance
+
+    monkeypatch.setattr(compliance, "_upfront_preflight", lambda amount: "FAIL")
+    status, reason = compliance._escrow_check("PENDING", 1500)
+    assert status == "FAIL" and "upfront" in reason
+    assert route_compliance({"compliance_status": status}) == "direct_settle"
+
+    monkeypatch.setattr(compliance, "_upfront_preflight", lambda amount: "PASS")
+    status, reason = compliance._escrow_check("PENDING", 1500)
+    assert (status, reason) == ("PENDING", "")
+    assert route_compliance({"compliance_status": status}) == "propose_escrow"
@@ -0,0 +1,74 @@
+import asyncio
+
+from starlette.testclient import TestClient
+
+from src import server, sessions
+
+def test_pool_serializes_threads_and_rejects_past_the_queue():
+    async def scenario():
+        pool = server.SessionPool(workers=2, queue_size=1)
+        order = []
+        release = asyncio.Event()
+
+        async def call(thread_id, tag):
+            async with pool.session(thread_id):
+                order.append(("in", tag))
+                await release.wait()
+                order.append(("out", tag))
+
+        tasks = [asyncio.create_task(call("t1", "a")), asyncio.create_task(call("t1", "b")),
+                 asyncio.create_task(call("t2", "c"))]
+        await asyncio.sleep(0)
+        # a and c run, b waits behind a on the same thread
+        assert sorted(tag for _, tag in order) == ["a", "c"]
+        assert pool.stats()["running"] == 2 and pool.stats()["queued"] == 1
+        try:
+            async with pool.session("t3"):
+                raise AssertionError("should have been rejected")
+        except server.Overloaded:
+            pass
+
+        release.set()
+        await asyncio.gather(*tasks)
+        assert order.index(("out", "a")) < order.index(("in", "b"))
+        assert pool.stats() == {"workers": 2, "running": 0, "queued": 0, "queue_size": 1, "rejected": 1}
+        assert not pool._locks
+
+    asyncio.run(scenario())
+
+def test_endpoints_map_session_errors(monkeypatch):
+    async def start(thread_id, text):
+        if "bad" in text:
+            raise ValueError("no amount")
+        return [{"node": "analyze_intent", "compliance_status": "PENDING"}]
+
+    async def accept(thread_id):
+        raise sessions.SessionError("No escrow proposal to accept (None)")
+
+    async def summary(thread_id):
+        return {"thread_id": thread_id, "status": "PENDING"} if thread_id == "t1" else None
+
+    monkeypatch.setattr(sessions, "astart_payment", start)
+    monkeypatch.setattr(sessions, "aaccept_escrow", accept)
+    monkeypatch.setattr(sessions, "asummary", summary)
+
+    with TestClient(server.create_app(watch=False)) as client:
+        response = client.post("/payments", json={"request": "I want a $1500 watch", "thread_id": "t1"})
+        assert response.status_code == 200
+        assert response.json()["status"] == "PENDING"
+        assert response.json()["updates"][0]["node"] == "analyze_intent"
+
+        assert client.post("/payments", json={"request": "bad"}).status_code == 400
+        assert client.post("/payments", json={}).status_code == 400
+        assert client.post("/payments/t2/accept").status_code == 409
+        assert client.get("/payments/t2").status_code == 404
+        assert client.get("/health").json()["pool"]["running"] == 0
+
+def test_busy_server_answers_503(monkeypatch):
+    app = server.create_app(workers=1, queue_size=0, watch=False)
+    app.state.pool._admitted = 1  # one run in flight
+
+    with TestClient(app) as client:
+        response = client.post("/payments/t1/accept")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
@@ -0,0 +1,45 @@
+from eth_account import Account
+from src.config import ADDRS, BUYER_PK, CHAIN_ID
+from src.blockchain.utils import POOL_MIN_BATCH, TransferAuthorizationSigner
+
+TOKEN = ADDRS.get("DemoSGD", "0x5FbDB2315678afecb367f032d93F642f64180aa3")
+WRAPPER = ADDRS.get("PolicyWrapper", "0xa513E6E4b8f2a923D98304ec87F64353C4D5C853")
+
+def reference_signature(auth):
+    """Full EIP-712 typed-data signing, as the signer used to do it."""
+    domain = {"name": "Demo Singapore Dollar", "version": "1", "chainId": CHAIN_ID, "verifyingContract": TOKEN}
+    types = {"TransferWithAuthorization": [
+        {"name": "from", "type": "address"},
+        {"name": "to", "type": "address"},
+        {"name": "value", "type": "uint256"},
+        {"name": "validAfter", "type": "uint256"},
+        {"name": "validBefore", "type": "uint256"},
+        {"name": "nonce", "type": "bytes32"},
+    ]}
+    message = {k: auth[k] for k in ("from", "to", "value", "validAfter", "validBefore", "nonce")}
+    return Account.from_key(BUYER_PK).sign_typed_data(domain, types, message)
+
+def test_signature_matches_typed_data():
+    auth = TransferAuthorizationSigner(TOKEN, BUYER_PK).sign(WRAPPER, 1500 * 10**6)
+    expected = reference_signature(auth)
+    assert (auth["v"], auth["r"], auth["s"]) == (
+        expected.v, expected.r.to_bytes(32, "big"), expected.s.to_bytes(32, "big")
+    )
+
+def test_sign_many_in_pool():
+    signer = TransferAuthorizationSigner(TOKEN, BUYER_PK)
+    requests = [{"to": WRAPPER, "value": i} for i in range(POOL_MIN_BATCH)]
+    try:
+        auths = signer.sign_many(requests, processes=2)
+        assert signer._workers == 2
+        # A different size replaces the pool instead of being ignored
+        resized = signer.sign_many([dict(r, nonce=a["nonce"]) for r, a in zip(requests, auths)], processes=3)
+        assert signer._workers == 3
+    finally:
+        signer.close()
+    assert [a["value"] for a in auths] == list(range(POOL_MIN_BATCH))
+    assert len({a["nonce"] for a in auths}) == POOL_MIN_BATCH
+    # Same signatures as the serial signer (ECDSA here is deterministic, RFC 6979)
+    serial = [signer.sign(a["to"], a["value"], nonce=a["nonce"]) for a in auths]
+    assert auths == serial
+    assert resized == serial
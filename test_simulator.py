@@ -0,0 +1,57 @@
+import numpy as np
+
+from src.blockchain.credentials import SANCTIONS_CHECK, SOURCE_OF_FUNDS
+from src.blockchain.policies import decode_results
+from src.blockchain.simulator import (
+    FAIL, PASS, PENDING, PolicySimulator, SanctionsPolicy, SourceOfFundsPolicy, TxContext, demo_policies
+)
+
+THRESHOLD = 1000 * 10**6
+VERIFIED = "0x" + "11" * 20      # sanctions check only
+FULL = "0x" + "22" * 20          # sanctions + source of funds
+UNKNOWN = "0x" + "33" * 20       # never registered
+SELLER = "0x" + "44" * 20
+
+def simulator():
+    sim = PolicySimulator(demo_policies(THRESHOLD))
+    sim.registry.set(VERIFIED, SANCTIONS_CHECK, True)
+    sim.registry.set(FULL, SANCTIONS_CHECK, True)
+    sim.registry.set(FULL, SOURCE_OF_FUNDS, True)
+    return sim
+
+def test_evaluate_mirrors_run_policies():
+    sim = simulator()
+    # Sanctions (cost 1) runs before Source of Funds (cost 2) and stops the run on FAIL
+    status, results = sim.evaluate(TxContext(None, UNKNOWN, SELLER, 5000 * 10**6))
+    assert status == FAIL
+    assert results == [(SanctionsPolicy.policy_id, FAIL, SanctionsPolicy.REASON_NOT_VERIFIED)]
+
+    status, results = sim.evaluate(TxContext(None, VERIFIED, SELLER, 1500 * 10**6))
+    assert status == PENDING
+    assert [r.policy_id for r in results] == [SourceOfFundsPolicy.policy_id, SanctionsPolicy.policy_id]
+    assert sim.preflight(VERIFIED, SELLER, THRESHOLD) == "PASS"
+    assert sim.preflight(FULL, SELLER, 1500 * 10**6) == "PASS"
+
+def test_evaluate_many_matches_evaluate():
+    sim = simulator()
+    rng = np.random.default_rng(7)
+    senders = rng.choice([VERIFIED, FULL, UNKNOWN], size=500)
+    amounts = rng.integers(1, 3 * THRESHOLD, size=500)
+    statuses, results = sim.evaluate_many(senders, amounts)
+
+    for sender, amount, status, bits in zip(senders, amounts, statuses, results):
+        expected, expected_results = sim.evaluate(TxContext(None, str(sender), SELLER, int(amount)))
+        assert status == expected
+        # Bitmap by manager index: 0 = Source of Funds, 1 = Sanctions
+        assert decode_results(int(bits)) == {
+            [SourceOfFundsPolicy.policy_id, SanctionsPolicy.policy_id].index(r.policy_id): ["PASS", "FAIL", "PENDING"][r.status]
+            for r in expected_results
+        }
+
+def test_registry_writes_update_the_snapshot():
+    sim = simulator()
+    assert sim.preflight(VERIFIED, SELLER, 1500 * 10**6) == "PENDING"
+    sim.on_registry_write(VERIFIED, SOURCE_OF_FUNDS, True)
+    assert sim.preflight(VERIFIED, SELLER, 1500 * 10**6) == "PASS"
+    statuses, _ = sim.evaluate_many(sim.registry.rows([VERIFIED, UNKNOWN]), [1500 * 10**6] * 2)
+    assert statuses.tolist() == [PASS, FAIL]
@@ -0,0 +1,13 @@
+import subprocess
+import sys
+
+def test_graph_import_defers_langgraph_web3_and_the_llm():
+    code = ("import sys, src.graph, src.agents.tools, src.blockchain.client; "
+            "print(sorted(m for m in ('langgraph.graph', 'web3', 'langchain_community') if m in sys.modules))")
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
+
+def test_graph_is_built_once_on_first_use():
+    from src import graph
+    assert graph.app_graph is graph.get_app_graph()
+    assert graph.memory is graph.app_graph.checkpointer
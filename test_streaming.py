@@ -0,0 +1,51 @@
+from types import SimpleNamespace
+
+from src.streaming import CoalescingTokenStreamer
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class Recorder(CoalescingTokenStreamer):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.frames = []
+
+    def start(self, agent_name):
+        self.frames.append(("start", agent_name))
+
+    def render(self, text, final):
+        self.frames.append((text, final))
+
+def _response(text):
+    return SimpleNamespace(generations=[[SimpleNamespace(text=text)]])
+
+def test_tokens_are_coalesced_by_time_and_size():
+    clock = Clock()
+    streamer = Recorder(interval=0.1, max_chars=10, clock=clock)
+    streamer.on_llm_start({}, [], tags=["seq:step:1", "Compliance Agent"])
+    for token in ["a", "b", "c"]:
+        clock.now += 0.02
+        streamer.on_llm_new_token(token)
+    clock.now += 0.05  # 0.11s since start: the time window flushes
+    streamer.on_llm_new_token("d")
+    streamer.on_llm_new_token("0123456789")  # byte budget flushes without waiting
+    streamer.on_llm_new_token("e")
+    streamer.on_llm_end(_response("abcd0123456789e"))
+
+    assert streamer.frames == [
+        ("start", "Compliance Agent"),
+        ("abcd", False),
+        ("abcd0123456789", False),
+        ("abcd0123456789e", True),
+    ]
+    assert streamer.renders == 3
+
+def test_cached_response_renders_once():
+    streamer = Recorder(clock=Clock())
+    streamer.on_llm_start({}, [])
+    streamer.on_llm_end(_response("from the cache"))
+    assert streamer.frames == [("start", "Agent"), ("from the cache", True)]
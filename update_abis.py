@@ -1,27 +1,64 @@
-import json
-import os
+"""Rebuilds out/ with forge and checks the artifacts the app loads.
 
-def load_abi(path):
-    with open(path, "r") as f:
-        data = json.load(f)
-        return data["abi"]
+Usage: python update_abis.py [--no-build] [--test]
 
-sgd_abi = load_abi("out/DemoSGD.sol/DemoSGD.json")
-wrapper_abi = load_abi("out/X402PolicyWrapper.sol/X402PolicyWrapper.json")
-escrow_abi = load_abi("out/SimpleEscrow.sol/SimpleEscrow.json")
-registry_abi = load_abi("out/DemoIdentityRegistry.sol/DemoIdentityRegistry.json")
+The app reads ABIs straight from out/ (src/blockchain/contracts.py), so this
+replaces the old code generation: after `forge build` it checks, for every
+contract in `ARTIFACTS`, that the artifact exists, that its bytecode
+dispatches every function in its ABI, and that it was built from the
+sources on disk (the keccak256 in its metadata). Exits with 1 if any check
+fails. `--test` then runs `forge test` (PolicyGas, SplitSettlement,
+SimpleEscrowFactory, ...) against the fresh build, so the gas it reports is
+for the sources on disk. out/ is never edited by hand.
+"""
+import argparse
+import shutil
+import subprocess
+import sys
 
-content = f"""# Generated ABIs
-DEMO_SGD_ABI = {repr(sgd_abi)}
+from src.blockchain.contracts import ARTIFACTS, StaleArtifact, contracts
 
-WRAPPER_ABI = {repr(wrapper_abi)}
+# Interfaces have no bytecode to check
+INTERFACES = {"Multicall3"}
 
-ESCROW_ABI = {repr(escrow_abi)}
+def forge():
+    for path in ("./bin/forge", shutil.which("forge")):
+        if path and shutil.which(path):
+            return path
+    return None
 
-REGISTRY_ABI = {repr(registry_abi)}
-"""
+def check(name):
+    """Problems with `name`'s artifact (empty if it's up to date)."""
+    try:
+        if name not in INTERFACES:
+            contracts.bytecode(name)
+        stale = contracts.stale_sources(name)
+    except StaleArtifact as e:
+        return [str(e)]
+    return [f"{contracts.path(name)} was built before changes to {source}" for source in stale]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--no-build", action="store_true", help="only check out/")
+    parser.add_argument("--test", action="store_true", help="run `forge test -vv` after the checks")
+    args = parser.parse_args()
+
+    path = forge()
+    if path is None and (not args.no_build or args.test):
+        raise SystemExit("forge not found (install Foundry, or ./bin/forge)")
+    if not args.no_build:
+        subprocess.run([path, "build"], check=True)
 
-with open("src/blockchain/abis.py", "w") as f:
-    f.write(content)
+    problems = [problem for name in ARTIFACTS for problem in check(name)]
+    for problem in problems:
+        print(problem)
+    if problems:
+        if args.no_build:
+            print("Run `python update_abis.py` to rebuild out/.")
+        sys.exit(1)
+    print(f"out/ is up to date ({len(ARTIFACTS)} artifacts).")
+    if args.test:
+        sys.exit(subprocess.run([path, "test", "-vv"]).returncode)
 
-print("src/blockchain/abis.py updated successfully.")
+if __name__ == "__main__":
+    main()